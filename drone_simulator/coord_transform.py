@@ -0,0 +1,75 @@
+import os
+import numpy as np
+
+# the calibrated transformation is stored next to this file, without one the simulator uses the lighthouse coordinates directly
+TRANSFORMFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "coord_transform.txt")
+
+
+class CoordTransform:
+    """Affine transformation from simulator coordinates to lighthouse coordinates.
+        All methods work on whole (N, 3) arrays of points, so the positions of the entire swarm are transformed with one matrix product.
+        Single points, like the waypoints of the lighthouse examples, are transformed with transformF2F without numpy."""
+
+    def __init__(self, T=None):
+        if T is None:
+            T = np.identity(4)
+        self.setMatrix(T)
+
+
+    def setMatrix(self, T):
+        """Sets the 4x4 homogeneous transformation matrix and precomputes its parts and its inverse."""
+        self.T = np.asarray(T, dtype=float)
+        self.rotation = self.T[:3, :3].T.copy()  # transposed, so that points (N, 3) can be multiplied from the left
+        self.translation = self.T[:3, 3].copy()
+        self.rows = self.T[:3].tolist()  # plain floats are faster than numpy for single points
+        inverse = np.linalg.inv(self.T)
+        self.inverseRotation = inverse[:3, :3].T.copy()
+        self.inverseTranslation = inverse[:3, 3].copy()
+
+
+    def transformPoints(self, points):
+        """Transforms simulator coordinates of shape (N, 3) to lighthouse coordinates."""
+        return np.asarray(points).dot(self.rotation) + self.translation
+
+
+    def transformF2F(self, x, y, z):
+        """Transforms the simulator coordinates of one point to a lighthouse coordinate tuple."""
+        r0, r1, r2 = self.rows
+        return (r0[0] * x + r0[1] * y + r0[2] * z + r0[3],
+                r1[0] * x + r1[1] * y + r1[2] * z + r1[3],
+                r2[0] * x + r2[1] * y + r2[2] * z + r2[3])
+
+
+    def inverseTransformPoints(self, points):
+        """Transforms lighthouse coordinates of shape (N, 3) to simulator coordinates."""
+        return np.asarray(points).dot(self.inverseRotation) + self.inverseTranslation
+
+
+    def fit(self, simPoints, lighthousePoints):
+        """Fits the transformation by least squares to pairs of points collected in a calibration flight and returns the rms error in m.
+            At least 4 pairs that do not lie in one plane are needed."""
+        simPoints = np.asarray(simPoints, dtype=float)
+        lighthousePoints = np.asarray(lighthousePoints, dtype=float)
+        if simPoints.shape[0] < 4:
+            raise Exception("At least 4 point pairs are needed to fit the transformation, got {}".format(simPoints.shape[0]))
+
+        A = np.hstack([simPoints, np.ones([simPoints.shape[0], 1])])
+        X = np.linalg.lstsq(A, lighthousePoints, rcond=None)[0]  # shape (4, 3), lighthouse = A.dot(X)
+        T = np.identity(4)
+        T[:3, :] = X.T
+        self.setMatrix(T)
+
+        residual = self.transformPoints(simPoints) - lighthousePoints
+        return np.sqrt(np.mean(np.sum(residual**2, axis=1)))
+
+
+    def save(self, path=TRANSFORMFILE):
+        np.savetxt(path, self.T)
+
+
+def loadCoordTransform(path=TRANSFORMFILE) -> CoordTransform:
+    """Loads the calibrated transformation, or returns the identity if there is no calibration yet."""
+    if os.path.exists(path):
+        print("loaded coordinate transformation from", path)
+        return CoordTransform(np.loadtxt(path))
+    return CoordTransform()
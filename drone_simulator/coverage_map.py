@@ -0,0 +1,141 @@
+import os
+import re
+import math
+import random
+import numpy as np
+
+# the base station poses as printed by lighthouse_coordinates/get_bs_position.py, in the coordinate system of OpenVR (y is up)
+BSPOSITIONFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lighthouse_coordinates", "bs_position.txt")
+
+
+def loadBsPoses(path=BSPOSITIONFILE):
+    """Reads the base station poses and returns their origins (stations, 3) and rotation matrices (stations, 3, 3)."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    numbers = np.array([float(i) for i in re.findall(r'-?\d+\.\d+', text)])
+    poses = numbers.reshape((-1, 12))
+    return poses[:, 0:3], poses[:, 3:12].reshape((-1, 3, 3))
+
+
+class CoverageMap:
+    """A voxel grid over the room that stores how well the lighthouse base stations can see each point.
+        The grid is in simulator coordinates and precomputed, so all lookups are just an index into an array."""
+
+    VOXELSIZE = 0.1
+    FIELDOFVIEW = math.radians(60)  # half angle of the sweep, horizontally and vertically
+    RANGE = 5.0  # maximum distance to a base station in m
+    MINSTATIONS = 2  # the number of base stations that have to see a point for a stable position estimate
+    MINQUALITY = 0.15  # the combined quality of usable voxels
+    WALLMARGIN = 0.3  # distance to keep from the walls and the ceiling
+    FLOORMARGIN = 0.3
+
+    def __init__(self, roomSize, origins, rotations, coordTransform):
+        self.roomSize = np.array([roomSize[0], roomSize[1], roomSize[2]], dtype=float)
+        self.lower = np.array([-self.roomSize[0] / 2, -self.roomSize[1] / 2, 0])
+        self.shape = np.maximum(np.ceil(self.roomSize / self.VOXELSIZE).astype(int), 1)
+        self.origins = np.asarray(origins, dtype=float)
+        self.rotations = np.asarray(rotations, dtype=float)
+        self.build(coordTransform)
+
+
+    def build(self, coordTransform):
+        """Computes the quality of all voxels. Run this again after the coordinate transformation changed."""
+        centers = self.voxelCenters().reshape((-1, 3))
+
+        # simulator -> lighthouse (crazyflie) -> OpenVR coordinates, the crazyflie uses x = -z, y = -x, z = y of OpenVR
+        cf = coordTransform.transformPoints(centers)
+        vr = np.stack([-cf[:, 1], cf[:, 2], -cf[:, 0]], axis=1)
+
+        quality = np.zeros(len(centers))
+        stations = np.zeros(len(centers), dtype=int)
+        for origin, rotation in zip(self.origins, self.rotations):
+            local = (vr - origin).dot(rotation)  # coordinates in the frame of the base station, which looks along its -z axis
+            depth = -local[:, 2]
+            dist = np.linalg.norm(local, axis=1)
+            angle = np.maximum(np.abs(np.arctan2(local[:, 0], depth)), np.abs(np.arctan2(local[:, 1], depth)))
+            visible = (depth > 0) & (angle < self.FIELDOFVIEW) & (dist < self.RANGE)
+            # points in the middle of the sweep and close to the station are tracked best
+            stationQuality = (1 - angle / self.FIELDOFVIEW) * (1 - dist / self.RANGE)
+            quality += np.where(visible, stationQuality, 0)
+            stations += visible
+        quality /= max(1, len(self.origins))
+
+        margin = np.array([self.WALLMARGIN, self.WALLMARGIN, 0])
+        insideMargin = np.all((centers >= self.lower + margin) & (centers <= self.lower + self.roomSize - margin), axis=1)
+        insideMargin &= (centers[:, 2] >= self.FLOORMARGIN) & (centers[:, 2] <= self.roomSize[2] - self.WALLMARGIN)
+
+        self.quality = quality.reshape(self.shape)
+        self.stations = stations.reshape(self.shape)
+        self.usable = ((stations >= self.MINSTATIONS) & (quality >= self.MINQUALITY) & insideMargin).reshape(self.shape)
+        self.usableCenters = centers[self.usable.reshape(-1)]
+
+        # outside of the usable volume the boundary force points up the quality gradient, or to the middle of the usable volume where it is flat
+        score = np.where(self.usable, self.quality, 0)
+        gradient = np.stack(np.gradient(score, self.VOXELSIZE), axis=3).reshape((-1, 3))
+        if len(self.usableCenters) > 0:
+            center = self.usableCenters.mean(axis=0)
+        else:
+            center = self.lower + self.roomSize / 2
+        flat = np.linalg.norm(gradient, axis=1) < 1e-9
+        gradient[flat] = center - centers[flat]
+        length = np.maximum(np.linalg.norm(gradient, axis=1), 1e-9)
+        force = gradient / length[:, None]
+        force[self.usable.reshape(-1)] = 0
+        self.force = force.reshape(tuple(self.shape) + (3,))
+
+        volume = self.VOXELSIZE ** 3
+        print("coverage map: {:.1f} m^3 of {:.1f} m^3 usable".format(len(self.usableCenters) * volume, np.prod(self.roomSize)))
+
+
+    def voxelCenters(self):
+        """Returns the centers of all voxels in an array of shape (x, y, z, 3)."""
+        axes = [self.lower[i] + (np.arange(self.shape[i]) + 0.5) * self.VOXELSIZE for i in range(0, 3)]
+        return np.stack(np.meshgrid(*axes, indexing="ij"), axis=3)
+
+
+    def voxel(self, point):
+        """Returns the index of the voxel that contains the point, points outside of the room get the closest voxel."""
+        i = min(max(int((point[0] - self.lower[0]) / self.VOXELSIZE), 0), self.shape[0] - 1)
+        j = min(max(int((point[1] - self.lower[1]) / self.VOXELSIZE), 0), self.shape[1] - 1)
+        k = min(max(int((point[2] - self.lower[2]) / self.VOXELSIZE), 0), self.shape[2] - 1)
+        return i, j, k
+
+
+    def voxels(self, points):
+        """Returns the voxel indices of an array of points (N, 3) as a tuple of index arrays."""
+        index = np.floor((np.asarray(points, dtype=float) - self.lower) / self.VOXELSIZE).astype(int)
+        index = np.clip(index, 0, self.shape - 1)
+        return index[:, 0], index[:, 1], index[:, 2]
+
+
+    def isInside(self, points):
+        """True for each point (N, 3) that lies within the room."""
+        points = np.asarray(points, dtype=float)
+        return np.all((points >= self.lower) & (points <= self.lower + self.roomSize), axis=1)
+
+
+    def isUsable(self, points):
+        """True for each point (N, 3) where the drones can be tracked reliably."""
+        return self.usable[self.voxels(points)] & self.isInside(points)
+
+
+    def boundaryForce(self, point):
+        """Returns the direction that leads a drone at the point back into the usable volume, or zero if it already is inside."""
+        return self.force[self.voxel(point)]
+
+
+    def randomPoint(self):
+        """Returns a random point within the usable volume."""
+        if len(self.usableCenters) == 0:
+            raise Exception("The coverage map has no usable voxels")
+        center = self.usableCenters[random.randrange(len(self.usableCenters))]
+        return center + np.random.uniform(-self.VOXELSIZE / 2, self.VOXELSIZE / 2, 3)
+
+
+def loadCoverageMap(roomSize, coordTransform, path=BSPOSITIONFILE):
+    """Builds the coverage map from the base station poses, or returns None if they are not available."""
+    if not os.path.exists(path):
+        print("no base station poses found at", path, "using the confined room instead")
+        return None
+    origins, rotations = loadBsPoses(path)
+    return CoverageMap(roomSize, origins, rotations, coordTransform)
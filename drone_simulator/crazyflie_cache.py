@@ -0,0 +1,108 @@
+import os
+import datetime
+import threading
+
+from cflib.crazyflie import Crazyflie
+from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
+
+# One cache directory for every script in this repository, independent of the working directory.
+# cflib stores each log and param TOC in a file named after the CRC of the TOC, so the cache is content addressed:
+# a firmware build with a new TOC gets a new entry and drones running the same firmware share theirs.
+CACHEDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cache")
+
+
+class LazyParamCrazyflie(Crazyflie):
+    """A Crazyflie that does not download the values of all parameters when connecting.
+        Setting parameters works as usual, values that are needed can be fetched with fetchParams."""
+
+    def _param_toc_updated_cb(self):
+        """Called when the param TOC has been fully updated. Unlike the original, this skips requesting all parameter values."""
+        self.connected_ts = datetime.datetime.now()
+        self.connected.call(self.link_uri)
+
+
+def createCrazyflie():
+    """Returns a Crazyflie that uses the shared TOC cache and only downloads parameter values on demand."""
+    os.makedirs(CACHEDIR, exist_ok=True)
+    return LazyParamCrazyflie(rw_cache=CACHEDIR)
+
+
+class SharedCfFactory:
+    """Factory for the cflib Swarm class that creates Crazyflies with the shared cache, replaces CachedCfFactory."""
+
+    def construct(self, uri):
+        return SyncCrazyflie(uri, cf=createCrazyflie())
+
+
+class ParamUpdates:
+    """Dispatches the parameter updates of one Crazyflie. cflib can not remove update callbacks, so every parameter gets a single
+        callback here and the ones waiting for updates are added with listen and removed with stopListening when they are done."""
+
+    def __init__(self, cf):
+        self.cf = cf
+        self.registered = set()
+        self.listeners = []
+        self.lock = threading.Lock()
+
+
+    def listen(self, names, cb):
+        """Calls cb(name, value) for the updates of the parameters in names (and of every other parameter with a listener) until stopListening."""
+        with self.lock:
+            for name in names:
+                if name not in self.registered:
+                    group, param = name.split('.')
+                    self.cf.param.add_update_callback(group=group, name=param, cb=self._updated)
+                    self.registered.add(name)
+            self.listeners.append(cb)
+
+
+    def stopListening(self, cb):
+        with self.lock:
+            self.listeners.remove(cb)
+
+
+    def _updated(self, name, value):
+        with self.lock:
+            listeners = list(self.listeners)
+        for cb in listeners:
+            cb(name, value)
+
+
+def paramUpdates(cf):
+    """The ParamUpdates of cf, created on first use."""
+    updates = getattr(cf, 'paramUpdates', None)
+    if updates is None:
+        updates = ParamUpdates(cf)
+        cf.paramUpdates = updates
+    return updates
+
+
+def fetchParams(cf, names, timeout=2.0):
+    """Downloads the current values of the parameters in names (complete names like 'ring.effect') and returns them as a dict.
+        Parameters that did not arrive within the timeout are missing from the result."""
+    pending = set(names)
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def updated(name, value):
+        with lock:
+            pending.discard(name)
+            if not pending:
+                done.set()
+
+    updates = paramUpdates(cf)
+    updates.listen(names, updated)
+    try:
+        for name in names:
+            cf.param.request_param_update(name)
+        if names:
+            done.wait(timeout)
+    finally:
+        updates.stopListening(updated)
+
+    values = {}
+    for name in names:
+        group, param = name.split('.')
+        if name not in pending and group in cf.param.values and param in cf.param.values[group]:
+            values[name] = cf.param.values[group][param]
+    return values
@@ -2,11 +2,13 @@ import time
 import math
 import random
 
-from cflib.crazyflie import Crazyflie
 from cflib.crazyflie.log import LogConfig
 from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
 from cflib.crazyflie.syncLogger import SyncLogger
 
+from crazyflie_cache import createCrazyflie
+from telemetry import TelemetryBuffer
+
 from panda3d.core import Vec3
 from panda3d.core import BitMask32
 from panda3d.core import LineSegs
@@ -32,15 +34,16 @@ class Drone:
     TARGETFORCE = 1
     AVOIDANCEFORCE = 10
     FORCEFALLOFFDISTANCE = .5
+    BOUNDARYFORCE = 2
 
     def __init__(self, manager, position: Vec3, uri="-1", printDebugInfo=False):
 
         self.base = manager.base
         self.manager = manager
 
-        # The position of the real drone this virtual drone is connected to.
-        # If a connection is active, this value is updated each frame.
-        self.realDronePosition = Vec3(0, 0, 0)
+        # The timestamped positions of the real drone this virtual drone is connected to.
+        # If a connection is active, the log callback of cflib appends a sample every 50 ms.
+        self.telemetry = TelemetryBuffer()
 
         self.canConnect = False  # true if the virtual drone has a uri to connect to a real drone
         self.isConnected = False  # true if the connection to a real drone is currently active
@@ -48,6 +51,13 @@ class Drone:
         if self.uri != "-1":
             self.canConnect = True
 
+        # uplink bookkeeping, the UplinkScheduler of the manager decides when a setpoint is actually sent
+        self.lastSentSetpoint = [0, 0, 0]
+        self.lastSendTime = 0
+        self.packetsSent = 0
+        self.packetsSuppressed = 0
+        self.packetsThrottled = 0
+
         self.randVec = Vec3(random.uniform(-1, 1), random.uniform(-1, 1), random.uniform(-1, 1))
 
         # add the rigidbody to the drone, which has a mass and linear damping
@@ -92,19 +102,15 @@ class Drone:
             return
         print(self.uri, "connecting")
         self.isConnected = True
-        self.scf = SyncCrazyflie(self.uri, cf=Crazyflie(rw_cache='./cache'))
+        self.scf = SyncCrazyflie(self.uri, cf=createCrazyflie())
         self.scf.open_link()
         self._reset_estimator()
         self.start_position_printing()
-
-        # MOVE THIS BACK TO SENDPOSITIONS() IF STUFF BREAKS
-        self.scf.cf.param.set_value('flightmode.posSet', '1')
+        # the parameters are set by the manager for all drones at once, see DroneManager.PARAMS
 
 
-    def sendPosition(self):
-        """Sends the position of the virtual drone to the real one."""
-        cf = self.scf.cf
-
+    def updateSetpoint(self):
+        """Updates the setpoint the real drone should fly to from the state of the virtual drone."""
         # position + the negative of the distance to the real drone
         # diff = self.getPos() - self.actualDronePosition
         # self.setpoint = self.getPos() + diff
@@ -117,15 +123,22 @@ class Drone:
 
         # position only
         self.setpoint = self.getPos()
-        # print('Sending position {} | {} | {}'.format(self.setpoint[0], self.setpoint[1], self.setpoint[2]))
 
-        # send the setpoint
-        cf.commander.send_position_setpoint(self.setpoint[0], self.setpoint[1], self.setpoint[2], 0)
+
+    def sendPosition(self, setpoint, now):
+        """Sends the setpoint, already transformed to lighthouse coordinates by the manager, to the real drone."""
+        cf = self.scf.cf
+        # print('Sending position {} | {} | {}'.format(setpoint[0], setpoint[1], setpoint[2]))
+        cf.commander.send_position_setpoint(setpoint[0], setpoint[1], setpoint[2], 0)
+        self.lastSentSetpoint = [setpoint[0], setpoint[1], setpoint[2]]
+        self.lastSendTime = now
+        self.packetsSent += 1
 
 
     def disconnect(self):
         """Disconnects the real drone."""
         print(self.uri, "disconnecting")
+        print(self.uri, "{} setpoints sent, {} suppressed, {} throttled".format(self.packetsSent, self.packetsSuppressed, self.packetsThrottled))
         self.isConnected = False
         cf = self.scf.cf
         cf.commander.send_stop_setpoint()
@@ -137,10 +150,11 @@ class Drone:
         """Update the virtual drone."""
         self._updateTargetForce()
         self._updateAvoidanceForce()
+        self._updateBoundaryForce()
         self._clampForce()
 
         if self.isConnected:
-            self.sendPosition()
+            self.updateSetpoint()  # the setpoint is sent by the manager, which schedules the packets of all drones
 
         # draw various lines to get a better idea of whats happening
         self._drawTargetLine()
@@ -195,6 +209,14 @@ class Drone:
             self.addForce(avoidanceDirection * distMult * self.AVOIDANCEFORCE)
 
 
+    def _updateBoundaryForce(self):
+        """Applies a force to the virtual drone which pushes it back into the part of the room the base stations can see."""
+        if self.manager.coverageMap is None:
+            return
+        force = self.manager.coverageMap.boundaryForce(self.getPos())
+        self.addForce(Vec3(force[0], force[1], force[2]) * self.BOUNDARYFORCE)
+
+
     def _clampForce(self):
         """Clamps the total force acting in the drone."""
         totalForce = self.rigidBody.getTotalForce()
@@ -290,7 +312,7 @@ class Drone:
         # ls.setThickness(1)
         ls.setColor(0.0, 0.0, 0.0, 1.0)
         ls.moveTo(self.getPos())
-        ls.drawTo(self.actualDronePosition)
+        ls.drawTo(self.getRealPos())
         node = ls.create()
         self.actualDroneLineNP = self.base.render.attachNewNode(node)
 
@@ -356,14 +378,24 @@ class Drone:
 
 
     def position_callback(self, timestamp, data, logconf):
-        """Updates the variable holding the position of the actual drone. It is not called in the update method, but by the drone itself (I think)."""
+        """Stores the position of the actual drone in the telemetry buffer. It is not called in the update method, but from the thread of cflib.
+            The position stays in lighthouse coordinates, the manager transforms the positions of all drones at once when they are read."""
         x = data['kalman.stateX']
         y = data['kalman.stateY']
         z = data['kalman.stateZ']
-        self.realDronePosition = Vec3(x, y, z)
+        self.telemetry.append(time.time(), timestamp, x, y, z)
         # print('pos: ({}, {}, {})'.format(x, y, z))
 
 
+    def getRealPos(self) -> Vec3:
+        """Returns the latest reported position of the real drone in simulator coordinates, or the origin if there is none yet."""
+        sample = self.telemetry.latest()
+        if sample is None:
+            return Vec3(0, 0, 0)
+        pos = self.manager.coordTransform.inverseTransformPoints(sample[None, TelemetryBuffer.POSITION])[0]
+        return Vec3(pos[0], pos[1], pos[2])
+
+
     def start_position_printing(self):
         """Activate logging of the position of the real drone."""
         log_conf = LogConfig(name='Position', period_in_ms=50)
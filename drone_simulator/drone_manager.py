@@ -1,7 +1,13 @@
 import random
 import time
+import numpy as np
 
 from drone import Drone
+from telemetry import TelemetryBuffer
+from uplink_scheduler import UplinkScheduler
+from coord_transform import loadCoordTransform
+from coverage_map import loadCoverageMap
+from param_sync import syncFleetParams
 from formations.formation_ui_element import loadFormationSelectionFrame
 
 import cflib.crtp
@@ -14,15 +20,28 @@ from direct.gui.DirectGui import DirectFrame
 
 class DroneManager(DirectObject.DirectObject):
 
+    # the parameters every real drone gets after connecting, only values that differ are written
+    PARAMS = {'flightmode.posSet': 1}
+
     def __init__(self, base, droneList):
         self.base = base
         # the actual dimensions of the bcs drone lab in meters
-        # self.roomSize = Vec3(3.40, 4.56, 2.56)
-        # confined dimensions because the room and drone coordinates dont match up yet.
-        # Also, flying near the windows/close to walls/too high often makes the lps loose track
-        self.roomSize = Vec3(1.5, 2, 1.3)
+        self.roomSize = Vec3(3.40, 4.56, 2.56)
+        # confined dimensions, only used if there is no coverage map because the base station poses are missing.
+        # Flying near the windows/close to walls/too high often makes the lps loose track
+        self.confinedRoomSize = Vec3(1.5, 2, 1.3)
+        self.uplinkScheduler = UplinkScheduler()
+        # transforms simulator coordinates to lighthouse coordinates, calibrate it with the c and f keys
+        self.coordTransform = loadCoordTransform()
+        # the part of the room where the base stations can track the drones
+        self.coverageMap = loadCoverageMap(self.roomSize, self.coordTransform)
+        self.calibrationSimPoints = []
+        self.calibrationRealPoints = []
         self.initDrones(droneList)
         self.initUI()
+        self.accept('u', self.printUplinkStats)
+        self.accept('c', self.captureCalibrationPoints)
+        self.accept('f', self.fitCoordTransform)
 
 
     def initDrones(self, droneList):
@@ -132,6 +151,7 @@ class DroneManager(DirectObject.DirectObject):
             print("connecting drones")
             for drone in self.drones:
                 drone.connect()
+            syncFleetParams([drone.scf.cf for drone in self.drones if drone.isConnected], self.PARAMS)
             # time.sleep(5)  # wait a moment so that the position estimator reports a consisten position
         # disconnect drones
         else:
@@ -162,6 +182,11 @@ class DroneManager(DirectObject.DirectObject):
             print("The formation contains {0} points but there are {1} available drones, some drones will remain stationary".format(requiredDrones, availableDrones))
             maxNumber = requiredDrones
 
+        if self.coverageMap is not None:
+            badPoints = np.flatnonzero(~self.coverageMap.isUsable(dronePositions[:maxNumber]))
+            if len(badPoints) > 0:
+                print("Warning: the points {} of the formation are outside of the lighthouse coverage, the drones might loose track".format(badPoints.tolist()))
+
         # print("applying {} formation".format(name))
         for i in range(0, maxNumber):
             self.drones[i].setTarget(Vec3(dronePositions[i, 0], dronePositions[i, 1], dronePositions[i, 2]))
@@ -171,14 +196,56 @@ class DroneManager(DirectObject.DirectObject):
         """Run the update methods of all drones."""
         for drone in self.drones:
             drone.update()
+
+        connectedDrones = [drone for drone in self.drones if drone.isConnected]
+        if connectedDrones:
+            setpoints = np.array([[d.setpoint[0], d.setpoint[1], d.setpoint[2]] for d in connectedDrones])
+            self.uplinkScheduler.sendSetpoints(connectedDrones, self.coordTransform.transformPoints(setpoints))
         return task.cont
 
 
+    def captureCalibrationPoints(self):
+        """Stores the virtual and the real position of each connected drone as a calibration pair.
+            Place or fly the real drones to the spots of the room where their virtual drones are shown before capturing."""
+        for drone in self.drones:
+            sample = drone.telemetry.latest()
+            if drone.isConnected and sample is not None:
+                pos = drone.getPos()
+                self.calibrationSimPoints.append([pos.x, pos.y, pos.z])
+                self.calibrationRealPoints.append(sample[TelemetryBuffer.POSITION])
+        print("{} calibration point pairs captured".format(len(self.calibrationSimPoints)))
+
+
+    def fitCoordTransform(self):
+        """Fits the coordinate transformation to the captured calibration pairs and saves it."""
+        try:
+            error = self.coordTransform.fit(self.calibrationSimPoints, self.calibrationRealPoints)
+        except Exception as e:
+            print(e)
+            return
+        self.coordTransform.save()
+        print("coordinate transformation fitted with an rms error of {:.3f} m and saved".format(error))
+        if self.coverageMap is not None:
+            self.coverageMap.build(self.coordTransform)
+
+
+    def printUplinkStats(self):
+        """Prints how many setpoint packets were sent, suppressed and throttled for each connected drone."""
+        for drone in self.drones:
+            if drone.canConnect:
+                total = max(1, drone.packetsSent + drone.packetsSuppressed + drone.packetsThrottled)
+                print("{}: {} sent, {} suppressed ({:.0f}%), {} throttled ({:.0f}%)".format(drone.uri, drone.packetsSent, drone.packetsSuppressed,
+                                                                                100 * drone.packetsSuppressed / total, drone.packetsThrottled, 100 * drone.packetsThrottled / total))
+
+
     def getRandomRoomCoordinate(self) -> Vec3:
-        """Returns random 3D coordinates withing the confines of the room."""
-        newX = random.uniform(-self.roomSize.x / 2, self.roomSize.x / 2)
-        newY = random.uniform(-self.roomSize.y / 2, self.roomSize.y / 2)
-        newZ = random.uniform(0 + 0.3, self.roomSize.z)
+        """Returns random 3D coordinates withing the part of the room that is covered by the base stations."""
+        if self.coverageMap is not None:
+            point = self.coverageMap.randomPoint()
+            return Vec3(point[0], point[1], point[2])
+        newX = random.uniform(-self.confinedRoomSize.x / 2, self.confinedRoomSize.x / 2)
+        newY = random.uniform(-self.confinedRoomSize.y / 2, self.confinedRoomSize.y / 2)
+        newZ = random.uniform(0 + 0.3, self.confinedRoomSize.z)
         return Vec3(newX, newY, newZ)
 
 
@@ -197,3 +264,20 @@ class DroneManager(DirectObject.DirectObject):
             vel = drone.getVel()
             lst.append([vel.x, vel.y, vel.z])
         return lst
+
+    def getAllRealPositions(self):
+        """Returns the latest reported positions of all real drones in simulator coordinates as an array (drones, 3), NaN for drones without telemetry."""
+        positions = np.full([len(self.drones), 3], np.nan)
+        for i, drone in enumerate(self.drones):
+            sample = drone.telemetry.latest()
+            if sample is not None:
+                positions[i] = sample[TelemetryBuffer.POSITION]
+        return self.coordTransform.inverseTransformPoints(positions)
+
+    def getAllSetpoints(self):
+        """Returns a list of the setpoints of all drones. Usefull when recording their paths for later."""
+        lst = []
+        for drone in self.drones:
+            setpoint = drone.setpoint
+            lst.append([setpoint[0], setpoint[1], setpoint[2]])
+        return lst
@@ -5,6 +5,8 @@ import time
 from camera_controller import CameraController
 from drone_manager import DroneManager
 from recorder import DroneRecorder
+from trajectory_player import TrajectoryPlayer
+from radio_allocator import allocateUris
 
 from direct.showbase.ShowBase import ShowBase
 from panda3d.core import Filename
@@ -45,6 +47,7 @@ class DroneSimulator(ShowBase):
 
         self.droneManager = DroneManager(self, droneList)
         DroneRecorder(self.droneManager)
+        TrajectoryPlayer(self.droneManager)
 
         self.stopwatchOn = False
         self.now = 0
@@ -111,27 +114,35 @@ class DroneSimulator(ShowBase):
 
 
 if __name__ == "__main__":
-    # add drones you want to spawn to the droneList, with an initial position and a uri of a real drone if applicable
-    # if the drone should not be able to connect, put -1 as uri
+    # add drones you want to spawn to the droneList, with an initial position and the address of a real drone if applicable
+    # if the drone should not be able to connect, put -1 as address
+    # the dongles are assigned by the radio allocator, CHANNEL is the radio channel configured on the drones
+    CHANNEL = 80
     droneList = []
 
-    # droneList.append([Vec3(0, 0, .3), 'radio://0/80/2M/E7E7E7E7E4'])
-    # droneList.append([Vec3(1, 1, .3), 'radio://0/80/2M/E7E7E7E7E1'])
-    # droneList.append([Vec3(1, -1, .3), 'radio://0/80/2M/E7E7E7E7E2'])
-    # droneList.append([Vec3(-1, 1, .3), 'radio://0/80/2M/E7E7E7E7E3'])
+    # droneList.append([Vec3(0, 0, .3), 'E7E7E7E7E4'])
+    # droneList.append([Vec3(1, 1, .3), 'E7E7E7E7E1'])
+    # droneList.append([Vec3(1, -1, .3), 'E7E7E7E7E2'])
+    # droneList.append([Vec3(-1, 1, .3), 'E7E7E7E7E3'])
 
 
     dist = 0.8
-    # droneList.append([Vec3(dist, dist, .3), 'radio://0/80/2M/E7E7E7E7E0'])
-    droneList.append([Vec3(dist, 0, .3), 'radio://0/80/2M/E7E7E7E7E1'])
-    # droneList.append([Vec3(dist, -dist, .3), 'radio://0/80/2M/E7E7E7E7E2'])
-    # droneList.append([Vec3(0, 1.5 * dist, .3), 'radio://0/80/2M/E7E7E7E7E3'])
-    # droneList.append([Vec3(0, 0.5 * dist, .3), 'radio://0/80/2M/E7E7E7E7E4'])
-    # droneList.append([Vec3(0, -0.5 * dist, .3), 'radio://0/80/2M/E7E7E7E7E5'])
-    # droneList.append([Vec3(0, -1.5 * dist, .3), 'radio://0/80/2M/E7E7E7E7E6'])
-    # droneList.append([Vec3(-dist, dist, .3), 'radio://0/80/2M/E7E7E7E7E7'])
-    # droneList.append([Vec3(-dist, 0, .3), 'radio://0/80/2M/E7E7E7E7E8'])
-    # droneList.append([Vec3(-dist, -dist, .3), 'radio://0/80/2M/E7E7E7E7E9'])
+    # droneList.append([Vec3(dist, dist, .3), 'E7E7E7E7E0'])
+    droneList.append([Vec3(dist, 0, .3), 'E7E7E7E7E1'])
+    # droneList.append([Vec3(dist, -dist, .3), 'E7E7E7E7E2'])
+    # droneList.append([Vec3(0, 1.5 * dist, .3), 'E7E7E7E7E3'])
+    # droneList.append([Vec3(0, 0.5 * dist, .3), 'E7E7E7E7E4'])
+    # droneList.append([Vec3(0, -0.5 * dist, .3), 'E7E7E7E7E5'])
+    # droneList.append([Vec3(0, -1.5 * dist, .3), 'E7E7E7E7E6'])
+    # droneList.append([Vec3(-dist, dist, .3), 'E7E7E7E7E7'])
+    # droneList.append([Vec3(-dist, 0, .3), 'E7E7E7E7E8'])
+    # droneList.append([Vec3(-dist, -dist, .3), 'E7E7E7E7E9'])
+
+    # replace the addresses by uris with a dongle assigned
+    connectable = [drone for drone in droneList if drone[1] != "-1"]
+    uris = allocateUris([(drone[1], CHANNEL) for drone in connectable])
+    for drone, uri in zip(connectable, uris):
+        drone[1] = uri
 
 
     app = DroneSimulator(droneList)
@@ -0,0 +1,267 @@
+import os
+import time
+import numpy as np
+
+# the actual dimensions of the bcs drone lab in meters, centered around the origin with the floor at z = 0
+ROOMSIZE = (3.40, 4.56, 2.56)
+# the default file of a preview, played by the TrajectoryPlayer of the simulator
+PREVIEWPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "trajectories")
+
+
+def noJerkProfile(s):
+    """The progress of a move of the high level commander at the normalized time s, a 7th order polynomial that starts
+        and ends with zero velocity, acceleration and jerk."""
+    s = np.clip(s, 0, 1)
+    return s**4 * (35 - 84 * s + 70 * s**2 - 20 * s**3)
+
+
+class HlPreview:
+    """Simulates the high level commander of several drones, so a sequence can be checked without flying it.
+        Like the firmware, every command plans a new move from the position the drone has when the command arrives."""
+
+    def __init__(self, startPositions):
+        self.startPositions = np.array(startPositions, dtype=float).reshape((-1, 3))
+        self.agents = self.startPositions.shape[0]
+        self.moves = [[] for _ in range(0, self.agents)]  # per agent a list of (start time, duration, start position, end position)
+
+
+    def positionAt(self, agent, t):
+        return self.sample(np.array([t]), [agent])[0, 0]
+
+
+    def goTo(self, agent, t, x, y, z, duration):
+        start = self.positionAt(agent, t)
+        self.moves[agent].append((t, max(duration, 1e-6), start, np.array([x, y, z], dtype=float)))
+        self.moves[agent].sort(key=lambda move: move[0])
+
+
+    def takeoff(self, agent, t, height, duration):
+        position = self.positionAt(agent, t)
+        self.goTo(agent, t, position[0], position[1], height, duration)
+
+
+    def land(self, agent, t, height, duration):
+        position = self.positionAt(agent, t)
+        self.goTo(agent, t, position[0], position[1], height, duration)
+
+
+    def duration(self):
+        ends = [move[0] + move[1] for moves in self.moves for move in moves]
+        return max(ends) if ends else 0
+
+
+    def sample(self, times, agents=None):
+        """Returns the positions (agents, times, 3) of the agents at all times at once."""
+        times = np.asarray(times, dtype=float)
+        if agents is None:
+            agents = range(0, self.agents)
+        positions = np.zeros([len(agents), len(times), 3])
+        for i, agent in enumerate(agents):
+            moves = self.moves[agent]
+            positions[i] = self.startPositions[agent]
+            if not moves:
+                continue
+            starts = np.array([move[0] for move in moves])
+            durations = np.array([move[1] for move in moves])
+            origins = np.array([move[2] for move in moves])
+            targets = np.array([move[3] for move in moves])
+
+            index = np.searchsorted(starts, times, side="right") - 1
+            started = index >= 0
+            index = np.maximum(index, 0)
+            progress = noJerkProfile((times - starts[index]) / durations[index])
+            moving = origins[index] + (targets[index] - origins[index]) * progress[:, None]
+            positions[i, started] = moving[started]
+        return positions
+
+
+    def analyze(self, rate=50, roomSize=ROOMSIZE, coordTransform=None):
+        """Samples the whole sequence and checks it. Positions are in lighthouse coordinates, with a coordTransform the room is checked in simulator coordinates."""
+        startTime = time.time()
+        times = np.arange(0, self.duration() + 1 / rate, 1 / rate)
+        positions = self.sample(times)
+        roomPositions = positions
+        if coordTransform is not None:
+            roomPositions = coordTransform.inverseTransformPoints(positions.reshape((-1, 3))).reshape(positions.shape)
+
+        report = PreviewReport(times, positions)
+
+        # distance of every pair of drones at every time
+        if self.agents > 1:
+            diff = positions[:, None, :, :] - positions[None, :, :, :]
+            dist = np.linalg.norm(diff, axis=3)
+            dist[np.arange(self.agents), np.arange(self.agents)] = np.inf
+            a, b, step = np.unravel_index(np.argmin(dist), dist.shape)
+            report.minSeparation = dist[a, b, step]
+            report.minSeparationPair = (min(a, b), max(a, b))
+            report.minSeparationTime = times[step]
+
+        lower = np.array([-roomSize[0] / 2, -roomSize[1] / 2, 0])
+        upper = np.array([roomSize[0] / 2, roomSize[1] / 2, roomSize[2]])
+        outside = np.any((roomPositions < lower) | (roomPositions > upper), axis=2)
+        for agent in range(0, self.agents):
+            steps = np.flatnonzero(outside[agent])
+            if len(steps) > 0:
+                report.violations.append((agent, times[steps[0]], times[steps[-1]], roomPositions[agent, steps[0]]))
+
+        report.computeTime = time.time() - startTime
+        return report
+
+
+class PreviewReport:
+    """The sampled positions of a preview and what is wrong with them."""
+
+    def __init__(self, times, positions):
+        self.times = times
+        self.positions = positions  # (agents, times, 3)
+        self.minSeparation = np.inf
+        self.minSeparationPair = None
+        self.minSeparationTime = None
+        self.violations = []  # (agent, first time, last time, first position outside of the room)
+        self.computeTime = 0
+
+
+    def print(self):
+        duration = self.times[-1] if len(self.times) > 0 else 0
+        print("previewed {:.1f} s of flight of {} drones in {:.0f} ms".format(duration, self.positions.shape[0], 1000 * self.computeTime))
+        if self.minSeparationPair is not None:
+            print("minimum separation {:.3f} m between drone {} and {} at {:.2f} s".format(self.minSeparation, self.minSeparationPair[0], self.minSeparationPair[1], self.minSeparationTime))
+        for agent, first, last, position in self.violations:
+            print("drone {} is outside of the room from {:.2f} s to {:.2f} s, first at ({:.2f}, {:.2f}, {:.2f})".format(agent, first, last, position[0], position[1], position[2]))
+        if not self.violations:
+            print("no drone leaves the room")
+
+
+    def save(self, path=PREVIEWPATH):
+        """Saves the preview like a recording of the simulator, the TrajectoryPlayer of the simulator plays it with the p key."""
+        velocities = np.gradient(self.positions, self.times, axis=1) if len(self.times) > 1 else np.zeros(self.positions.shape)
+        np.save(os.path.join(path, "preview_pos_traj.npy"), self.positions)
+        np.save(os.path.join(path, "preview_vel_traj.npy"), velocities)
+        np.save(os.path.join(path, "preview_time.npy"), self.times)
+        print("preview saved to", path)
+
+
+class PreviewPositionHlCommander:
+    """Stands in for the PositionHlCommander of cflib and records the moves in a HlPreview instead of flying.
+        Time passes instantly, so sequences written for the PositionHlCommander run faster than real time."""
+
+    DEFAULT = None
+
+    def __init__(self, preview, agent=0, x=0.0, y=0.0, z=0.0, default_velocity=0.5, default_height=0.5, controller=None, default_landing_height=0.0):
+        self.preview = preview
+        self.agent = agent
+        self.time = 0
+        self._x = x
+        self._y = y
+        self._z = z
+        self._default_velocity = default_velocity
+        self._default_height = default_height
+        self._default_landing_height = default_landing_height
+        self._is_flying = False
+
+
+    def __enter__(self):
+        self.take_off()
+        return self
+
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.land()
+
+
+    def take_off(self, height=DEFAULT, velocity=DEFAULT):
+        if self._is_flying:
+            raise Exception('Already flying')
+        self._is_flying = True
+        height = self._height(height)
+        duration = abs(height - self._z) / self._velocity(velocity)
+        self.preview.takeoff(self.agent, self.time, height, duration)
+        self.time += duration
+        self._z = height
+
+
+    def land(self, velocity=DEFAULT):
+        if self._is_flying:
+            duration = abs(self._z - self._default_landing_height) / self._velocity(velocity)
+            self.preview.land(self.agent, self.time, self._default_landing_height, duration)
+            self.time += duration
+            self._z = self._default_landing_height
+            self._is_flying = False
+
+
+    def left(self, distance_m, velocity=DEFAULT):
+        self.move_distance(0.0, distance_m, 0.0, velocity)
+
+
+    def right(self, distance_m, velocity=DEFAULT):
+        self.move_distance(0.0, -distance_m, 0.0, velocity)
+
+
+    def forward(self, distance_m, velocity=DEFAULT):
+        self.move_distance(distance_m, 0.0, 0.0, velocity)
+
+
+    def back(self, distance_m, velocity=DEFAULT):
+        self.move_distance(-distance_m, 0.0, 0.0, velocity)
+
+
+    def up(self, distance_m, velocity=DEFAULT):
+        self.move_distance(0.0, 0.0, distance_m, velocity)
+
+
+    def down(self, distance_m, velocity=DEFAULT):
+        self.move_distance(0.0, 0.0, -distance_m, velocity)
+
+
+    def move_distance(self, distance_x_m, distance_y_m, distance_z_m, velocity=DEFAULT):
+        self.go_to(self._x + distance_x_m, self._y + distance_y_m, self._z + distance_z_m, velocity)
+
+
+    def go_to(self, x, y, z=DEFAULT, velocity=DEFAULT):
+        z = self._height(z)
+        distance = np.linalg.norm([x - self._x, y - self._y, z - self._z])
+        duration = distance / self._velocity(velocity)
+        self.preview.goTo(self.agent, self.time, x, y, z, duration)
+        self.time += duration
+        self._x = x
+        self._y = y
+        self._z = z
+
+
+    def set_default_velocity(self, velocity):
+        self._default_velocity = velocity
+
+
+    def set_default_height(self, height):
+        self._default_height = height
+
+
+    def get_position(self):
+        return self._x, self._y, self._z
+
+
+    def _velocity(self, velocity):
+        if velocity is self.DEFAULT:
+            return self._default_velocity
+        return velocity
+
+
+    def _height(self, height):
+        if height is self.DEFAULT:
+            return self._default_height
+        return height
+
+
+def previewSequence(sequence, stepTime, startPositions):
+    """Previews a step sequence of synchronizedSequence.py, a list of (step, cf_id, action) with Takeoff, Land, Goto and Ring actions."""
+    preview = HlPreview(startPositions)
+    for step, agent, action in sequence:
+        t = step * stepTime
+        kind = type(action).__name__
+        if kind == 'Takeoff':
+            preview.takeoff(agent, t, action.height, action.time)
+        elif kind == 'Land':
+            preview.land(agent, t, 0.0, action.time)
+        elif kind == 'Goto':
+            preview.goTo(agent, t, action.x, action.y, action.z, action.time)
+    return preview
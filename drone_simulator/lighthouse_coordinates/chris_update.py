@@ -1,3 +1,4 @@
+import os
 import sys
 import openvr
  
@@ -5,10 +6,12 @@ import logging
 import time
  
 import cflib.crtp  # noqa
-from cflib.crazyflie import Crazyflie
 from cflib.crazyflie.mem import LighthouseBsGeometry
 from cflib.crazyflie.mem import MemoryElement
 from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from crazyflie_cache import createCrazyflie  # noqa: E402
  
 # Only output errors from the logging framework
 logging.basicConfig(level=logging.ERROR)
@@ -117,7 +120,7 @@ class WriteMem:
     def __init__(self, uri, bs1, bs2):
         self.data_written = False
  
-        with SyncCrazyflie(uri, cf=Crazyflie(rw_cache='./cache')) as scf:
+        with SyncCrazyflie(uri, cf=createCrazyflie()) as scf:
             mems = scf.cf.mem.get_mems(MemoryElement.TYPE_LH)
  
             count = len(mems)
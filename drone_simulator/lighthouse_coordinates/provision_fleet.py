@@ -0,0 +1,167 @@
+"""
+Writes the base station geometry to all drones of the fleet at the same time.
+
+Each drone is handled in its own thread: the current geometry is read first and drones that already have the
+right one are skipped. Otherwise the geometry is written and read back to verify it. At the end the timing of
+every drone is printed.
+
+The geometry comes from bs_position.txt (same format as used by upload_bs_position.py) or directly from
+SteamVR if USE_OPENVR is set.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cflib.crtp  # noqa
+from cflib.crazyflie.mem import LighthouseBsGeometry
+from cflib.crazyflie.mem import MemoryElement
+from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from coverage_map import loadBsPoses  # noqa: E402
+from crazyflie_cache import createCrazyflie  # noqa: E402
+from radio_allocator import allocateUris  # noqa: E402
+
+# Only output errors from the logging framework
+logging.basicConfig(level=logging.ERROR)
+
+# read the base station poses from SteamVR instead of bs_position.txt
+USE_OPENVR = False
+# scan for drones instead of using the addresses below
+SCAN = False
+
+# the radio channel configured on the drones and the addresses of the drones that should be provisioned
+CHANNEL = 80
+ADDRESSES = ['E7E7E7E7E{}'.format(i) for i in range(10)]
+
+# geometries that differ less than this are considered equal, the memory stores 32 bit floats
+TOLERANCE = 1e-4
+# seconds to wait for a memory read or write
+TIMEOUT = 5
+
+
+def load_bs_geometry(path):
+    """Reads the base station geometries from a file in the format printed by get_bs_position.py."""
+    origins, rotations = loadBsPoses(path)
+    geometry = []
+    for origin, rotation in zip(origins, rotations):
+        bs = LighthouseBsGeometry()
+        bs.origin = origin.tolist()
+        bs.rotation_matrix = rotation.tolist()
+        geometry.append(bs)
+    return geometry
+
+
+def openvr_bs_geometry():
+    """Reads the two base station geometries from SteamVR."""
+    from chris_update import getBsPos
+    bsPoses, offset = getBsPos()
+    geometry = []
+    for pose in bsPoses:
+        if pose is None:
+            raise Exception("Could not find both base stations, is SteamVR running?")
+        bs = LighthouseBsGeometry()
+        bs.origin = [pose[0][3] - offset[0], pose[1][3] - offset[1], pose[2][3] - offset[2]]
+        bs.rotation_matrix = [pose[0][:3], pose[1][:3], pose[2][:3]]
+        geometry.append(bs)
+    return geometry
+
+
+def geometry_matches(current, target):
+    """True if the geometry read from a drone is the same as the target geometry."""
+    if current is None or len(current) < len(target):
+        return False
+    for a, b in zip(current, target):
+        if max(abs(x - y) for x, y in zip(a.origin, b.origin)) > TOLERANCE:
+            return False
+        for rowA, rowB in zip(a.rotation_matrix, b.rotation_matrix):
+            if max(abs(x - y) for x, y in zip(rowA, rowB)) > TOLERANCE:
+                return False
+    return True
+
+
+def read_geometry(mem):
+    """Reads the geometry memory of a drone and returns the list of base station geometries."""
+    done = threading.Event()
+    mem.update(lambda m: done.set())
+    if not done.wait(TIMEOUT):
+        raise Exception("reading the geometry timed out")
+    return list(mem.geometry_data)
+
+
+def write_geometry(mem, geometry):
+    done = threading.Event()
+    mem.geometry_data = geometry
+    mem.write_data(lambda m, addr: done.set())
+    if not done.wait(TIMEOUT):
+        raise Exception("writing the geometry timed out")
+
+
+def provision(uri, geometry):
+    """Makes sure a single drone has the geometry and returns a report dict with the result and the timings."""
+    report = {'uri': uri, 'status': '', 'connect': 0, 'read': 0, 'write': 0, 'verify': 0}
+    start = time.time()
+    try:
+        with SyncCrazyflie(uri, cf=createCrazyflie()) as scf:
+            report['connect'] = time.time() - start
+
+            mems = scf.cf.mem.get_mems(MemoryElement.TYPE_LH)
+            if len(mems) != 1:
+                raise Exception('Unexpected nr of memories found: {}'.format(len(mems)))
+
+            now = time.time()
+            current = read_geometry(mems[0])
+            report['read'] = time.time() - now
+            if geometry_matches(current, geometry):
+                report['status'] = 'up to date'
+                return report
+
+            now = time.time()
+            write_geometry(mems[0], geometry)
+            report['write'] = time.time() - now
+
+            now = time.time()
+            written = read_geometry(mems[0])
+            report['verify'] = time.time() - now
+            report['status'] = 'written' if geometry_matches(written, geometry) else 'VERIFY FAILED'
+    except Exception as e:
+        report['status'] = 'FAILED ({})'.format(e)
+    finally:
+        report['total'] = time.time() - start
+    return report
+
+
+def provision_fleet(uris, geometry):
+    """Provisions all drones concurrently and returns their reports in the order of the uris."""
+    with ThreadPoolExecutor(max_workers=max(1, len(uris))) as executor:
+        return list(executor.map(lambda uri: provision(uri, geometry), uris))
+
+
+def print_reports(reports, duration):
+    print("\n############### PROVISIONING REPORT ###############")
+    for r in reports:
+        print("{:32} {:16} connect {:5.2f}s  read {:5.2f}s  write {:5.2f}s  verify {:5.2f}s  total {:5.2f}s".format(
+            r['uri'], r['status'], r['connect'], r['read'], r['write'], r['verify'], r['total']))
+    print("{} drones in {:.2f}s".format(len(reports), duration))
+
+
+if __name__ == '__main__':
+    if USE_OPENVR:
+        geometry = openvr_bs_geometry()
+    else:
+        geometry = load_bs_geometry(os.path.join(sys.path[0], "bs_position.txt"))
+
+    # Initialize the low-level drivers (don't list the debug drivers)
+    cflib.crtp.init_drivers(enable_debug_driver=False)
+
+    if SCAN:
+        uris = [i[0] for i in cflib.crtp.scan_interfaces()]
+    else:
+        uris = allocateUris([(address, CHANNEL) for address in ADDRESSES])
+
+    start = time.time()
+    reports = provision_fleet(uris, geometry)
+    print_reports(reports, time.time() - start)
@@ -25,13 +25,18 @@
 Example of how to read the Lighthouse base station geometry memory from a
 Crazyflie
 """
+import os
+import sys
 import logging
 import time
 
 import cflib.crtp  # noqa
-from cflib.crazyflie import Crazyflie
 from cflib.crazyflie.mem import MemoryElement
 from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from crazyflie_cache import createCrazyflie  # noqa: E402
+
 # Only output errors from the logging framework
 
 logging.basicConfig(level=logging.ERROR)
@@ -41,7 +46,7 @@ class ReadMem:
     def __init__(self, uri):
         self.got_data = False
 
-        with SyncCrazyflie(uri, cf=Crazyflie(rw_cache='./cache')) as scf:
+        with SyncCrazyflie(uri, cf=createCrazyflie()) as scf:
             mems = scf.cf.mem.get_mems(MemoryElement.TYPE_LH)
 
             count = len(mems)
@@ -28,13 +28,14 @@ import logging
 import time
 import os
 import sys
-import re
 
 import cflib.crtp  # noqa
-from cflib.crazyflie import Crazyflie
-from cflib.crazyflie.mem import LighthouseBsGeometry
 from cflib.crazyflie.mem import MemoryElement
 from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from crazyflie_cache import createCrazyflie  # noqa: E402
+from provision_fleet import load_bs_geometry  # noqa: E402
 # Only output errors from the logging framework
 
 logging.basicConfig(level=logging.ERROR)
@@ -45,7 +46,7 @@ class WriteMem:
         self.data_written = False
         self.got_data = False
 
-        with SyncCrazyflie(uri, cf=Crazyflie(rw_cache='./cache')) as scf:
+        with SyncCrazyflie(uri, cf=createCrazyflie()) as scf:
             mems = scf.cf.mem.get_mems(MemoryElement.TYPE_LH)
 
             count = len(mems)
@@ -83,17 +84,7 @@ if __name__ == '__main__':
     # Initialize the low-level drivers (don't list the debug drivers)
     cflib.crtp.init_drivers(enable_debug_driver=False)
 
-    with open(os.path.join(sys.path[0], "bs_position.txt"), encoding="utf-8") as f:
-        text = f.read()
-    match = re.findall(r'-?\d.\d+', text)
-    numberList = [float(i) for i in match]
-
-    bs1 = LighthouseBsGeometry()
-    bs1.origin = numberList[0:3]
-    bs1.rotation_matrix = [numberList[3:6], numberList[6:9], numberList[9:12]]
-    bs2 = LighthouseBsGeometry()
-    bs2.origin = numberList[12:15]
-    bs2.rotation_matrix = [numberList[15:18], numberList[18:21], numberList[21:24]]
+    bs1, bs2 = load_bs_geometry(os.path.join(sys.path[0], "bs_position.txt"))
 
 
     # URIs to the drones that should be updated
@@ -0,0 +1,102 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from crazyflie_cache import fetchParams, paramUpdates
+
+# Parameters that trigger an action when they are written instead of holding a setting, like kalman.resetEstimation.
+# Comparing them with a profile makes no sense, so they are rejected and still have to be set by hand.
+TRIGGERPARAMS = {'kalman.resetEstimation'}
+
+
+class ParamSyncResult:
+    """What happened to the parameters of one drone."""
+
+    def __init__(self, uri):
+        self.uri = uri
+        self.unchanged = []  # already had the desired value
+        self.written = []  # written and confirmed by the drone
+        self.failed = []  # not confirmed within the timeout
+        self.duration = 0
+
+
+    def __str__(self):
+        text = "{}: {} unchanged, {} written, {:.2f}s".format(self.uri, len(self.unchanged), len(self.written), self.duration)
+        if self.failed:
+            text += ", FAILED: {}".format(", ".join(self.failed))
+        return text
+
+
+def _sameValue(current, desired):
+    """Compares parameter values, cflib stores them as strings."""
+    try:
+        return float(current) == float(desired)
+    except (TypeError, ValueError):
+        return str(current) == str(desired)
+
+
+def syncParams(cf, profile, timeout=2.0):
+    """Brings the parameters of one drone to the values in profile (a dict of complete names like 'ring.effect' and values).
+        Only parameters that differ are written, in the order of the profile, and every write is confirmed by the value the drone reports back."""
+    start = time.time()
+    result = ParamSyncResult(cf.link_uri)
+    triggers = TRIGGERPARAMS.intersection(profile)
+    if triggers:
+        raise Exception("{} can not be synced, set them directly".format(", ".join(sorted(triggers))))
+
+    current = fetchParams(cf, list(profile), timeout)
+    changes = [name for name in profile if name not in current or not _sameValue(current[name], profile[name])]
+    result.unchanged = [name for name in profile if name not in changes]
+
+    # the drone answers every write with the new value, wait until all of them arrived
+    pending = set(changes)
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def updated(name, value):
+        with lock:
+            if name in pending and _sameValue(value, profile[name]):
+                pending.discard(name)
+                if not pending:
+                    done.set()
+
+    updates = paramUpdates(cf)
+    updates.listen(changes, updated)
+    try:
+        for name in changes:
+            cf.param.set_value(name, str(profile[name]))
+        if changes:
+            done.wait(timeout)
+    finally:
+        updates.stopListening(updated)
+
+    with lock:
+        result.failed = [name for name in changes if name in pending]
+        result.written = [name for name in changes if name not in pending]
+    result.duration = time.time() - start
+    return result
+
+
+def syncFleetParams(cfs, profile, timeout=2.0):
+    """Syncs the profile to all drones at the same time and prints what happened on each of them."""
+    with ThreadPoolExecutor(max_workers=max(1, len(cfs))) as executor:
+        results = list(executor.map(lambda cf: syncParams(cf, profile, timeout), cfs))
+    for result in results:
+        print(result)
+    return results
+
+
+def syncSwarmParams(swarm, profile, timeout=2.0):
+    """Syncs the profile to all drones of an open cflib Swarm at the same time."""
+    results = []
+    lock = threading.Lock()
+
+    def sync(scf):
+        result = syncParams(scf.cf, profile, timeout)
+        with lock:
+            results.append(result)
+
+    swarm.parallel_safe(sync)
+    for result in results:
+        print(result)
+    return results
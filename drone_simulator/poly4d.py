@@ -0,0 +1,192 @@
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'gradient_descent'))
+from poly_trajectory import ORDER, polyval, hermiteCoefficients  # noqa: E402
+
+# the derivatives evaluate() returns, in this order
+DERIVATIVES = ['position', 'velocity', 'acceleration', 'jerk']
+
+
+class Poly4DTrajectories:
+    """The Poly4D trajectories of several drones in the format of figure8.py, a list of rows per drone with
+        duration, x^0..x^7, y^0..y^7, z^0..z^7, yaw^0..yaw^7. All segments of all drones are kept in padded arrays,
+        so the whole swarm is evaluated on a time grid at once. After its last segment a drone holds its last position."""
+
+    def __init__(self, trajectories, offsets=None):
+        agents = len(trajectories)
+        segments = max(len(rows) for rows in trajectories)
+        self.durations = np.zeros([agents, segments])
+        self.coefficients = np.zeros([agents, segments, 4, ORDER + 1])  # (agents, segments, x y z yaw, powers)
+        for agent, rows in enumerate(trajectories):
+            rows = np.asarray(rows, dtype=float).reshape((-1, 1 + 4 * (ORDER + 1)))
+            self.durations[agent, :len(rows)] = rows[:, 0]
+            self.coefficients[agent, :len(rows)] = rows[:, 1:].reshape((-1, 4, ORDER + 1))
+            # padding segments hold the end of the last real segment
+            if len(rows) < segments:
+                end = self._segmentEnd(self.coefficients[agent, len(rows) - 1], rows[-1, 0])
+                self.coefficients[agent, len(rows):, :, 0] = end
+        # relative trajectories (start_trajectory(relative=True)) are flown from where the drone is
+        self.offsets = np.zeros([agents, 4]) if offsets is None else np.hstack([np.asarray(offsets, dtype=float).reshape((agents, 3)), np.zeros([agents, 1])])
+        self.startTimes = np.hstack([np.zeros([agents, 1]), np.cumsum(self.durations, axis=1)])
+        self.agents = agents
+
+
+    @staticmethod
+    def _segmentEnd(coefficients, duration):
+        return polyval(coefficients, duration)
+
+
+    def duration(self):
+        return np.max(self.startTimes[:, -1])
+
+
+    def evaluate(self, times, derivatives=4):
+        """Evaluates all drones at the times (T,). Returns a list with the position, velocity, acceleration and jerk
+            (as many as derivatives asks for), each as an array (agents, T, 4) with x, y, z and yaw."""
+        times = np.asarray(times, dtype=float)
+        ends = self.startTimes[:, -1:]
+        # the segment of each drone at each time, the last segment beyond the end
+        index = np.sum(times[None, :, None] >= self.startTimes[:, None, 1:-1], axis=2)  # (agents, T)
+        agentIndex = np.arange(0, self.agents)[:, None]
+        local = np.minimum(times[None, :], ends) - self.startTimes[agentIndex, index]
+        local = np.clip(local, 0, self.durations[agentIndex, index])
+        coefficients = self.coefficients[agentIndex, index]  # (agents, T, 4, 8)
+        holding = times[None, :] > ends  # after the end the drones stand still
+
+        results = []
+        for derivative in range(0, derivatives):
+            value = polyval(coefficients, local[:, :, None], derivative)
+            if derivative == 0:
+                value += self.offsets[:, None, :]
+            else:
+                value[holding] = 0
+            results.append(value)
+        return results
+
+
+    def toSampled(self, times):
+        """Returns the positions and velocities (agents, timesteps, 3) in the format of pos_traj.npy and vel_traj.npy."""
+        positions, velocities = self.evaluate(times, 2)
+        return positions[:, :, :3], velocities[:, :, :3]
+
+
+    @classmethod
+    def fromSampled(cls, positions, velocities, times):
+        """Converts planned trajectories (agents, timesteps, 3) to one segment per timestep, the cubic of poly_trajectory.hermiteCoefficients.
+            Use trajectory_compression.py to get fewer segments."""
+        positions = np.asarray(positions, dtype=float)
+        velocities = np.asarray(velocities, dtype=float)
+        h = np.diff(np.asarray(times, dtype=float))[None, :, None]
+        p0, p1 = positions[:, :-1], positions[:, 1:]
+        v0, v1 = velocities[:, :-1], velocities[:, 1:]
+        c2, c3 = hermiteCoefficients(p0, p1, v0, v1, h)
+
+        agents, steps = p0.shape[0], p0.shape[1]
+        rows = np.zeros([agents, steps, 1 + 4 * (ORDER + 1)])
+        rows[:, :, 0] = h[:, :, 0]
+        for axis in range(0, 3):
+            start = 1 + axis * (ORDER + 1)
+            rows[:, :, start] = p0[:, :, axis]
+            rows[:, :, start + 1] = v0[:, :, axis]
+            rows[:, :, start + 2] = c2[:, :, axis]
+            rows[:, :, start + 3] = c3[:, :, axis]
+        return cls([agentRows.tolist() for agentRows in rows])
+
+
+    def validate(self, rate=100, limits=None):
+        """Checks all drones on a time grid with rate samples per second against the limits and returns a ValidationReport."""
+        startTime = time.time()
+        limits = limits if limits is not None else Poly4DLimits()
+        times = np.arange(0, self.duration() + 1 / rate, 1 / rate)
+        values = self.evaluate(times)
+        report = ValidationReport(times, limits)
+
+        # the largest norm of each derivative per drone
+        for derivative, limit in zip(DERIVATIVES[1:], [limits.maxVelocity, limits.maxAcceleration, limits.maxJerk]):
+            norms = np.linalg.norm(values[DERIVATIVES.index(derivative)][:, :, :3], axis=2)
+            steps = np.argmax(norms, axis=1)
+            for agent in range(0, self.agents):
+                peak = norms[agent, steps[agent]]
+                report.peaks.setdefault(derivative, []).append(peak)
+                if limit is not None and peak > limit:
+                    report.violations.append((agent, derivative, times[steps[agent]], peak, limit))
+
+        positions = values[0][:, :, :3]
+        if limits.lower is not None:
+            outside = np.any((positions < limits.lower) | (positions > limits.upper), axis=2)
+            for agent in range(0, self.agents):
+                steps = np.flatnonzero(outside[agent])
+                if len(steps) > 0:
+                    report.violations.append((agent, 'room', times[steps[0]], positions[agent, steps[0]], None))
+
+        # distance of every pair of drones at every time
+        if self.agents > 1:
+            dist = np.linalg.norm(positions[:, None, :, :] - positions[None, :, :, :], axis=3)
+            dist[np.arange(self.agents), np.arange(self.agents)] = np.inf
+            a, b, step = np.unravel_index(np.argmin(dist), dist.shape)
+            report.minSeparation = dist[a, b, step]
+            report.minSeparationPair = (min(a, b), max(a, b))
+            report.minSeparationTime = times[step]
+            if limits.minSeparation is not None and report.minSeparation < limits.minSeparation:
+                report.violations.append((report.minSeparationPair, 'separation', times[step], report.minSeparation, limits.minSeparation))
+
+        report.computeTime = time.time() - startTime
+        return report
+
+
+class Poly4DLimits:
+    """What a trajectory is allowed to do. None disables a check, without lower and upper bounds the room is not checked."""
+
+    def __init__(self, maxVelocity=1.4, maxAcceleration=4.0, maxJerk=20.0, minSeparation=0.3, lower=None, upper=None):
+        self.maxVelocity = maxVelocity
+        self.maxAcceleration = maxAcceleration
+        self.maxJerk = maxJerk
+        self.minSeparation = minSeparation
+        self.lower = None if lower is None else np.asarray(lower, dtype=float)
+        self.upper = None if upper is None else np.asarray(upper, dtype=float)
+
+
+    @classmethod
+    def room(cls, roomSize, **kwargs):
+        """Limits for a room of roomSize (x, y, z) centered around the origin with the floor at z = 0."""
+        lower = [-roomSize[0] / 2, -roomSize[1] / 2, 0]
+        upper = [roomSize[0] / 2, roomSize[1] / 2, roomSize[2]]
+        return cls(lower=lower, upper=upper, **kwargs)
+
+
+class ValidationReport:
+    """The result of Poly4DTrajectories.validate()."""
+
+    def __init__(self, times, limits):
+        self.times = times
+        self.limits = limits
+        self.peaks = {}  # per derivative the largest norm of each drone
+        self.minSeparation = np.inf
+        self.minSeparationPair = None
+        self.minSeparationTime = None
+        self.violations = []  # (agent or pair, what, time, value, limit)
+        self.computeTime = 0
+
+
+    def isValid(self):
+        return not self.violations
+
+
+    def print(self):
+        print("validated {:.1f} s of {} drones in {:.1f} ms".format(self.times[-1], len(self.peaks.get('velocity', [])), 1000 * self.computeTime))
+        for derivative, peaks in self.peaks.items():
+            print("max {}: {:.2f}".format(derivative, max(peaks)))
+        if self.minSeparationPair is not None:
+            print("minimum separation {:.3f} m between drone {} and {} at {:.2f} s".format(self.minSeparation, self.minSeparationPair[0], self.minSeparationPair[1], self.minSeparationTime))
+        for agent, what, t, value, limit in self.violations:
+            if what == 'separation':
+                print("drones {} and {} are only {:.3f} m apart at {:.2f} s, the limit is {:.2f} m".format(agent[0], agent[1], value, t, limit))
+            elif what == 'room':
+                print("drone {} leaves the room at {:.2f} s at ({:.2f}, {:.2f}, {:.2f})".format(agent, t, value[0], value[1], value[2]))
+            else:
+                print("drone {}: {} {:.2f} exceeds the limit {:.2f} at {:.2f} s".format(agent, what, value, limit, t))
+        if self.isValid():
+            print("all trajectories are within the limits")
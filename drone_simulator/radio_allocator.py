@@ -0,0 +1,162 @@
+from collections import namedtuple
+
+import numpy as np
+
+from uplink_scheduler import UplinkScheduler
+
+# A drone of the fleet. channel is the radio channel stored in the config of the drone, packetRate is the expected amount of packets per second,
+# None for the default of the simulator.
+FleetDrone = namedtuple('FleetDrone', ['address', 'channel', 'packetRate'])
+# The link a drone got assigned to.
+Allocation = namedtuple('Allocation', ['address', 'dongle', 'channel', 'uri'])
+
+# the 50 ms position log of each drone, on top of the setpoints
+LOGRATE = 20
+
+# Traffic model of a crazyradio, times in seconds. Every packet is a full usb round trip including the ack of the drone,
+# switching the channel of a dongle between two packets costs an additional usb control transfer.
+PACKETTIME = {'2M': 0.0008, '1M': 0.0011, '250K': 0.003}
+AIRTIME = {'2M': 0.0003, '1M': 0.0005, '250K': 0.0016}  # time a packet and its ack occupy the channel
+SWITCHTIME = 0.0005
+MAXUTILIZATION = 0.8  # above this the latency of the links goes up quickly and packets get dropped
+
+
+def findDongles():
+    """Returns the indices of all crazyradio dongles that are plugged in, an empty list if there is none or no usb backend to find them."""
+    import usb.core
+    from cflib.drivers.crazyradio import Crazyradio
+    dongles = []
+    while True:
+        try:
+            radio = Crazyradio(devid=len(dongles))
+        except usb.core.NoBackendError:
+            print("Warning: no usb backend found, can not look for crazyradios")
+            return []
+        except Exception:  # there is no dongle with this index
+            return dongles
+        radio.close()
+        dongles.append(len(dongles))
+
+
+def defaultPacketRate(drones):
+    """The packets per second of each of drones drones in the simulator. The UplinkScheduler sends at most PACKETRATE setpoints for all drones together."""
+    return UplinkScheduler.PACKETRATE / max(1, drones) + LOGRATE
+
+
+class RadioAllocator:
+    """Spreads the drones of a fleet over the available dongles so that no dongle gets saturated.
+        The channels are the ones configured on the drones, the load of each channel is predicted to warn about oversubscription."""
+
+    def __init__(self, dongles, datarate='2M'):
+        self.dongles = list(dongles)
+        self.datarate = datarate
+        self.allocations = []
+        self.packetRates = []
+        if not self.dongles:
+            raise Exception('No crazyradio dongles to allocate drones to')
+
+
+    def allocate(self, fleet):
+        """Assigns a dongle to each drone in the fleet and returns the allocations in the order of the fleet.
+            The drones with the highest packet rate are placed first, each one on the dongle that keeps the most loaded
+            dongle or channel as idle as possible."""
+        fleet = [self._toFleetDrone(drone, defaultPacketRate(len(fleet))) for drone in fleet]
+        dongleLoad = np.zeros(len(self.dongles))
+        channelLoad = {}
+        dongleChannels = [set() for _ in self.dongles]
+        allocations = [None] * len(fleet)
+
+        for i in sorted(range(len(fleet)), key=lambda i: -fleet[i].packetRate):
+            drone = fleet[i]
+            channel = drone.channel
+            best = None
+            for d in range(len(self.dongles)):
+                utilization = self._linkUtilization(dongleLoad[d], dongleChannels[d], channelLoad.get(channel, 0), drone.packetRate, channel)
+                if best is None or utilization < best[0]:
+                    best = (utilization, d)
+
+            _, d = best
+            dongleLoad[d] += drone.packetRate
+            dongleChannels[d].add(channel)
+            channelLoad[channel] = channelLoad.get(channel, 0) + drone.packetRate
+            uri = 'radio://{}/{}/{}/{}'.format(self.dongles[d], channel, self.datarate, drone.address)
+            allocations[i] = Allocation(drone.address, self.dongles[d], channel, uri)
+
+        self.allocations = allocations
+        self.packetRates = [drone.packetRate for drone in fleet]
+        return allocations
+
+
+    def predictLoad(self):
+        """Returns the predicted utilization of each dongle and each channel of the current allocation, 1 means saturated."""
+        dongleUtilization = {}
+        for dongle in self.dongles:
+            rates = [rate for a, rate in zip(self.allocations, self.packetRates) if a.dongle == dongle]
+            channels = set(a.channel for a in self.allocations if a.dongle == dongle)
+            dongleUtilization[dongle] = self._dongleUtilization(sum(rates), len(channels))
+
+        channelUtilization = {}
+        for a, rate in zip(self.allocations, self.packetRates):
+            channelUtilization[a.channel] = channelUtilization.get(a.channel, 0) + rate * AIRTIME[self.datarate]
+        return dongleUtilization, channelUtilization
+
+
+    def oversubscribed(self):
+        """Returns the dongles and channels whose predicted utilization is too high for reliable links."""
+        dongleUtilization, channelUtilization = self.predictLoad()
+        dongles = [dongle for dongle, u in dongleUtilization.items() if u > MAXUTILIZATION]
+        channels = [channel for channel, u in channelUtilization.items() if u > MAXUTILIZATION]
+        return dongles, channels
+
+
+    def printReport(self):
+        """Prints the allocation and the predicted load of every dongle and channel."""
+        for a in self.allocations:
+            print(a.uri)
+        dongleUtilization, channelUtilization = self.predictLoad()
+        for dongle, u in dongleUtilization.items():
+            print("dongle {}: {:.0f}% busy{}".format(dongle, 100 * u, " OVERSUBSCRIBED" if u > MAXUTILIZATION else ""))
+        for channel, u in channelUtilization.items():
+            print("channel {}: {:.0f}% airtime{}".format(channel, 100 * u, " OVERSUBSCRIBED" if u > MAXUTILIZATION else ""))
+
+
+    def _dongleUtilization(self, packetRate, channelCount):
+        """A dongle sends the packets of its links round robin, so with more than one channel most packets need a channel switch."""
+        switchRate = packetRate * (channelCount - 1) / max(1, channelCount)
+        return packetRate * PACKETTIME[self.datarate] + switchRate * SWITCHTIME
+
+
+    def _linkUtilization(self, dongleRate, dongleChannels, channelRate, packetRate, channel):
+        """The higher utilization of the dongle and the channel if a drone with packetRate was added to them."""
+        channelCount = len(dongleChannels | {channel})
+        dongle = self._dongleUtilization(dongleRate + packetRate, channelCount)
+        air = (channelRate + packetRate) * AIRTIME[self.datarate]
+        return max(dongle, air)
+
+
+    def _toFleetDrone(self, drone, packetRate):
+        """Fleet entries can be a FleetDrone or an (address, channel) tuple, packetRate is used for the ones without a packet rate."""
+        if not isinstance(drone, FleetDrone):
+            drone = FleetDrone(drone[0], drone[1], None)
+        if drone.packetRate is None:
+            drone = drone._replace(packetRate=packetRate)
+        return drone
+
+
+def allocateUris(fleet, dongles=None, datarate='2M'):
+    """Allocates the fleet to the dongles that are plugged in and returns the uris in the order of the fleet.
+        Warns if the predicted traffic is more than the radios can handle."""
+    if not fleet:
+        return []
+    if dongles is None:
+        dongles = findDongles()
+    if not dongles:
+        print("Warning: no crazyradio found, allocating all drones to dongle 0")
+        dongles = [0]
+    allocator = RadioAllocator(dongles, datarate)
+    allocations = allocator.allocate(fleet)
+    busyDongles, busyChannels = allocator.oversubscribed()
+    if busyDongles or busyChannels:
+        print("Warning: the radio links are oversubscribed (dongles {}, channels {}), add dongles or move drones to other channels".format(busyDongles, busyChannels))
+        allocator.printReport()
+    return [a.uri for a in allocations]
@@ -1,8 +1,12 @@
 import os
 import sys
+import time
 import numpy as np
 from direct.showbase import DirectObject
 
+from telemetry import alignSamples
+from telemetry import trackingError
+
 
 class DroneRecorder(DirectObject.DirectObject):
 
@@ -10,32 +14,66 @@ class DroneRecorder(DirectObject.DirectObject):
         self.droneManager = droneManager
         self.recordingLstPos = []
         self.recordingLstVel = []
+        self.recordingLstSetpoint = []
+        self.recordingLstTime = []
+        self.telemetryStart = []  # the telemetry sample count of each drone when the recording started
         self.isRecording = False
         self.accept('space', self.toggleRecording)
 
 
     def recordDronesTask(self, task):
         task.delayTime = 0.05
+        self.recordingLstTime.append(time.time())
         self.recordingLstPos.append(self.droneManager.getAllPositions())
         self.recordingLstVel.append(self.droneManager.getAllVelocities())
+        self.recordingLstSetpoint.append(self.droneManager.getAllSetpoints())
         # print("recording")
         return task.again
 
 
     def save(self):
+        if not self.recordingLstTime:
+            print("nothing recorded, nothing saved")
+            return
+        path = sys.path[0] + "/trajectories/"
         posTraj = np.asarray(self.recordingLstPos)
         posTraj = np.swapaxes(posTraj, 0, 1)  # make array in the shape agent, timestep, dimension
-        np.save(sys.path[0] + "/trajectories/pos_traj.npy", posTraj)
+        np.save(path + "pos_traj.npy", posTraj)
         velTraj = np.asarray(self.recordingLstVel)
         velTraj = np.swapaxes(velTraj, 0, 1)  # make array in the shape agent, timestep, dimension
-        np.save(sys.path[0] + "/trajectories/vel_traj.npy", velTraj)
+        np.save(path + "vel_traj.npy", velTraj)
         print("recording saved")
 
+        # the real drones report their positions on their own clock, align them with the recorded timesteps
+        times = np.asarray(self.recordingLstTime)
+        setpointTraj = np.swapaxes(np.asarray(self.recordingLstSetpoint), 0, 1)
+        realPosTraj = np.full(posTraj.shape, np.nan)
+        linkTime = np.full(posTraj.shape[:2], np.nan)
+        for i, drone in enumerate(self.droneManager.drones):
+            samples = drone.telemetry.samples(self.telemetryStart[i])
+            realPosTraj[i], linkTime[i] = alignSamples(samples, times)
+        # the real positions are lighthouse coordinates, transform all of them at once to simulator coordinates
+        realPosTraj = self.droneManager.coordTransform.inverseTransformPoints(realPosTraj.reshape(-1, 3)).reshape(realPosTraj.shape)
+        np.save(path + "time.npy", times - times[0])
+        np.save(path + "setpoint_traj.npy", setpointTraj)
+        np.save(path + "real_pos_traj.npy", realPosTraj)
+        np.save(path + "link_time.npy", linkTime)
+
+        rms, maxError = trackingError(realPosTraj, setpointTraj)
+        for i, drone in enumerate(self.droneManager.drones):
+            if not np.isnan(rms[i]):
+                print("{}: tracking error rms {:.3f} m, max {:.3f} m".format(drone.uri, rms[i], maxError[i]))
+
 
     def toggleRecording(self):
         if not self.isRecording:
             print("recording started")
             self.isRecording = True
+            self.recordingLstPos = []
+            self.recordingLstVel = []
+            self.recordingLstSetpoint = []
+            self.recordingLstTime = []
+            self.telemetryStart = [drone.telemetry.count for drone in self.droneManager.drones]
             self.droneManager.base.taskMgr.doMethodLater(0, self.recordDronesTask, "RecordDrones")
         else:
             self.isRecording = False
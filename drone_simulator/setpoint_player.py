@@ -0,0 +1,153 @@
+import math
+import time
+from collections import namedtuple
+import numpy as np
+
+# A part of a flight program. mode is 'forward', 'reverse' or 'hold'. Forward and reverse play the whole source,
+# hold keeps the drones at the time at of the source (the end if at is None) for duration seconds.
+Segment = namedtuple('Segment', ['source', 'mode', 'duration', 'at'])
+
+
+def forward(source):
+    return Segment(source, 'forward', source.duration, None)
+
+
+def reverse(source):
+    return Segment(source, 'reverse', source.duration, None)
+
+
+def hold(source, duration, at=None):
+    return Segment(source, 'hold', duration, at)
+
+
+class PlannedTrajectory:
+    """The trajectories of gradient_descent.py, interpolated with one cubic per timestep.
+        The planner keeps the jerk constant during a timestep, so with the position and velocity at both ends the cubic is exactly the planned motion."""
+
+    def __init__(self, positions, velocities, timestep=None, times=None):
+        self.positions = np.asarray(positions, dtype=float)  # (agents, timesteps, 3)
+        self.velocities = np.asarray(velocities, dtype=float)
+        if times is None:
+            times = np.arange(0, self.positions.shape[1]) * timestep
+        self.times = np.asarray(times, dtype=float)
+        self.duration = self.times[-1] - self.times[0]
+
+
+    def sample(self, t):
+        """Returns the positions (agents, 3) of all agents at t seconds after the start."""
+        t = min(max(t + self.times[0], self.times[0]), self.times[-1])
+        k = min(max(np.searchsorted(self.times, t, side="right") - 1, 0), len(self.times) - 2)
+        h = self.times[k + 1] - self.times[k]
+        s = (t - self.times[k]) / h
+        p0, p1 = self.positions[:, k], self.positions[:, k + 1]
+        v0, v1 = self.velocities[:, k] * h, self.velocities[:, k + 1] * h
+        return p0 + v0 * s + (3 * (p1 - p0) - 2 * v0 - v1) * s**2 + (2 * (p0 - p1) + v0 + v1) * s**3
+
+
+class Waypoints:
+    """Waypoint sequences in the format of swarmSequence.py, a list of (x, y, z, time) per agent.
+        Each waypoint is approached with a smooth transition and then held until its time is over.
+        Without start positions the drones start on the floor below their first waypoint."""
+
+    def __init__(self, sequences, transitionTime=1.0, start=None):
+        self.transitionTime = transitionTime
+        self.agents = []
+        self.duration = 0
+        for i, sequence in enumerate(sequences):
+            points = np.array([waypoint[0:3] for waypoint in sequence], dtype=float)
+            durations = np.array([waypoint[3] for waypoint in sequence], dtype=float)
+            if start is None:
+                previous = np.array([points[0, 0], points[0, 1], 0])
+            else:
+                previous = np.asarray(start[i], dtype=float)
+            origins = np.vstack([previous, points[:-1]])
+            startTimes = np.concatenate([[0], np.cumsum(durations)[:-1]])
+            self.agents.append((points, origins, startTimes, np.minimum(durations, transitionTime)))
+            self.duration = max(self.duration, startTimes[-1] + durations[-1])
+
+
+    def sample(self, t):
+        positions = np.zeros([len(self.agents), 3])
+        for i, (points, origins, startTimes, transitions) in enumerate(self.agents):
+            k = max(np.searchsorted(startTimes, t, side="right") - 1, 0)
+            s = min(max((t - startTimes[k]) / max(transitions[k], 1e-9), 0), 1)
+            # 7th order profile without jumps in velocity, acceleration and jerk
+            smooth = 35 * s**4 - 84 * s**5 + 70 * s**6 - 20 * s**7
+            positions[i] = origins[k] + (points[k] - origins[k]) * smooth
+        return positions
+
+
+class Program:
+    """A list of segments that are played one after another."""
+
+    def __init__(self, segments):
+        self.segments = segments
+        self.startTimes = np.concatenate([[0], np.cumsum([segment.duration for segment in segments])])
+        self.duration = self.startTimes[-1]
+
+
+    def sample(self, t):
+        k = min(max(np.searchsorted(self.startTimes, t, side="right") - 1, 0), len(self.segments) - 1)
+        segment = self.segments[k]
+        local = min(t - self.startTimes[k], segment.duration)
+        if segment.mode == 'forward':
+            return segment.source.sample(local)
+        if segment.mode == 'reverse':
+            return segment.source.sample(segment.source.duration - local)
+        if segment.at is None:
+            return segment.source.sample(segment.source.duration)
+        return segment.source.sample(segment.at)
+
+
+class SetpointPlayer:
+    """Streams a program to all drones from a single thread. Every setpoint is sampled at its own deadline on one shared monotonic clock,
+        so the drones stay in sync and the flight takes exactly as long as planned, no matter how long sending takes."""
+
+    def __init__(self, cfs, program, agents=None, rate=50):
+        self.cfs = cfs
+        self.program = program
+        self.agents = agents if agents is not None else list(range(0, len(cfs)))  # the agent of the program each drone flies
+        self.rate = rate
+        self.lateTicks = 0
+        self.maxLateness = 0
+
+
+    def play(self):
+        period = 1 / self.rate
+        ticks = int(math.ceil(self.program.duration * self.rate)) + 1
+        start = time.monotonic()
+        tick = 0
+        while tick < ticks:
+            deadline = start + tick * period
+            remaining = deadline - time.monotonic()
+            if remaining > 0:
+                time.sleep(remaining)
+            else:
+                lateness = -remaining
+                self.maxLateness = max(self.maxLateness, lateness)
+                if lateness > period:
+                    # skip the setpoints that are already outdated instead of sending them in a burst
+                    self.lateTicks += int(lateness / period)
+                    tick += int(lateness / period)
+
+            positions = self.program.sample(min(tick * period, self.program.duration))
+            for cf, agent in zip(self.cfs, self.agents):
+                cf.commander.send_position_setpoint(positions[agent, 0], positions[agent, 1], positions[agent, 2], 0)
+            tick += 1
+
+        print("played {:.1f} s at {} Hz, {} setpoints skipped, max lateness {:.1f} ms".format(self.program.duration, self.rate, self.lateTicks, 1000 * self.maxLateness))
+
+
+    def stop(self):
+        for cf in self.cfs:
+            cf.commander.send_stop_setpoint()
+        # Make sure that the last packet leaves before the link is closed
+        # since the message queue is not flushed before closing
+        time.sleep(0.1)
+
+
+def collectCrazyflies(swarm, uris):
+    """Returns the Crazyflie objects of an open Swarm in the order of the uris, so a single thread can send to all of them."""
+    cfs = {}
+    swarm.sequential(lambda scf: cfs.__setitem__(scf.cf.link_uri, scf.cf))
+    return [cfs[uri] for uri in uris]
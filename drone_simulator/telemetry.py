@@ -0,0 +1,74 @@
+import numpy as np
+
+
+class TelemetryBuffer:
+    """A preallocated ring buffer for the position samples of one real drone.
+        The log callback of cflib is the only writer. It fills a row before publishing it by advancing the counter,
+        so the simulator can read the samples without a lock."""
+
+    # columns of a sample
+    HOSTTIME = 0  # time.time() when the sample arrived
+    LINKTIME = 1  # timestamp of the drone in ms
+    POSITION = slice(2, 5)
+    COLUMNS = 5
+
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.data = np.zeros([capacity, self.COLUMNS])
+        self.count = 0  # the amount of samples ever written, only changed by the writer
+
+
+    def append(self, hostTime, linkTime, x, y, z):
+        """Stores a sample, only call this from a single thread."""
+        row = self.count % self.capacity
+        self.data[row, self.HOSTTIME] = hostTime
+        self.data[row, self.LINKTIME] = linkTime
+        self.data[row, self.POSITION] = (x, y, z)
+        self.count += 1
+
+
+    def latest(self):
+        """Returns the newest sample or None if there is none yet."""
+        count = self.count
+        if count == 0:
+            return None
+        return self.data[(count - 1) % self.capacity].copy()
+
+
+    def samples(self, start=0):
+        """Returns a copy of all samples with an index of at least start that are still in the buffer, oldest first."""
+        count = self.count
+        start = max(start, count - self.capacity)
+        rows = np.arange(start, count) % self.capacity
+        return self.data[rows]
+
+
+def alignSamples(samples, times):
+    """Interpolates telemetry samples onto the supplied host times and returns the positions (times, 3) and the link timestamps (times,).
+        Times outside of the recorded samples are NaN."""
+    positions = np.full([len(times), 3], np.nan)
+    linkTimes = np.full(len(times), np.nan)
+    if len(samples) < 2:
+        return positions, linkTimes
+
+    hostTimes = samples[:, TelemetryBuffer.HOSTTIME]
+    samplePositions = samples[:, TelemetryBuffer.POSITION]
+    inside = (times >= hostTimes[0]) & (times <= hostTimes[-1])
+    for axis in range(0, 3):
+        positions[inside, axis] = np.interp(times[inside], hostTimes, samplePositions[:, axis])
+    linkTimes[inside] = np.interp(times[inside], hostTimes, samples[:, TelemetryBuffer.LINKTIME])
+    return positions, linkTimes
+
+
+def trackingError(actual, target):
+    """Computes the tracking error of all drones at once. Both arrays have the shape (agents, timesteps, 3), missing samples are NaN.
+        Returns the root mean square and the maximum distance between actual and target position for each agent."""
+    dist = np.linalg.norm(actual - target, axis=2)
+    valid = ~np.isnan(dist)
+    count = np.maximum(valid.sum(axis=1), 1)
+    dist = np.where(valid, dist, 0)
+    rms = np.sqrt(np.sum(dist**2, axis=1) / count)
+    maxError = np.max(dist, axis=1)
+    rms[~valid.any(axis=1)] = np.nan
+    maxError[~valid.any(axis=1)] = np.nan
+    return rms, maxError
@@ -0,0 +1,69 @@
+import os
+import time
+import numpy as np
+from direct.showbase import DirectObject
+from panda3d.core import Vec3
+
+from hl_preview import PREVIEWPATH
+
+
+class TrajectoryPlayer(DirectObject.DirectObject):
+    """Plays a saved preview of the high level commander with the virtual drones, press p to start and stop.
+        The positions of the preview are lighthouse coordinates, they are transformed to the simulator like the real drones."""
+
+    def __init__(self, droneManager, path=PREVIEWPATH):
+        self.droneManager = droneManager
+        self.path = path
+        self.isPlaying = False
+        self.accept('p', self.togglePlayback)
+
+
+    def load(self):
+        positions = np.load(os.path.join(self.path, "preview_pos_traj.npy"))
+        velocities = np.load(os.path.join(self.path, "preview_vel_traj.npy"))
+        self.times = np.load(os.path.join(self.path, "preview_time.npy"))
+        transform = self.droneManager.coordTransform
+        self.positions = transform.inverseTransformPoints(positions.reshape((-1, 3))).reshape(positions.shape)
+        self.velocities = velocities.reshape((-1, 3)).dot(transform.inverseRotation).reshape(velocities.shape)
+
+
+    def togglePlayback(self):
+        if self.isPlaying:
+            self.stop()
+            return
+        if not os.path.exists(os.path.join(self.path, "preview_pos_traj.npy")):
+            print("no preview found in", self.path)
+            return
+        self.load()
+        agents = min(self.positions.shape[0], len(self.droneManager.drones))
+        if agents < self.positions.shape[0]:
+            print("The preview contains {} drones but there are only {}, the rest is not shown".format(self.positions.shape[0], agents))
+        self.agents = agents
+        self.startTime = time.time()
+        self.isPlaying = True
+        print("playing preview of {:.1f} s".format(self.times[-1]))
+        self.droneManager.base.taskMgr.add(self.playTask, "PlayPreview")
+
+
+    def stop(self):
+        self.isPlaying = False
+        self.droneManager.base.taskMgr.remove("PlayPreview")
+        # keep the drones where the playback stopped
+        for drone in self.droneManager.drones:
+            drone.setTarget(drone.getPos())
+        print("preview stopped")
+
+
+    def playTask(self, task):
+        t = time.time() - self.startTime
+        step = min(np.searchsorted(self.times, t), len(self.times) - 1)
+        for i in range(0, self.agents):
+            drone = self.droneManager.drones[i]
+            pos = Vec3(*self.positions[i, step])
+            drone.setPos(pos)
+            drone.setVel(Vec3(*self.velocities[i, step]))
+            drone.setTarget(pos)
+        if t > self.times[-1]:
+            self.stop()
+            return task.done
+        return task.cont
@@ -0,0 +1,63 @@
+import time
+
+import numpy as np
+
+
+class UplinkScheduler:
+    """Decides which connected drones get a position setpoint packet in the current frame.
+        Drones whose setpoint barely changed since their last packet are suppressed and only get the keep-alives
+        the commander watchdog of the firmware needs. The airtime saved that way goes to the drones that are moving."""
+
+    # setpoints that moved less than this (in m) since the last packet of a drone are not retransmitted
+    SETPOINTTHRESHOLD = 0.005
+    # max time in s between two packets of the same drone, the firmware stops trusting setpoints after 0.5 s
+    KEEPALIVEINTERVAL = 0.2
+    # amount of setpoint packets per second the radio can transmit for all drones together
+    PACKETRATE = 500
+    # the max amount of unused packet credits that can be saved for later frames
+    MAXCREDITS = 50
+
+    def __init__(self, threshold=SETPOINTTHRESHOLD, keepAliveInterval=KEEPALIVEINTERVAL, packetRate=PACKETRATE):
+        self.threshold = threshold
+        self.keepAliveInterval = keepAliveInterval
+        self.packetRate = packetRate
+        self.credits = 0
+        self.lastFrameTime = None
+
+
+    def schedule(self, setpoints, lastSentSetpoints, lastSendTimes, now):
+        """Returns the indices of the drones that should send their setpoint this frame, most urgent first.
+            setpoints and lastSentSetpoints are arrays of shape (drones, 3), lastSendTimes has the shape (drones,).
+            Drones whose keep-alive is due are always sent, the remaining packet credits go to the drones that moved the most."""
+        if self.lastFrameTime is not None:
+            self.credits = min(self.credits + self.packetRate * (now - self.lastFrameTime), self.MAXCREDITS)
+        self.lastFrameTime = now
+
+        deltas = np.linalg.norm(setpoints - lastSentSetpoints, axis=1)
+        keepAliveDue = np.flatnonzero(now - lastSendTimes >= self.keepAliveInterval)
+        moving = np.flatnonzero((deltas >= self.threshold) & (now - lastSendTimes < self.keepAliveInterval))
+        moving = moving[np.argsort(-deltas[moving])]  # send the drones with the largest setpoint change first
+
+        freeSlots = max(0, int(self.credits) - keepAliveDue.size)
+        selected = np.concatenate((keepAliveDue, moving[:freeSlots]))
+        self.credits = max(0, self.credits - selected.size)
+        return selected
+
+
+    def sendSetpoints(self, drones, setpoints):
+        """Sends the setpoints (drones, 3) of the supplied connected drones according to the schedule.
+            Drones that are not sent count as suppressed if their setpoint barely changed and as throttled if they moved but ran out of credits."""
+        now = time.monotonic()
+        lastSentSetpoints = np.array([d.lastSentSetpoint for d in drones])
+        lastSendTimes = np.array([d.lastSendTime for d in drones])
+
+        selected = self.schedule(setpoints, lastSentSetpoints, lastSendTimes, now)
+        isSelected = np.zeros(len(drones), dtype=bool)
+        isSelected[selected] = True
+        for i in selected:
+            drones[i].sendPosition(setpoints[i], now)
+        moved = np.linalg.norm(setpoints - lastSentSetpoints, axis=1) >= self.threshold
+        for i in np.flatnonzero(~isSelected & moved):
+            drones[i].packetsThrottled += 1
+        for i in np.flatnonzero(~isSelected & ~moved):
+            drones[i].packetsSuppressed += 1
@@ -0,0 +1,188 @@
+"""
+Plans many independent scenarios (formation transitions, seeds, weights) with the same number of agents and timesteps at once.
+All arrays get a leading batch dimension, so one vectorized pass advances every scenario and the Python overhead is paid once per iteration
+instead of once per scenario. Run it to precompute the transitions between all formations of the drone simulator with the same number of drones.
+"""
+import os
+import sys
+import time
+import numpy as np
+
+from gradient_descent import jerkOperators, startMotion, endStateCosts, endStateGradient, PairSums, pairDistances, collisionCost, addCollisionGradient
+from optimizers import Adam, StoppingCriteria
+
+
+def _perScenario(value, batch):
+    """Weights can be the same for all scenarios or one per scenario, returns them as (batch, 1, 1) to broadcast over agents and dimensions."""
+    return np.broadcast_to(np.asarray(value, dtype=float), (batch,)).reshape((batch, 1, 1))
+
+
+class BatchCostFunctions():
+    """The cost of CostFunctions for a batch of scenarios, computed by the same cost terms. The start and target states are (batch, agents, dim),
+        the weights are numbers or (batch,) arrays, jerks and gradients are (batch, agents, timesteps, dim)."""
+
+    def __init__(self, wVel, wPos, wCol, minDist, timesteps, startVel, startPos, targetVel, targetPos, t, startAcc=None):
+        self.startVel = np.asarray(startVel, dtype=float)
+        self.startPos = np.asarray(startPos, dtype=float)
+        self.startAcc = np.zeros(self.startVel.shape) if startAcc is None else np.asarray(startAcc, dtype=float)
+        self.targetVel = np.asarray(targetVel, dtype=float)
+        self.targetPos = np.asarray(targetPos, dtype=float)
+        self.batch, self.agents, self.dim = self.startPos.shape
+        self.timesteps = timesteps
+        self.t = t
+
+        self.wVel = _perScenario(wVel, self.batch)
+        self.wPos = _perScenario(wPos, self.batch)
+        self.wCol = _perScenario(wCol, self.batch)
+        self.minDist = _perScenario(minDist, self.batch)
+        self.pairSums = PairSums(np.triu_indices(self.agents, 1))
+        self._allocateWorkspace()
+
+
+    def _allocateWorkspace(self):
+        batch, agents, timesteps, dim = self.batch, self.agents, self.timesteps, self.dim
+        pairs = len(self.pairSums.pairs[0])
+        self.startVelocities = np.zeros([batch, agents, timesteps, dim])
+        self.startPositions = np.zeros([batch, agents, timesteps, dim])
+        startMotion(self.startPos, self.startVel, self.startAcc, timesteps, self.t, self.startVelocities, self.startPositions)
+        self.velocities = np.zeros([batch, agents, timesteps, dim])
+        self.positions = np.zeros([batch, agents, timesteps, dim])
+        self.costs = np.zeros(batch)
+        self.costGrad = np.zeros([batch, agents, timesteps, dim])
+
+        self._posDiff = np.zeros([batch, pairs, timesteps, dim])
+        self._dist = np.zeros([batch, pairs, timesteps])
+        self._conflictMask = np.zeros([batch, pairs, timesteps], dtype=bool)
+        self._stepGrad = np.zeros([batch, agents, timesteps, dim])
+        self._collisionGrad = np.zeros([batch, agents, timesteps, dim])
+
+
+    def _calculateTrajectories(self, jerks):
+        velocityOp, positionOp = jerkOperators(self.timesteps, self.t)
+        np.matmul(velocityOp, jerks, out=self.velocities)
+        self.velocities += self.startVelocities
+        np.matmul(positionOp, jerks, out=self.positions)
+        self.positions += self.startPositions
+
+
+    def _endState(self):
+        """Writes the end state cost of each scenario into costs and its gradient into costGrad."""
+        velocityOp, positionOp = jerkOperators(self.timesteps, self.t)
+        velocityCosts, positionCosts = endStateCosts(self.velocities, self.positions, self.targetVel, self.targetPos, self.wVel, self.wPos)
+        np.add(velocityCosts, positionCosts, out=self.costs)
+        endStateGradient(self.velocities, self.positions, self.targetVel, self.targetPos, self.wVel, self.wPos, velocityOp, positionOp, self.costGrad)
+
+
+    def _collisions(self):
+        """Adds the collision cost of each scenario to costs and its exact gradient to costGrad."""
+        if self.agents < 2:
+            return
+        pairDistances(self.positions, self.pairSums.pairs, self.minDist, self._posDiff, self._dist, self._conflictMask)
+        self.costs += collisionCost(self._dist, self._conflictMask, self.minDist, self.wCol)
+        addCollisionGradient(self._posDiff, self._dist, self._conflictMask, self.minDist, self.wCol, self.pairSums,
+                             jerkOperators(self.timesteps, self.t)[1].T, self._stepGrad, self._collisionGrad, self.costGrad)
+
+
+    def valueAndGradient(self, jerks, collision=True):
+        """Returns the costs (batch,) and the gradients (batch, agents, timesteps, dim), both arrays of the workspace."""
+        self._calculateTrajectories(jerks)
+        self._endState()
+        if collision:
+            self._collisions()
+        return self.costs, self.costGrad
+
+
+class _BatchProblem:
+    """A batch as one problem for an Optimizer. A scenario stops as soon as its cost is below its cost target, its gradient is 0 from then on.
+        The cost is how far the worst scenario is above its cost target, so the optimizer stops at the cost target 0 when all of them did."""
+
+    def __init__(self, valueAndGradient, costTargets, batch):
+        self.batchValueAndGradient = valueAndGradient
+        self.costTargets = np.broadcast_to(np.asarray(costTargets, dtype=float), (batch,))
+        self.costs = np.zeros(batch)
+        self.active = np.ones(batch, dtype=bool)
+        self.iterations = np.zeros(batch, dtype=int)
+        self.evaluations = 0
+
+
+    def valueAndGradient(self, parameters):
+        costs, gradient = self.batchValueAndGradient(parameters)
+        self.costs[:] = costs
+        done = self.active & (costs < self.costTargets)
+        self.active &= ~done
+        # Adam evaluates once per iteration, the evaluation before iteration i is the i-th one
+        self.iterations[self.active | done] = self.evaluations
+        self.evaluations += 1
+        gradient[~self.active] = 0
+        return np.max(costs - self.costTargets), gradient
+
+
+class _BatchAdam(Adam):
+    """Adam on a _BatchProblem, the moments of the scenarios that stopped are cleared so their parameters stay where they are."""
+
+    def step(self, iteration, parameters, cost, gradient, evaluate):
+        self.m[~self.problem.active] = 0
+        return super().step(iteration, parameters, cost, gradient, evaluate)
+
+
+def batchAdamGradientDescent(valueAndGradient, costTargets, initialParameters, parameterLimit, stepsize, maxSteps, beta1, beta2, eps):
+    """adamGradientDescent for a batch of scenarios. Every scenario stops on its own as soon as its cost is below its cost target,
+        the whole batch stops when all of them did. Returns the parameters, the costs of them and the iterations each scenario needed."""
+    parameters = np.array(initialParameters, dtype=float)
+    batch = parameters.shape[0]
+    problem = _BatchProblem(valueAndGradient, costTargets, batch)
+    result = _BatchAdam(stepsize, beta1, beta2, eps).minimize(problem, parameters, parameterLimit, StoppingCriteria(0, maxSteps))
+
+    reached = ~problem.active
+    print("{} of {} scenarios reached their cost target, the slowest after {} iterations".format(np.count_nonzero(reached), batch, np.max(problem.iterations)))
+    return result.parameters, np.array(problem.costs), problem.iterations
+
+
+def loadFormations(directory):
+    """Loads the formation files of the drone simulator, returns a dict from the name to the positions (drones, 3)."""
+    formations = {}
+    for file in sorted(os.listdir(directory)):
+        if file.endswith(".csv"):
+            formations[os.path.splitext(file)[0]] = np.loadtxt(os.path.join(directory, file), delimiter=",", ndmin=2)
+    return formations
+
+
+# the same settings as gradient_descent.py
+TIMESTEPS = 20
+TIMESTEP = .3
+MAXJERK = 0.3
+WVEL = 5
+WPOS = 5
+WCOL = .5
+MINDIST = .6
+
+
+if __name__ == '__main__':
+    formations = loadFormations(os.path.join(sys.path[0], "..", "drone_simulator", "formations"))
+    libraryPath = os.path.join(sys.path[0], "trajectories", "library")
+    os.makedirs(libraryPath, exist_ok=True)
+
+    # every transition between two formations with the same number of drones, one batch per number of drones
+    batches = {}
+    for startName, start in formations.items():
+        for targetName, target in formations.items():
+            if startName != targetName and start.shape == target.shape:
+                batches.setdefault(start.shape[0], []).append((startName, targetName))
+
+    for agents, transitions in sorted(batches.items()):
+        startTime = time.time()
+        startPos = np.array([formations[start] for start, _ in transitions])
+        targetPos = np.array([formations[target] for _, target in transitions])
+        zeros = np.zeros(startPos.shape)
+        costFun = BatchCostFunctions(WVEL, WPOS, WCOL, MINDIST, TIMESTEPS, zeros, startPos, zeros, targetPos, TIMESTEP)
+
+        jerks = np.zeros([len(transitions), agents, TIMESTEPS, 3])
+        initialResult, _, _ = batchAdamGradientDescent(lambda jerks: costFun.valueAndGradient(jerks, False), 0, jerks, MAXJERK, 0.01, 50, 0.95, 0.99, 10**(-8))
+        result, costs, iterations = batchAdamGradientDescent(costFun.valueAndGradient, 0.05, initialResult, MAXJERK, 0.005, 3000, 0.95, 0.99, 10**(-8))
+        costFun.valueAndGradient(result)
+        print("{} transitions of {} drones planned in {:.2f} s".format(len(transitions), agents, time.time() - startTime))
+
+        for i, (start, target) in enumerate(transitions):
+            name = "{}_to_{}".format(start, target)
+            np.save(os.path.join(libraryPath, name + "_pos_traj.npy"), costFun.positions[i])
+            np.save(os.path.join(libraryPath, name + "_vel_traj.npy"), costFun.velocities[i])
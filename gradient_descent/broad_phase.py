@@ -0,0 +1,76 @@
+import itertools
+import numpy as np
+
+
+def candidatePairs(positions, cellSize):
+    """Returns the pairs (first, second) with first < second of agents that come closer than cellSize at the same step.
+        The samples (agents, timesteps, dim) are binned into a grid of cellSize per timestep, only samples in the same or
+        neighbouring cells can be that close. Pairs further apart may be returned as well, closer ones never get lost."""
+    agents, timesteps, dim = positions.shape
+    cells = np.floor(positions / cellSize).astype(np.int64)
+    cells -= cells.min(axis=(0, 1)) - 1  # keep the neighbours of all cells positive
+    extent = cells.max(axis=(0, 1)) + 2
+    steps = np.arange(0, timesteps)[None, :]
+
+    def cellKeys(cells):
+        keys = np.broadcast_to(steps, cells.shape[:2]).astype(np.int64)
+        for axis in range(0, dim):
+            keys = keys * extent[axis] + cells[:, :, axis]
+        return keys.reshape(-1)
+
+    sampleAgents = np.repeat(np.arange(0, agents), timesteps)
+    keys = cellKeys(cells)
+    order = np.argsort(keys, kind='stable')
+    sortedKeys = keys[order]
+    sortedAgents = sampleAgents[order]
+
+    pairKeys = []
+    for offset in itertools.product([-1, 0, 1], repeat=dim):
+        queries = cellKeys(cells + np.array(offset))
+        lower = np.searchsorted(sortedKeys, queries, side='left')
+        counts = np.searchsorted(sortedKeys, queries, side='right') - lower
+        total = np.sum(counts)
+        if total == 0:
+            continue
+        # every sample paired with every sample in the neighbouring cell
+        queryIndex = np.repeat(np.arange(0, len(queries)), counts)
+        matchIndex = np.arange(0, total) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lower, counts)
+        first = sampleAgents[queryIndex]
+        second = sortedAgents[matchIndex]
+        keep = first < second
+        pairKeys.append(first[keep] * agents + second[keep])
+
+    if not pairKeys:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    pairKeys = np.unique(np.concatenate(pairKeys))  # sorted by the first agent
+    return pairKeys // agents, pairKeys % agents
+
+
+class BroadPhase:
+    """Keeps the pairs of agents that can collide, so the cost functions only check those instead of all pairs.
+        The grid is margin larger than minDist, the pairs are rebuilt every refreshInterval calls and as soon as any
+        sample moved more than half of the margin since the last rebuild, so no pair closer than minDist is missed."""
+
+    def __init__(self, minDist, margin=0.2, refreshInterval=10):
+        self.minDist = minDist
+        self.margin = margin
+        self.refreshInterval = refreshInterval
+        self.candidates = None  # the same (first, second) tuple until the next rebuild, so callers can keep workspaces sized for it
+        self.refreshPositions = None
+        self.age = 0
+        self.refreshes = 0
+
+
+    def _movedTooFar(self, positions):
+        return np.max(np.sum((positions - self.refreshPositions)**2, axis=2)) > (self.margin / 2)**2
+
+
+    def pairs(self, positions):
+        """Returns the candidate pairs (first, second) for the positions (agents, timesteps, dim), sorted by the first agent."""
+        if self.candidates is None or self.age >= self.refreshInterval or self._movedTooFar(positions):
+            self.candidates = candidatePairs(positions, self.minDist + self.margin)
+            self.refreshPositions = np.array(positions)
+            self.age = 0
+            self.refreshes += 1
+        self.age += 1
+        return self.candidates
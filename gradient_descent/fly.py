@@ -29,230 +29,96 @@ The Crazyflies go straight up, hover a while and land but the code is fairly
 generic and each Crazyflie has its own sequence of setpoints that it files
 to.
 """
+import os
 import sys
-import time
 import numpy as np
 
 import cflib.crtp
-from cflib.crazyflie.log import LogConfig
-from cflib.crazyflie.swarm import CachedCfFactory
 from cflib.crazyflie.swarm import Swarm
-from cflib.crazyflie.syncLogger import SyncLogger
 
-# Change uris and sequences according to your setup
-URI1 = 'radio://0/80/2M/E7E7E7E7E0'
-URI2 = 'radio://0/80/2M/E7E7E7E7E1'
-URI3 = 'radio://0/80/2M/E7E7E7E7E2'
-URI4 = 'radio://0/80/2M/E7E7E7E7E3'
-URI5 = 'radio://0/80/2M/E7E7E7E7E4'
-URI6 = 'radio://0/80/2M/E7E7E7E7E5'
-URI7 = 'radio://0/80/2M/E7E7E7E7E6'
-URI8 = 'radio://0/80/2M/E7E7E7E7E7'
-URI9 = 'radio://0/80/2M/E7E7E7E7E8'
-URI10 = 'radio://0/80/2M/E7E7E7E7E9'
-
-# how long each setpoint broadcast before switching to the next
-timePerSetpoint = 0.3
+from estimator import reset_estimator
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'drone_simulator'))
+from crazyflie_cache import SharedCfFactory  # noqa: E402
+from radio_allocator import allocateUris  # noqa: E402
+from setpoint_player import PlannedTrajectory, Waypoints, Program  # noqa: E402
+from setpoint_player import SetpointPlayer, collectCrazyflies  # noqa: E402
+from setpoint_player import forward, reverse, hold  # noqa: E402
+
+# Change addresses and sequences according to your setup
+# the dongles are assigned by the radio allocator, CHANNEL is the radio channel configured on the drones
+CHANNEL = 80
+ADDRESS1 = 'E7E7E7E7E0'
+ADDRESS2 = 'E7E7E7E7E1'
+ADDRESS3 = 'E7E7E7E7E2'
+ADDRESS4 = 'E7E7E7E7E3'
+ADDRESS5 = 'E7E7E7E7E4'
+ADDRESS6 = 'E7E7E7E7E5'
+ADDRESS7 = 'E7E7E7E7E6'
+ADDRESS8 = 'E7E7E7E7E7'
+ADDRESS9 = 'E7E7E7E7E8'
+ADDRESS10 = 'E7E7E7E7E9'
+
+# the TIMESTEP of gradient_descent.py, the time between two planned positions
+TIMESTEP = 0.3
+# how many setpoints per second are sent to each drone
+RATE = 50
 
 traj = np.load(sys.path[0] + "/trajectories/pos_traj.npy")
+vel = np.load(sys.path[0] + "/trajectories/vel_traj.npy")
 agents = traj.shape[0]
 # timesteps = traj.shape[1]
 
-sequences = []
-for i in range(0, 10):
-    if i < agents:
-        sequences.append(traj[i])
-    else:
-        sequences.append(0)
-
-# sequence1 = traj[0]
-# sequence2 = traj[1]
-# sequence3 = traj[2]
-# sequence4 = traj[3]
-# sequence5 = traj[4]
-# sequence6 = traj[5]
-# sequence7 = traj[6]
-# sequence8 = traj[7]
-# sequence9 = traj[8]
-# sequence10 = traj[9]
-
-# seq_args = {
-#     URI1: [sequence1],
-#     URI2: [sequence2],
-#     URI3: [sequence3],
-#     URI4: [sequence4],
-#     URI5: [sequence5],
-#     URI6: [sequence6],
-#     URI7: [sequence7],
-#     URI8: [sequence8],
-#     URI9: [sequence9],
-#     URI10: [sequence10]
-# }
-
-seq_args = {
-    URI1: [sequences[0]],
-    URI2: [sequences[1]],
-    URI3: [sequences[2]],
-    URI4: [sequences[3]],
-    URI5: [sequences[4]],
-    URI6: [sequences[5]],
-    URI7: [sequences[6]],
-    URI8: [sequences[7]],
-    URI9: [sequences[8]],
-    URI10: [sequences[9]]
-}
-
-# List of URIs, comment the one you do not want to fly
-uris = {
-    URI1,
-    URI2,
-    URI3,
-    URI4
-    # URI5
-    # URI6,
-    # URI7,
-    # URI8,
-    # URI9,
-    # URI10
+# the drone with the nth address flies the trajectory of the nth agent
+agent_of = {
+    ADDRESS1: 0,
+    ADDRESS2: 1,
+    ADDRESS3: 2,
+    ADDRESS4: 3,
+    ADDRESS5: 4,
+    ADDRESS6: 5,
+    ADDRESS7: 6,
+    ADDRESS8: 7,
+    ADDRESS9: 8,
+    ADDRESS10: 9
 }
 
-
-def wait_for_position_estimator(scf):
-    print('Waiting for estimator to find position...')
-
-    log_config = LogConfig(name='Kalman Variance', period_in_ms=500)
-    log_config.add_variable('kalman.varPX', 'float')
-    log_config.add_variable('kalman.varPY', 'float')
-    log_config.add_variable('kalman.varPZ', 'float')
-
-    var_y_history = [1000] * 10
-    var_x_history = [1000] * 10
-    var_z_history = [1000] * 10
-
-    threshold = 0.001
-
-    with SyncLogger(scf, log_config) as logger:
-        for log_entry in logger:
-            data = log_entry[1]
-
-            var_x_history.append(data['kalman.varPX'])
-            var_x_history.pop(0)
-            var_y_history.append(data['kalman.varPY'])
-            var_y_history.pop(0)
-            var_z_history.append(data['kalman.varPZ'])
-            var_z_history.pop(0)
-
-            min_x = min(var_x_history)
-            max_x = max(var_x_history)
-            min_y = min(var_y_history)
-            max_y = max(var_y_history)
-            min_z = min(var_z_history)
-            max_z = max(var_z_history)
-
-            # print("{} {} {}".
-            #       format(max_x - min_x, max_y - min_y, max_z - min_z))
-
-            if (max_x - min_x) < threshold and (
-                    max_y - min_y) < threshold and (
-                    max_z - min_z) < threshold:
-                break
-
-
-def wait_for_param_download(scf):
-    while not scf.cf.param.is_updated:
-        time.sleep(1.0)
-    print('Parameters downloaded for', scf.cf.link_uri)
-
-
-def reset_estimator(scf):
-    cf = scf.cf
-    cf.param.set_value('kalman.resetEstimation', '1')
-    time.sleep(0.1)
-    cf.param.set_value('kalman.resetEstimation', '0')
-
-    wait_for_position_estimator(cf)
-
-
-def take_off(cf, position):
-    # take_off_time = 1.0
-    # sleep_time = 0.1
-    # steps = int(take_off_time / sleep_time)
-    # vz = position[2] / take_off_time
-
-    # print(vz)
-
-    # for _ in range(steps):
-    #     cf.commander.send_velocity_world_setpoint(0, 0, vz, 0)
-    #     time.sleep(sleep_time)
-
-    # make sure the drone is at the starting position of the trajectory
-    # hopfefully you put them on the ground in a way that they dont crash on their way there
-    for _ in range(20):
-        cf.commander.send_position_setpoint(position[0], position[1], position[2], 0)
-        time.sleep(0.1)
-
-
-def land(cf, position):
-    # landing_time = 1.0
-    # sleep_time = 0.1
-    # steps = int(landing_time / sleep_time)
-    # vz = -position[2] / landing_time
-
-    # print(vz)
-
-    # for _ in range(steps):
-    #     cf.commander.send_velocity_world_setpoint(0, 0, vz, 0)
-    #     time.sleep(sleep_time)
-
-    for _ in range(20):
-        cf.commander.send_position_setpoint(position[0], position[1], 0.25, 0)
-        time.sleep(0.1)
-
-    cf.commander.send_stop_setpoint()
-    # Make sure that the last packet leaves before the link is closed
-    # since the message queue is not flushed before closing
-    time.sleep(0.1)
-
-
-def run_sequence(scf, sequence):
-    try:
-        cf = scf.cf
-
-        take_off(cf, sequence[0])
-
-        # fly the trajectory
-        print("forwards!")
-        for position in sequence:
-            # print('Setting position {}'.format(position))
-            end_time = time.time() + timePerSetpoint
-            while time.time() < end_time:
-                cf.commander.send_position_setpoint(position[0], position[1], position[2], 0)
-                time.sleep(0.1)
-
-        for _ in range(10):
-            position = sequence[-1]
-            cf.commander.send_position_setpoint(position[0], position[1], position[2], 0)
-            time.sleep(0.1)
-
-        # fly the trajectory backwards
-        print("backwards!")
-        for position in reversed(sequence):
-            # print('Setting position {}'.format(position))
-            end_time = time.time() + timePerSetpoint
-            while time.time() < end_time:
-                cf.commander.send_position_setpoint(position[0], position[1], position[2], 0)
-                time.sleep(0.1)
-
-        land(cf, sequence[0])
-    except Exception as e:
-        print(e)
+# fly to the start and wait there, fly the trajectory forwards, hover a moment, fly it backwards and land at the start
+# hopfefully you put them on the ground in a way that they dont crash on their way to the start
+trajectory = PlannedTrajectory(traj, vel, TIMESTEP)
+landing = Waypoints([[(position[0], position[1], 0.25, 2.0)] for position in traj[:, 0]], start=traj[:, 0])
+program = Program([
+    hold(trajectory, 2.0, at=0),
+    forward(trajectory),
+    hold(trajectory, 1.0),
+    reverse(trajectory),
+    forward(landing)
+])
+
+# List of addresses, comment the one you do not want to fly
+addresses = [
+    ADDRESS1,
+    ADDRESS2,
+    ADDRESS3,
+    ADDRESS4
+    # ADDRESS5
+    # ADDRESS6,
+    # ADDRESS7,
+    # ADDRESS8,
+    # ADDRESS9,
+    # ADDRESS10
+]
 
 
 if __name__ == '__main__':
     # logging.basicConfig(level=logging.DEBUG)
     cflib.crtp.init_drivers(enable_debug_driver=False)
 
-    factory = CachedCfFactory(rw_cache='./cache')
+    uris = allocateUris([(address, CHANNEL) for address in addresses])
+    if max(agent_of[address] for address in addresses) >= agents:
+        raise Exception("There are more drones than planned trajectories")
+
+    factory = SharedCfFactory()
     with Swarm(uris, factory=factory) as swarm:
         # If the copters are started in their correct positions this is
         # probably not needed. The Kalman filter will have time to converge
@@ -260,11 +126,13 @@ if __name__ == '__main__':
         # keep the code here to illustrate how to do it.
         swarm.parallel(reset_estimator)
 
-        # The current values of all parameters are downloaded as a part of the
-        # connections sequence. Since we have 10 copters this is clogging up
-        # communication and we have to wait for it to finish before we start
-        # flying.
-        print('Waiting for parameters to be downloaded...')
-        swarm.parallel(wait_for_param_download)
+        # The TOCs come from the shared cache and parameter values are only
+        # fetched on demand, so there is no parameter download to wait for
+        # before flying.
 
-        swarm.parallel(run_sequence, args_dict=seq_args)
+        # all setpoints are sent from this thread on one clock
+        player = SetpointPlayer(collectCrazyflies(swarm, uris), program, [agent_of[address] for address in addresses], RATE)
+        try:
+            player.play()
+        finally:
+            player.stop()
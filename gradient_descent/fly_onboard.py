@@ -0,0 +1,122 @@
+"""
+Flies the trajectories of pos_traj.npy with the high level commander instead of streaming every setpoint like fly.py.
+The trajectory of each agent is compressed to few 7th order polynomials, uploaded to the trajectory memory of all drones in
+parallel and started on all of them at the same moment, after that no more packets are needed until landing.
+Works with the output of gradient_descent.py as well as with recordings of the drone simulator (which add time.npy).
+"""
+import os
+import sys
+import time
+import threading
+import numpy as np
+
+import cflib.crtp
+from cflib.crazyflie.mem import MemoryElement
+from cflib.crazyflie.mem import Poly4D
+from cflib.crazyflie.swarm import Swarm
+
+from estimator import reset_estimator
+from trajectory_compression import compressTrajectories
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'drone_simulator'))
+from crazyflie_cache import SharedCfFactory  # noqa: E402
+from radio_allocator import allocateUris  # noqa: E402
+from param_sync import syncSwarmParams  # noqa: E402
+from poly4d import Poly4DTrajectories  # noqa: E402
+
+# the dongles are assigned by the radio allocator, CHANNEL is the radio channel configured on the drones
+CHANNEL = 80
+ADDRESSES = ['E7E7E7E7E{}'.format(i) for i in range(10)]
+
+# the time between two timesteps of gradient_descent.py, recordings bring their own times
+TIMESTEP = 0.3
+# the largest distance in m between the fitted and the planned trajectory
+TOLERANCE = 0.02
+TRAJECTORYID = 1
+# seconds to take off and fly to the start of the trajectory
+TAKEOFFTIME = 3.0
+
+# set by main, all drones wait on it before they start their trajectory
+startBarrier = None
+
+
+def load_trajectories(path):
+    """Loads the planned positions and velocities and returns them with the time of each timestep."""
+    positions = np.load(os.path.join(path, "pos_traj.npy"))
+    velocities = np.load(os.path.join(path, "vel_traj.npy"))
+    timeFile = os.path.join(path, "time.npy")
+    if os.path.exists(timeFile):
+        times = np.load(timeFile)
+    else:
+        times = np.arange(0, positions.shape[1]) * TIMESTEP
+    return positions, velocities, times
+
+
+def upload_trajectory(scf, rows):
+    """Writes the segments to the trajectory memory and defines the trajectory on the drone."""
+    cf = scf.cf
+    trajectory_mem = cf.mem.get_mems(MemoryElement.TYPE_TRAJ)[0]
+    trajectory_mem.poly4Ds = []
+    for row in rows:
+        x = Poly4D.Poly(row[1:9])
+        y = Poly4D.Poly(row[9:17])
+        z = Poly4D.Poly(row[17:25])
+        yaw = Poly4D.Poly(row[25:33])
+        trajectory_mem.poly4Ds.append(Poly4D(row[0], x, y, z, yaw))
+
+    done = threading.Event()
+    trajectory_mem.write_data(lambda mem, addr: done.set())
+    if not done.wait(10):
+        raise Exception("uploading the trajectory to {} timed out".format(cf.link_uri))
+    cf.high_level_commander.define_trajectory(TRAJECTORYID, 0, len(trajectory_mem.poly4Ds))
+
+
+def run_sequence(scf, rows):
+    cf = scf.cf
+    commander = cf.high_level_commander
+    start = rows[0][1], rows[0][9], rows[0][17]
+    duration = sum(row[0] for row in rows)
+    try:
+        commander.takeoff(start[2], TAKEOFFTIME / 2)
+        time.sleep(TAKEOFFTIME / 2)
+        commander.go_to(start[0], start[1], start[2], 0, TAKEOFFTIME / 2)
+        time.sleep(TAKEOFFTIME / 2)
+
+        # all drones start their trajectory at the same moment
+        startBarrier.wait()
+        commander.start_trajectory(TRAJECTORYID)
+        time.sleep(duration)
+
+        commander.land(0.0, 2.0)
+        time.sleep(2.0)
+        commander.stop()
+    except threading.BrokenBarrierError:
+        print("{} did not start, another drone failed".format(cf.link_uri))
+        commander.land(0.0, 2.0)
+        time.sleep(2.0)
+        commander.stop()
+
+
+if __name__ == '__main__':
+    positions, velocities, times = load_trajectories(os.path.join(sys.path[0], "trajectories"))
+    # cflib 0.1.7 uploads float segments, so the fixed-point encoding of the compression is not used here
+    trajectories = [result.rows for result in compressTrajectories(positions, velocities, times, TOLERANCE)]
+    report = Poly4DTrajectories(trajectories).validate()
+    report.print()
+    if not report.isValid():
+        raise Exception("the compressed trajectories are not safe to fly")
+
+    addresses = ADDRESSES[:len(trajectories)]
+    if len(addresses) < len(trajectories):
+        print("Warning: {} trajectories but only {} drones, the rest is not flown".format(len(trajectories), len(addresses)))
+
+    cflib.crtp.init_drivers(enable_debug_driver=False)
+    uris = allocateUris([(address, CHANNEL) for address in addresses])
+    uri_args = {uri: [trajectories[i]] for i, uri in enumerate(uris)}
+    startBarrier = threading.Barrier(len(uris), timeout=30)
+
+    with Swarm(uris, factory=SharedCfFactory()) as swarm:
+        syncSwarmParams(swarm, {'commander.enHighLevel': 1})
+        swarm.parallel(reset_estimator)
+        swarm.parallel_safe(upload_trajectory, args_dict=uri_args)
+        swarm.parallel(run_sequence, args_dict=uri_args)
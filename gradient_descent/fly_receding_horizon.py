@@ -0,0 +1,115 @@
+"""
+Flies the scenario of pos_traj.npy (from its first to its last positions) with receding horizon planning. The drones stream the
+latest plan like fly.py while the planner optimizes the rest of the horizon again from their logged state estimates several times
+per second, so drift on the way is corrected instead of flown to the end.
+"""
+import os
+import sys
+import time
+import threading
+import numpy as np
+
+import cflib.crtp
+from cflib.crazyflie.log import LogConfig
+from cflib.crazyflie.swarm import Swarm
+
+from estimator import reset_estimator
+from receding_horizon import RecedingHorizonPlanner
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'drone_simulator'))
+from crazyflie_cache import SharedCfFactory  # noqa: E402
+from radio_allocator import allocateUris  # noqa: E402
+from setpoint_player import Waypoints, Program  # noqa: E402
+from setpoint_player import SetpointPlayer, collectCrazyflies  # noqa: E402
+from setpoint_player import forward  # noqa: E402
+
+# the dongles are assigned by the radio allocator, CHANNEL is the radio channel configured on the drones
+CHANNEL = 80
+ADDRESSES = ['E7E7E7E7E{}'.format(i) for i in range(10)]
+
+# the settings of gradient_descent.py
+TIMESTEPS = 20
+TIMESTEP = 0.3
+# how many setpoints per second are sent to each drone and how many replans are done per second
+RATE = 50
+REPLANRATE = 10
+# the most time a replan may take, the rest of the cycle is left for sending setpoints
+LATENCYBUDGET = 0.03
+# state estimates older than this are not used for replanning
+MAXAGE = 0.2
+
+
+class StateEstimates:
+    """The latest position and velocity estimates of all drones, logged from each of them every 20 ms."""
+
+    def __init__(self, agents):
+        self.positions = np.zeros([agents, 3])
+        self.velocities = np.zeros([agents, 3])
+        self.times = np.zeros(agents)
+        self.lock = threading.Lock()
+
+
+    def add(self, cf, agent):
+        config = LogConfig(name='State', period_in_ms=20)
+        for variable in ['x', 'y', 'z', 'vx', 'vy', 'vz']:
+            config.add_variable('stateEstimate.' + variable, 'float')
+        cf.log.add_config(config)
+        config.data_received_cb.add_callback(lambda timestamp, data, logconf: self._received(agent, data))
+        config.start()
+
+
+    def _received(self, agent, data):
+        with self.lock:
+            self.positions[agent] = [data['stateEstimate.x'], data['stateEstimate.y'], data['stateEstimate.z']]
+            self.velocities[agent] = [data['stateEstimate.vx'], data['stateEstimate.vy'], data['stateEstimate.vz']]
+            self.times[agent] = time.monotonic()
+
+
+    def measure(self):
+        """Returns (positions, velocities) of all drones, None while any estimate is missing or too old."""
+        with self.lock:
+            if np.min(self.times) < time.monotonic() - MAXAGE:
+                return None
+            return np.array(self.positions), np.array(self.velocities)
+
+
+if __name__ == '__main__':
+    traj = np.load(os.path.join(sys.path[0], "trajectories", "pos_traj.npy"))
+    vel = np.load(os.path.join(sys.path[0], "trajectories", "vel_traj.npy"))
+    startPos, targetPos = traj[:, 0], traj[:, -1]
+    agents = traj.shape[0]
+    addresses = ADDRESSES[:agents]
+
+    planner = RecedingHorizonPlanner(targetPos, vel[:, -1], TIMESTEPS, TIMESTEP, latencyBudget=LATENCYBUDGET)
+    planner.start(startPos, vel[:, 0])
+
+    cflib.crtp.init_drivers(enable_debug_driver=False)
+    uris = allocateUris([(address, CHANNEL) for address in addresses])
+    estimates = StateEstimates(agents)
+
+    with Swarm(uris, factory=SharedCfFactory()) as swarm:
+        # the planner starts from the state estimates, so they have to converge first
+        swarm.parallel(reset_estimator)
+        cfs = collectCrazyflies(swarm, uris)
+        for agent, cf in enumerate(cfs):
+            estimates.add(cf, agent)
+
+        takeoff = Waypoints([[(position[0], position[1], position[2], 4.0)] for position in startPos], transitionTime=3.0)
+        landing = Waypoints([[(position[0], position[1], 0.25, 2.0)] for position in targetPos], start=targetPos)
+        player = SetpointPlayer(cfs, Program([forward(takeoff)]), rate=RATE)
+        try:
+            player.play()
+
+            # the plan starts now, replanning runs in the background while this thread streams the setpoints
+            planner.startClock()
+            planner.startReplanning(estimates.measure, REPLANRATE)
+            try:
+                player.program = Program([forward(planner)])
+                player.play()
+            finally:
+                planner.stop()
+
+            player.program = Program([forward(landing)])
+            player.play()
+        finally:
+            player.stop()
@@ -0,0 +1,71 @@
+"""
+Compares the analytical gradient of a cost with central finite differences.
+Run it after changing a cost term, it exits with an error if the maximum relative error of any scenario is not below TOLERANCE.
+The rounding of the central differences alone leaves relative errors of up to about 5e-5 at components with a tiny gradient.
+"""
+import sys
+import numpy as np
+
+from gradient_descent import CostFunctions
+
+# the largest relative error the scenarios of the main may have
+TOLERANCE = 1e-4
+
+
+def numericalGradient(cost, parameters, indices, eps=1e-6):
+    """Central differences of cost at the flat indices of the parameters."""
+    x = np.array(parameters, dtype=float)
+    flat = x.reshape(-1)
+    gradient = np.zeros(len(indices))
+    for n, index in enumerate(indices):
+        original = flat[index]
+        flat[index] = original + eps
+        upper = cost(x)
+        flat[index] = original - eps
+        lower = cost(x)
+        flat[index] = original
+        gradient[n] = (upper - lower) / (2 * eps)
+    return gradient
+
+
+def checkGradient(valueAndGradient, parameters, samples=200, eps=1e-6, floor=1e-6, rng=None):
+    """Compares the gradient of valueAndGradient with central differences at up to samples random parameters.
+        Returns the maximum relative error |analytical - numerical| / max(|analytical|, |numerical|, floor) and the parameter where it occurs."""
+    rng = rng if rng is not None else np.random.RandomState()
+    parameters = np.asarray(parameters, dtype=float)
+    analytical = np.array(valueAndGradient(parameters)[1], dtype=float).reshape(-1)  # copy, the next call may overwrite it
+    indices = np.arange(0, parameters.size)
+    if samples is not None and samples < parameters.size:
+        indices = rng.choice(indices, samples, replace=False)
+
+    numerical = numericalGradient(lambda x: valueAndGradient(x)[0], parameters, indices, eps)
+    errors = np.abs(analytical[indices] - numerical) / np.maximum(np.maximum(np.abs(analytical[indices]), np.abs(numerical)), floor)
+    worst = np.argmax(errors)
+    return errors[worst], tuple(int(i) for i in np.unravel_index(indices[worst], parameters.shape))
+
+
+def randomScenario(agents, timesteps=20, t=0.3, spread=1.0, rng=None):
+    """Cost functions of random start and target positions close enough for conflicts and random jerks to evaluate them at."""
+    rng = rng if rng is not None else np.random.RandomState()
+    startPos = rng.uniform(-spread, spread, [agents, 3])
+    targetPos = rng.uniform(-spread, spread, [agents, 3])
+    startVel = rng.uniform(-0.2, 0.2, [agents, 3])
+    costFun = CostFunctions(5, 5, .5, .6, agents, timesteps, 3, startVel, startPos, np.zeros([agents, 3]), targetPos, t)
+    jerks = rng.uniform(-0.3, 0.3, [agents, timesteps, 3])
+    return costFun, jerks
+
+
+if __name__ == '__main__':
+    rng = np.random.RandomState(0)
+    worstError = 0
+    for agents in [2, 5, 10, 25]:
+        costFun, jerks = randomScenario(agents, rng=rng)
+        for collision in [False, True]:
+            error, where = checkGradient(lambda x: costFun.valueAndGradient(x, collision), jerks, rng=rng)
+            costFun.valueAndGradient(jerks)
+            conflicts = np.count_nonzero(costFun._conflictMask)
+            print("{:2d} agents, collision {:5}: max relative error {:.2e} at {}, {} conflicts".format(agents, str(collision), error, where, conflicts))
+            worstError = max(worstError, error)
+    if worstError >= TOLERANCE:
+        print("the gradient is off, the max relative error {:.2e} is not below {:.0e}".format(worstError, TOLERANCE))
+        sys.exit(1)
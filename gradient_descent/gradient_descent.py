@@ -2,6 +2,105 @@ import sys
 import random
 import numpy as np
 import math
+from functools import lru_cache
+
+from broad_phase import BroadPhase
+from optimizers import Adam, Momentum, StoppingCriteria, LBFGS, OptimizationTrace  # noqa: F401
+from warm_start_cache import WarmStartCache
+
+
+@lru_cache(maxsize=None)
+def jerkOperators(timesteps, t):
+    """Velocity and position are linear in the jerks, this builds the matrices (timesteps, timesteps) that map the jerks of an agent
+        to its velocities and positions (without the start state). Row k is also the gradient of step k with respect to the jerks.
+        They only depend on the number of timesteps and the timestep t, so they are built once and shared by all cost functions."""
+    velocityOp = np.zeros([timesteps, timesteps])
+    positionOp = np.zeros([timesteps, timesteps])
+    for k in range(0, timesteps - 1):
+        for i in range(0, k + 1):
+            velocityOp[k + 1, i] = t**2 * ((k - i) + 0.5)
+            positionOp[k + 1, i] = 0.5 * t**3 * ((k - i)**2 + (k - i) + 0.3333)
+
+    operators = (velocityOp, positionOp)
+    for operator in operators:
+        operator.flags.writeable = False  # shared by all instances
+    return operators
+
+
+# The cost terms work on arrays with any leading dimensions, (agents, timesteps, dim) for CostFunctions and (batch, agents, timesteps, dim)
+# for BatchCostFunctions of batch_planning.py. Weights and minDist are numbers or arrays that broadcast against the leading dimensions.
+
+def startMotion(startPos, startVel, startAcc, timesteps, t, velocities, positions):
+    """Writes the velocities and positions (..., agents, timesteps, dim) the agents reach from their start states (..., agents, dim) without any jerk."""
+    times = np.arange(0, timesteps)[:, None] * t
+    startVel = np.asarray(startVel, dtype=float)[..., None, :]
+    startAcc = np.asarray(startAcc, dtype=float)[..., None, :]
+    np.add(startVel, startAcc * times, out=velocities)
+    np.add(np.asarray(startPos, dtype=float)[..., None, :], startVel * times + 0.5 * startAcc * times**2, out=positions)
+
+
+def endStateCosts(velocities, positions, targetVel, targetPos, wVel, wPos):
+    """The cost of the difference between target and actual end velocity and of the one of the end position, one of each per scenario."""
+    velocityCost = np.sum(wVel * (velocities[..., -1, :] - targetVel)**2, axis=(-2, -1))
+    positionCost = np.sum(wPos * (positions[..., -1, :] - targetPos)**2, axis=(-2, -1))
+    return velocityCost, positionCost
+
+
+def endStateGradient(velocities, positions, targetVel, targetPos, wVel, wPos, velocityOp, positionOp, out):
+    """Writes the gradient of endStateCosts with respect to the jerks into out, the end state is the last row of the jerk operators applied to the jerks."""
+    np.multiply((wVel * 2 * (velocities[..., -1, :] - targetVel))[..., None, :], velocityOp[-1][:, None], out=out)
+    out += (wPos * 2 * (positions[..., -1, :] - targetPos))[..., None, :] * positionOp[-1][:, None]
+    return out
+
+
+class PairSums:
+    """Adds values of the pairs (..., pairs, timesteps, dim) onto their agents (..., agents, timesteps, dim), the first agent of a pair gets
+        the value and the second one its negative. The pairs (first, second) are sorted by the first agent, so the sums are reduceats over consecutive pairs."""
+
+    def __init__(self, pairs):
+        first, second = pairs
+        self.pairs = pairs
+        self.firstAgents, self.firstStarts = np.unique(first, return_index=True)
+        self.secondOrder = np.argsort(second, kind='stable')
+        self.secondAgents, self.secondStarts = np.unique(second[self.secondOrder], return_index=True)
+
+
+    def accumulate(self, pairValues, out):
+        out.fill(0)
+        if len(self.pairs[0]) == 0:
+            return out
+        out[..., self.firstAgents, :, :] += np.add.reduceat(pairValues, self.firstStarts, axis=-3)
+        out[..., self.secondAgents, :, :] -= np.add.reduceat(pairValues[..., self.secondOrder, :, :], self.secondStarts, axis=-3)
+        return out
+
+
+def pairDistances(positions, pairs, minDist, posDiff, dist, conflictMask):
+    """Writes the position differences (..., pairs, timesteps, dim) and the distances (..., pairs, timesteps) of the pairs (first, second)
+        and which of them are closer than minDist."""
+    first, second = pairs
+    np.subtract(positions[..., first, :, :], positions[..., second, :, :], out=posDiff)
+    np.einsum('...d,...d->...', posDiff, posDiff, out=dist)
+    np.sqrt(dist, out=dist)
+    np.less(dist, minDist, out=conflictMask)
+
+
+def collisionCost(dist, conflictMask, minDist, wCol):
+    """wCol * (1 - dist / minDist)**2 summed over the conflicts, one cost per scenario."""
+    penetration = np.where(conflictMask, 1 - dist / minDist, 0)
+    return np.sum(wCol * penetration**2, axis=(-2, -1))
+
+
+def addCollisionGradient(posDiff, dist, conflictMask, minDist, wCol, pairSums, positionOpT, stepGrad, collisionGrad, costGrad):
+    """Adds the gradient of collisionCost with respect to the jerks to costGrad, overwrites posDiff, stepGrad and collisionGrad."""
+    # d/dp of wCol * (1 - dist / minDist)**2 is -2 * wCol / minDist * (1 - dist / minDist) * posDiff / dist for the first agent of a pair
+    factor = np.where(conflictMask, (1 - dist / minDist) / np.maximum(dist, 1e-9), 0)
+    factor *= -2 * wCol / minDist
+    posDiff *= factor[..., None]
+    # the first agent of a pair is pushed one way, the second one the other way
+    pairSums.accumulate(posDiff, stepGrad)
+    # from the positions at each step to the jerks
+    np.matmul(positionOpT, stepGrad, out=collisionGrad)
+    costGrad += collisionGrad
 
 
 class CostFunctions():
@@ -9,7 +108,7 @@ class CostFunctions():
     positions = 0
     velocities = 0
 
-    def __init__(self, wVel, wPos, wCol, minDist, agents, timesteps, dim, startVel, startPos, targetVel, targetPos, t):
+    def __init__(self, wVel, wPos, wCol, minDist, agents, timesteps, dim, startVel, startPos, targetVel, targetPos, t, dtype=np.float64, broadPhase=None, startAcc=None):
         self.wVel = wVel
         self.wPos = wPos
         self.wCol = wCol
@@ -20,148 +119,145 @@ class CostFunctions():
         self.dim = dim
         self.startVel = startVel
         self.startPos = startPos
+        self.startAcc = np.zeros(np.shape(startVel)) if startAcc is None else startAcc  # the jerks of the plan start from this acceleration
         self.targetVel = targetVel
         self.targetPos = targetPos
         self.t = t
+        self.dtype = dtype  # float32 halves the memory and time of the collision terms for many agents
+
+        # without a BroadPhase every pair of agents is checked at every step
+        self.broadPhase = broadPhase
+        self.allPairs = np.triu_indices(agents, 1)
+        self._allocateWorkspace()
+
+
+    def _allocateWorkspace(self):
+        """Allocates all arrays of an evaluation once, every call of cost, gradient and valueAndGradient writes into them."""
+        self.startVelocities = np.zeros([self.agents, self.timesteps, self.dim])
+        self.startPositions = np.zeros([self.agents, self.timesteps, self.dim])
+        self._startMotion()
+        self.velocities = np.zeros([self.agents, self.timesteps, self.dim])
+        self.positions = np.zeros([self.agents, self.timesteps, self.dim])
+        self.costGrad = np.zeros([self.agents, self.timesteps, self.dim])
+
+        self._stepGrad = np.zeros([self.agents, self.timesteps, self.dim], dtype=self.dtype)
+        self._collisionGrad = np.zeros([self.agents, self.timesteps, self.dim], dtype=self.dtype)
+        self._positionOpT = jerkOperators(self.timesteps, self.t)[1].T.astype(self.dtype)
+        self._pairs = None
+
+
+    def _startMotion(self):
+        """The velocities and positions the agents reach without any jerk, written into the workspace."""
+        startMotion(self.startPos, self.startVel, self.startAcc, self.timesteps, self.t, self.startVelocities, self.startPositions)
+
+
+    def setStartState(self, startPos, startVel, startAcc=None):
+        """Moves the start of the plan without allocating anything, for replanning from measured states."""
+        self.startPos = startPos
+        self.startVel = startVel
+        self.startAcc = np.zeros(np.shape(startVel)) if startAcc is None else startAcc
+        self._startMotion()
+
+
+    def _allocatePairWorkspace(self, pairs):
+        """Allocates the arrays of the collision terms for the pairs (first, second), sorted by the first agent."""
+        first, second = pairs
+        self._pairs = pairs
+        self._posDiff = np.zeros([len(first), self.timesteps, self.dim], dtype=self.dtype)
+        self._dist = np.zeros([len(first), self.timesteps], dtype=self.dtype)
+        self._conflictMask = np.zeros([len(first), self.timesteps], dtype=bool)
+        self._pairSums = PairSums(pairs)
 
 
     def _calculateTrajectories(self, jerks):
-        positionSum = 0
-        v = np.zeros([self.agents, self.timesteps, self.dim])
-        p = np.zeros([self.agents, self.timesteps, self.dim])
-        v[:, 0, :] = self.startVel
-        p[:, 0, :] = self.startPos
-        for k in range(0, self.timesteps - 1):
-            velocitySum = 0
-            positionSum = 0
-            for i in range(0, k + 1):
-                velocitySum += ((k - i) + 0.5) * jerks[:, i, :]
-                positionSum += ((k - i)**2 + (k - i) + 0.3333) * jerks[:, i, :]
-            v[:, k + 1, :] = self.startVel + self.t**2 * velocitySum
-            p[:, k + 1, :] = self.startPos + (k + 1) * self.t * self.startVel + 0.5 * self.t**3 * positionSum
-        self.velocities = v
-        self.positions = p
-
-
-    def _velocityGrad(self, jerks, k):
-        velGrad = np.zeros([self.agents, self.timesteps, self.dim])
-        for i in range(0, k):
-            velGrad[:, i, :] = self.t**2 * ((k - i) + 0.5)
-        for i in range(k, self.timesteps):
-            velGrad[:, i, :] = 0
-        return velGrad
-
-
-    def _positionGrad(self, jerks, k):
-        posGrad = np.zeros([self.agents, self.timesteps, self.dim])
-        for i in range(0, k):
-            posGrad[:, i, :] = 0.5 * self.t**3 * ((k - i)**2 + (k - i) + 0.3333)
-        # for i in range(k, self.timesteps):
-        #     posGrad[:, i, :] = 0
-        return posGrad
+        velocityOp, positionOp = jerkOperators(self.timesteps, self.t)
+        # (timesteps, timesteps) @ (agents, timesteps, dim) for all agents and dimensions at once
+        np.matmul(velocityOp, jerks, out=self.velocities)
+        self.velocities += self.startVelocities
+        np.matmul(positionOp, jerks, out=self.positions)
+        self.positions += self.startPositions
 
 
-    def cost(self, jerks):
-        self._calculateTrajectories(jerks)
-        cost = 0
-        cost += np.sum(self.wVel * (self.velocities[:, -1, :] - self.targetVel)**2)  # add target velocity cost
-        cost += np.sum(self.wPos * (self.positions[:, -1, :] - self.targetPos)**2)  # add target position cost
+    def _conflicts(self):
+        """Fills the position differences (pairs, timesteps, dim) and distances (pairs, timesteps) of the pairs that can collide
+            and which of them are too close at which step into the workspace."""
+        pairs = self.allPairs if self.broadPhase is None else self.broadPhase.pairs(self.positions)
+        if pairs is not self._pairs:
+            self._allocatePairWorkspace(pairs)
+        pairDistances(self.positions.astype(self.dtype, copy=False), pairs, self.minDist, self._posDiff, self._dist, self._conflictMask)
 
-        # add drone-drone conflict cost
-        for ag1 in range(0, self.agents):
-            for ag2 in range(ag1 + 1, self.agents):
-                posDiff = self.positions[ag1, :, :] - self.positions[ag2, :, :]
-                for step in range(0, self.timesteps):
-                    dist = np.linalg.norm(posDiff[step, :])
-                    if dist < self.minDist:
-                        cost += self.wCol * (1 - dist / self.minDist)**2
 
-        return cost
+    def _collisionCost(self):
+        return collisionCost(self._dist, self._conflictMask, self.minDist, self.wCol)
 
 
-    def gradient(self, jerks):
-        costGrad = np.zeros([self.agents, self.timesteps, self.dim])
-
-        # gradient due to difference between target and actual end velocity/position
-        endVelGrad = self._velocityGrad(jerks, self.timesteps)
-        endPosGrad = self._positionGrad(jerks, self.timesteps)
-        for i in range(0, self.timesteps):
-            costGrad[:, i, :] += self.wVel * 2 * (self.velocities[:, -1, :] - self.targetVel) * endVelGrad[:, i, :]
-            costGrad[:, i, :] += self.wPos * 2 * (self.positions[:, -1, :] - self.targetPos) * endPosGrad[:, i, :]
-
-        # gradient due to drone-drone conflicts
-        for ag1 in range(0, self.agents):
-            for ag2 in range(ag1 + 1, self.agents):
-                posDiff = self.positions[ag1, :, :] - self.positions[ag2, :, :]
-                for step in range(0, self.timesteps):
-                    dist = np.linalg.norm(posDiff[step, :])
-                    if dist < self.minDist:
-                        positionGrad = self._positionGrad(jerks, step)
-                        grad = self.wCol * 2 * (1 - posDiff[step, :] / self.minDist) * (positionGrad[ag2, :, :]) / self.minDist
-                        costGrad[ag1, :, :] += grad
-                        costGrad[ag2, :, :] -= grad
+    def _addCollisionGrad(self, costGrad):
+        """Adds the gradient of the collision cost, overwrites the position differences of the workspace."""
+        addCollisionGradient(self._posDiff, self._dist, self._conflictMask, self.minDist, self.wCol, self._pairSums,
+                             self._positionOpT, self._stepGrad, self._collisionGrad, costGrad)
 
-        return costGrad
 
+    def _endStateCost(self):
+        velocityCost, positionCost = endStateCosts(self.velocities, self.positions, self.targetVel, self.targetPos, self.wVel, self.wPos)
+        return velocityCost + positionCost
 
-    def gradientNoCollision(self, jerks):
-        costGrad = np.zeros([self.agents, self.timesteps, self.dim])
 
-        # gradient due to difference between target and actual end velcity/position
-        endVelGrad = self._velocityGrad(jerks, self.timesteps)
-        endPosGrad = self._positionGrad(jerks, self.timesteps)
-        for i in range(0, self.timesteps):
-            costGrad[:, i, :] += self.wVel * 2 * (self.velocities[:, -1, :] - self.targetVel) * endVelGrad[:, i, :]
-            costGrad[:, i, :] += self.wPos * 2 * (self.positions[:, -1, :] - self.targetPos) * endPosGrad[:, i, :]
+    def _endStateGrad(self):
+        """The gradient due to the difference between target and actual end velocity/position, written into the workspace."""
+        velocityOp, positionOp = jerkOperators(self.timesteps, self.t)
+        return endStateGradient(self.velocities, self.positions, self.targetVel, self.targetPos, self.wVel, self.wPos, velocityOp, positionOp, self.costGrad)
 
-        return costGrad
 
+    def cost(self, jerks):
+        self._calculateTrajectories(jerks)
+        self._conflicts()
+        return self._endStateCost() + self._collisionCost()
 
-def momentumGradientDescent(costFunction, costTarget, gradientFunction, initialParameters, parameterLimit, stepsize, maxSteps, momentum):
-    parameters = initialParameters
-    v = np.zeros(initialParameters.shape)
-    for i in range(0, maxSteps):
-        cost = costFunction(parameters)
-        gradient = gradientFunction(parameters)
-        print("Iteration {} Cost = {}".format(i, cost))
 
-        if(cost < costTarget):
-            print("stopping due to reaching cost target")
-            return parameters
+    def gradient(self, jerks):
+        """The gradient at the jerks of the last call of cost. Prefer valueAndGradient, which computes both for the same jerks."""
+        self._conflicts()
+        costGrad = self._endStateGrad()
+        self._addCollisionGrad(costGrad)
+        return costGrad
 
-        v = momentum * v + stepsize * gradient
-        parameters -= v
-        parameters = np.clip(parameters, -parameterLimit, parameterLimit)
 
-    print("stopping due to reaching step limit")
-    return parameters
+    def gradientNoCollision(self, jerks):
+        return self._endStateGrad()
 
 
-def adamGradientDescent(costFunction, costTarget, gradientFunction, initialParameters, parameterLimit, stepsize, maxSteps, beta1, beta2, eps):
-    parameters = initialParameters
-    m = np.zeros(initialParameters.shape)
-    v = np.zeros(initialParameters.shape)
-    for i in range(0, maxSteps):
-        cost = costFunction(parameters)
-        gradient = gradientFunction(parameters)
-        print("Iteration {} Cost = {}".format(i, cost))
+    def valueAndGradient(self, jerks, collision=True):
+        """Returns the cost and its gradient at the jerks from one evaluation of the trajectories.
+            Without collision the drone-drone conflicts are left out of both. The gradient is an array of the workspace,
+            the next call overwrites it, copy it to keep it."""
+        self._calculateTrajectories(jerks)
+        cost = self._endStateCost()
+        costGrad = self._endStateGrad()
+        if collision:
+            self._conflicts()
+            cost += self._collisionCost()
+            self._addCollisionGrad(costGrad)
+        return cost, costGrad
+
+
+    def costTerms(self, jerks):
+        """The velocity, position and collision cost and the smallest distance between two agents at the jerks, for an OptimizationTrace.
+            With a broad phase the distance is exact below the cell size of its grid, pairs further apart may be missed."""
+        self._calculateTrajectories(jerks)
+        self._conflicts()
+        minSeparation = np.min(self._dist) if self._dist.size > 0 else np.inf
+        velocityCost, positionCost = endStateCosts(self.velocities, self.positions, self.targetVel, self.targetPos, self.wVel, self.wPos)
+        return velocityCost, positionCost, self._collisionCost(), minSeparation
 
-        if(cost < costTarget):
-            print("stopping due to reaching cost target")
-            return parameters
 
-        curStepsize = stepsize / (1 + 0.01 * i)
-        # curStepsize = stepsize
+def momentumGradientDescent(valueAndGradient, costTarget, initialParameters, parameterLimit, stepsize, maxSteps, momentum, callback=None):
+    optimizer = Momentum(stepsize, momentum, verbose=True, callback=callback)
+    return optimizer.minimize(valueAndGradient, initialParameters, parameterLimit, StoppingCriteria(costTarget, maxSteps)).parameters
 
-        m = beta1 * m + (1 - beta1) * gradient
-        v = beta2 * v + (1 - beta2) * gradient**2
-        mHat = m / (1 - beta1)
-        vHat = v / (1 - beta2)
-        parameters -= curStepsize / (np.sqrt(vHat) + eps) * mHat
-        parameters = np.clip(parameters, -parameterLimit, parameterLimit)
 
-    print("stopping due to reaching step limit")
-    return parameters
+def adamGradientDescent(valueAndGradient, costTarget, initialParameters, parameterLimit, stepsize, maxSteps, beta1, beta2, eps, callback=None):
+    optimizer = Adam(stepsize, beta1, beta2, eps, verbose=True, callback=callback)
+    return optimizer.minimize(valueAndGradient, initialParameters, parameterLimit, StoppingCriteria(costTarget, maxSteps)).parameters
 
 
 # first position is at the center towards the window, then counter clockwise
@@ -174,108 +270,137 @@ def circleCoordinates(amount, radius, angleOffset):
     return coordinateArray
 
 
-# AGENT DIM
-# "random"
-# STARTVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
-# STARTPOS = np.array([[4, 0, 0], [-4, 0, 0], [0, 0, 0], [0, 0, 4], [-3, -3, 0]])
-# TARGETVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
-# TARGETPOS = np.array([[-4, 0, 0], [4, 0, 0], [0, 0, 0], [0, 0, -4], [3, 3, 0]])
-
-# 3 axis position swap
-# STARTVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
-# STARTPOS = np.array([[4, 0, 0], [-4, 0, 0], [0, 4, 0], [0, -4, 0], [0, 0, 4], [0, 0, -4], [0, 0, 0]])
-# TARGETVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
-# TARGETPOS = np.array([[-4, 0, 0], [4, 0, 0], [0, -4, 0], [0, 4, 0], [0, 0, -4], [0, 0, 4], [0, 0, 0]])
-
-# pentagram
-# STARTVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
-# STARTPOS = np.array([[-2, -2, 0], [3, 1, 0], [-3, 1, 0], [2, -2, 0], [0, 4, 0]])
-# TARGETVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
-# TARGETPOS = np.array([[3, 1, 0], [-3, 1, 0], [2, -2, 0], [0, 4, 0], [-2, -2, 0]])
-
-# line swap
-# STARTVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
-# STARTPOS = np.array([[3, -4, 0], [3, -2, 0], [3, 0, 0], [3, 2, 0], [3, 4, 0], [-3, -4, 0], [-3, -2, 0], [-3, 0, 0], [-3, 2, 0], [-3, 4, 0]])
-# TARGETVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
-# TARGETPOS = np.array([[-3, -4, 0], [-3, -2, 0], [-3, 0, 0], [-3, 2, 0], [-3, 4, 0], [3, -4, 0], [3, -2, 0], [3, 0, 0], [3, 2, 0], [3, 4, 0]])
-
-# drone wall
-# STARTVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
-# STARTPOS = np.array([[-2, 0, -2], [-2, 0, 0], [-2, 0, 2], [0, 0, -2], [0, 0, 0], [0, 0, 2], [2, 0, -2], [2, 0, 0], [2, 0, 2], [0, -3, 0]])
-# TARGETVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
-# TARGETPOS = np.array([[-2, 0, -2], [-2, 0, 0], [-2, 0, 2], [0, 0, -2], [0, 0, 0], [0, 0, 2], [2, 0, -2], [2, 0, 0], [2, 0, 2], [0, 3, 0]])
-
-# 3 axis swap
-# STARTVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
-# STARTPOS = np.array([[0, 0, .3], [0, 0, 1.3], [.5, 0, .8], [-.5, 0, .8], [0, .5, .8], [0, -.5, .8]])
-# TARGETVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
-# TARGETPOS = np.array([[0, 0, 1.3], [0, 0, 0.3], [-.5, 0, .8], [.5, 0, .8], [0, -.5, .8], [0, .5, .8]])
-
-
-# circle swap
-AGENTS = 4
-STARTVEL = np.zeros([AGENTS, 3])
-STARTPOS = circleCoordinates(AGENTS, 1, 0)
-TARGETVEL = np.zeros([AGENTS, 3])
-TARGETPOS = circleCoordinates(AGENTS, 1, 180)
-print("initial distance: {}".format(np.linalg.norm(STARTPOS[0] - STARTPOS[1])))
-
-
-AGENTS = STARTVEL.shape[0]
-TIMESTEPS = 20
-DIM = STARTVEL.shape[1]
-
-TIMESTEP = .3
-MAXJERK = 0.3
-
-# weights for changing how much the final velocity error, the final position error and the drone-drone conflicts are considered
-# try changing these if your results are bad
-WVEL = 5
-WPOS = 5
-WCOL = .5
-
-MINDIST = .6
-
-costFun = CostFunctions(WVEL, WPOS, WCOL, MINDIST, AGENTS, TIMESTEPS, DIM, STARTVEL, STARTPOS, TARGETVEL, TARGETPOS, TIMESTEP)
-
-# AGENT TIMESTEP DIM
-jerks = np.zeros([AGENTS, TIMESTEPS, DIM])
-# randomize jerks
-# maxRandom = 0.05
-# for i in range(0, AGENTS):
-#     tmp = np.zeros([TIMESTEPS, 3])
-#     for j in range(0, TIMESTEPS):
-#         tmp[j] = [random.uniform(-maxRandom, maxRandom), random.uniform(-maxRandom, maxRandom), random.uniform(-maxRandom, maxRandom)]
-#     jerks[i] = tmp
-
-# COST TARGET GRAD INITIALPARAM PARAMLIMIT STEPSIZE MAXSTEPS MOMENTUM
-# initialJerks = momentumGradientDescent(costFun.cost, 0, costFun.gradientNoCollision, jerks, MAXJERK, 0.0005, 50, 0.9)
-# momentumGradientDescent(costFun.cost, 0.05, costFun.gradient, initialJerks, MAXJERK, 0.0005, 700, 0.9)
-
-# COST TARGET GRAD INITIALPARAM PARAMLIMIT STEPSIZE MAXSTEPS BETA1 BETA2 EPSILON
-initialResult = adamGradientDescent(costFun.cost, 0, costFun.gradientNoCollision, jerks, MAXJERK, 0.01, 50, 0.95, 0.99, 10**(-8))
-result = adamGradientDescent(costFun.cost, 0.05, costFun.gradient, initialResult, MAXJERK, 0.005, 3000, 0.95, 0.99, 10**(-8))
-
-# result = adamGradientDescent(costFun.cost, 0.05, costFun.gradient, jerks, MAXJERK, 0.005, 4000, 0.95, 0.99, 10**(-8))
-
-print("\n ##### RESULTS #####")
-print("Highest final velocity difference:", np.max(np.linalg.norm(TARGETVEL - costFun.velocities[:, -1, :], axis=1)))
-print("Highest final position difference:", np.max(np.linalg.norm(TARGETPOS - costFun.positions[:, -1, :], axis=1)))
-smallestDistance = sys.float_info.max
-smallestDistanceTimestep = -1
-smallestDistanceAgent1 = -1
-smallestDistanceAgent2 = -1
-for ag1 in range(0, costFun.agents):
-    for ag2 in range(ag1 + 1, costFun.agents):
-        posDiff = costFun.positions[ag1, :, :] - costFun.positions[ag2, :, :]
-        for step in range(0, costFun.timesteps):
-            dist = np.linalg.norm(posDiff[step, :])
-            if dist < smallestDistance:
-                smallestDistance = dist
-                smallestDistanceTimestep = step
-                smallestDistanceAgent1 = ag1
-                smallestDistanceAgent2 = ag2
-print("Smallest distance: {0} at timestep {1} between agents {2} and {3}".format(smallestDistance, smallestDistanceTimestep, smallestDistanceAgent1, smallestDistanceAgent2), "\n")
-
-np.save(sys.path[0] + "/trajectories/vel_traj.npy", costFun.velocities)
-np.save(sys.path[0] + "/trajectories/pos_traj.npy", costFun.positions)
+if __name__ == '__main__':
+    # AGENT DIM
+    # "random"
+    # STARTVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
+    # STARTPOS = np.array([[4, 0, 0], [-4, 0, 0], [0, 0, 0], [0, 0, 4], [-3, -3, 0]])
+    # TARGETVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
+    # TARGETPOS = np.array([[-4, 0, 0], [4, 0, 0], [0, 0, 0], [0, 0, -4], [3, 3, 0]])
+
+    # 3 axis position swap
+    # STARTVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
+    # STARTPOS = np.array([[4, 0, 0], [-4, 0, 0], [0, 4, 0], [0, -4, 0], [0, 0, 4], [0, 0, -4], [0, 0, 0]])
+    # TARGETVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
+    # TARGETPOS = np.array([[-4, 0, 0], [4, 0, 0], [0, -4, 0], [0, 4, 0], [0, 0, -4], [0, 0, 4], [0, 0, 0]])
+
+    # pentagram
+    # STARTVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
+    # STARTPOS = np.array([[-2, -2, 0], [3, 1, 0], [-3, 1, 0], [2, -2, 0], [0, 4, 0]])
+    # TARGETVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
+    # TARGETPOS = np.array([[3, 1, 0], [-3, 1, 0], [2, -2, 0], [0, 4, 0], [-2, -2, 0]])
+
+    # line swap
+    # STARTVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
+    # STARTPOS = np.array([[3, -4, 0], [3, -2, 0], [3, 0, 0], [3, 2, 0], [3, 4, 0], [-3, -4, 0], [-3, -2, 0], [-3, 0, 0], [-3, 2, 0], [-3, 4, 0]])
+    # TARGETVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
+    # TARGETPOS = np.array([[-3, -4, 0], [-3, -2, 0], [-3, 0, 0], [-3, 2, 0], [-3, 4, 0], [3, -4, 0], [3, -2, 0], [3, 0, 0], [3, 2, 0], [3, 4, 0]])
+
+    # drone wall
+    # STARTVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
+    # STARTPOS = np.array([[-2, 0, -2], [-2, 0, 0], [-2, 0, 2], [0, 0, -2], [0, 0, 0], [0, 0, 2], [2, 0, -2], [2, 0, 0], [2, 0, 2], [0, -3, 0]])
+    # TARGETVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
+    # TARGETPOS = np.array([[-2, 0, -2], [-2, 0, 0], [-2, 0, 2], [0, 0, -2], [0, 0, 0], [0, 0, 2], [2, 0, -2], [2, 0, 0], [2, 0, 2], [0, 3, 0]])
+
+    # 3 axis swap
+    # STARTVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
+    # STARTPOS = np.array([[0, 0, .3], [0, 0, 1.3], [.5, 0, .8], [-.5, 0, .8], [0, .5, .8], [0, -.5, .8]])
+    # TARGETVEL = np.array([[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]])
+    # TARGETPOS = np.array([[0, 0, 1.3], [0, 0, 0.3], [-.5, 0, .8], [.5, 0, .8], [0, -.5, .8], [0, .5, .8]])
+
+
+    # circle swap
+    AGENTS = 4
+    STARTVEL = np.zeros([AGENTS, 3])
+    STARTPOS = circleCoordinates(AGENTS, 1, 0)
+    TARGETVEL = np.zeros([AGENTS, 3])
+    TARGETPOS = circleCoordinates(AGENTS, 1, 180)
+    print("initial distance: {}".format(np.linalg.norm(STARTPOS[0] - STARTPOS[1])))
+
+
+    AGENTS = STARTVEL.shape[0]
+    TIMESTEPS = 20
+    DIM = STARTVEL.shape[1]
+
+    TIMESTEP = .3
+    MAXJERK = 0.3
+
+    # weights for changing how much the final velocity error, the final position error and the drone-drone conflicts are considered
+    # try changing these if your results are bad
+    WVEL = 5
+    WPOS = 5
+    WCOL = .5
+
+    MINDIST = .6
+    COSTTARGET = 0.05
+
+    # every TRACESTRIDE-th iteration of the optimization is saved to trajectories/trace.npy, see trajectories/trace_plot.py
+    TRACESTRIDE = 10
+
+    # only the pairs of agents that come close are checked for collisions
+    costFun = CostFunctions(WVEL, WPOS, WCOL, MINDIST, AGENTS, TIMESTEPS, DIM, STARTVEL, STARTPOS, TARGETVEL, TARGETPOS, TIMESTEP, broadPhase=BroadPhase(MINDIST))
+
+    # AGENT TIMESTEP DIM
+    jerks = np.zeros([AGENTS, TIMESTEPS, DIM])
+    # randomize jerks
+    # maxRandom = 0.05
+    # for i in range(0, AGENTS):
+    #     tmp = np.zeros([TIMESTEPS, 3])
+    #     for j in range(0, TIMESTEPS):
+    #         tmp[j] = [random.uniform(-maxRandom, maxRandom), random.uniform(-maxRandom, maxRandom), random.uniform(-maxRandom, maxRandom)]
+    #     jerks[i] = tmp
+
+    # VALUEANDGRADIENT TARGET INITIALPARAM PARAMLIMIT STEPSIZE MAXSTEPS MOMENTUM
+    # initialJerks = momentumGradientDescent(lambda jerks: costFun.valueAndGradient(jerks, False), 0, jerks, MAXJERK, 0.0005, 50, 0.9)
+    # momentumGradientDescent(costFun.valueAndGradient, 0.05, initialJerks, MAXJERK, 0.0005, 700, 0.9)
+
+    # scenarios that were solved before are loaded, similar ones are a warm start
+    cache = WarmStartCache()
+    cachedJerks, exactHit = cache.lookup(costFun, COSTTARGET)
+
+    trace = None
+    if exactHit:
+        print("using the cached solution")
+        result = cachedJerks
+    else:
+        trace = OptimizationTrace(3000, TRACESTRIDE, costFun)
+        # VALUEANDGRADIENT TARGET INITIALPARAM PARAMLIMIT STEPSIZE MAXSTEPS BETA1 BETA2 EPSILON
+        if cachedJerks is None:
+            initialResult = adamGradientDescent(lambda jerks: costFun.valueAndGradient(jerks, False), 0, jerks, MAXJERK, 0.01, 50, 0.95, 0.99, 10**(-8))
+        else:
+            initialResult = cachedJerks
+        result = adamGradientDescent(costFun.valueAndGradient, COSTTARGET, initialResult, MAXJERK, 0.005, 3000, 0.95, 0.99, 10**(-8), trace)
+
+        # result = adamGradientDescent(costFun.valueAndGradient, 0.05, jerks, MAXJERK, 0.005, 4000, 0.95, 0.99, 10**(-8))
+
+        # the bounded quasi-Newton backend of optimizers.py needs far fewer evaluations
+        # result = LBFGS(verbose=True, callback=trace).minimize(costFun, initialResult, MAXJERK, StoppingCriteria(0.05, 300)).parameters
+
+    cost, _ = costFun.valueAndGradient(result)
+    # a solve that got stuck is not remembered, the next run optimizes the scenario again
+    if not exactHit and cost < COSTTARGET:
+        cache.store(costFun, result, cost)
+
+    print("\n ##### RESULTS #####")
+    print("Highest final velocity difference:", np.max(np.linalg.norm(TARGETVEL - costFun.velocities[:, -1, :], axis=1)))
+    print("Highest final position difference:", np.max(np.linalg.norm(TARGETPOS - costFun.positions[:, -1, :], axis=1)))
+    smallestDistance = sys.float_info.max
+    smallestDistanceTimestep = -1
+    smallestDistanceAgent1 = -1
+    smallestDistanceAgent2 = -1
+    for ag1 in range(0, costFun.agents):
+        for ag2 in range(ag1 + 1, costFun.agents):
+            posDiff = costFun.positions[ag1, :, :] - costFun.positions[ag2, :, :]
+            for step in range(0, costFun.timesteps):
+                dist = np.linalg.norm(posDiff[step, :])
+                if dist < smallestDistance:
+                    smallestDistance = dist
+                    smallestDistanceTimestep = step
+                    smallestDistanceAgent1 = ag1
+                    smallestDistanceAgent2 = ag2
+    print("Smallest distance: {0} at timestep {1} between agents {2} and {3}".format(smallestDistance, smallestDistanceTimestep, smallestDistanceAgent1, smallestDistanceAgent2), "\n")
+
+    np.save(sys.path[0] + "/trajectories/vel_traj.npy", costFun.velocities)
+    np.save(sys.path[0] + "/trajectories/pos_traj.npy", costFun.positions)
+    if trace is not None:
+        trace.save(sys.path[0] + "/trajectories/trace.npy")
@@ -0,0 +1,127 @@
+"""
+Solves the same scenario from several differently seeded initial jerks at once, one start per process. Symmetric scenarios like the circle swap
+can get stuck when all agents meet in the middle, a few randomized starts break the symmetry. The best cost reached by each iteration is shared
+between the processes, a start that is still far worse than the others were after as many iterations is given up to make room for them.
+"""
+import os
+import sys
+import time
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from gradient_descent import CostFunctions, circleCoordinates
+from optimizers import Adam, StoppingCriteria
+
+# the best cost of all starts by every shareInterval-th iteration, set in every process of the pool by _share
+_incumbent = None
+
+
+def _share(incumbent):
+    global _incumbent
+    _incumbent = incumbent
+
+
+class IncumbentStopping(StoppingCriteria):
+    """StoppingCriteria that also give up once the cost is more than ratio times the best cost any start reached by the same iteration, after grace iterations.
+        incumbent is a shared array with one best cost per shareInterval iterations. A start that stops shares its final cost for all later
+        iterations too, so starts that are queued behind finished ones are compared with what those had reached at the same point."""
+
+    def __init__(self, incumbent, ratio=3, grace=200, shareInterval=10, **criteria):
+        self.incumbent = incumbent
+        self.ratio = ratio
+        self.grace = grace
+        self.shareInterval = shareInterval
+        super().__init__(**criteria)
+
+
+    def reset(self):
+        super().reset()
+        self.iteration = 0
+
+
+    def check(self, cost, projectedGradient, evaluations):
+        reason = super().check(cost, projectedGradient, evaluations)
+        slot = min(self.iteration // self.shareInterval, len(self.incumbent) - 1)
+        if reason is not None:
+            with self.incumbent.get_lock():
+                for later in range(slot, len(self.incumbent)):
+                    self.incumbent[later] = min(self.incumbent[later], cost)
+        elif self.iteration % self.shareInterval == 0:
+            with self.incumbent.get_lock():
+                self.incumbent[slot] = min(self.incumbent[slot], cost)
+                best = self.incumbent[slot]
+            if self.iteration >= self.grace and cost > self.ratio * best:
+                reason = "worse than the best start"
+        self.iteration += 1
+        return reason
+
+
+def initialJerks(shape, seed, jitter):
+    """Start 0 is the zero jerks gradient_descent.py starts from, the others are uniformly random within jitter."""
+    if seed == 0:
+        return np.zeros(shape)
+    return np.random.RandomState(seed).uniform(-jitter, jitter, shape)
+
+
+def _solveStart(costFun, seed, maxJerk, optimizer, criteria, jitter, warmup):
+    """One start in a process of the pool, the optimization of the main of gradient_descent.py from seeded initial jerks."""
+    jerks = initialJerks((costFun.agents, costFun.timesteps, costFun.dim), seed, jitter)
+    if warmup > 0:
+        jerks = Adam(stepsize=0.01).minimize(lambda jerks: costFun.valueAndGradient(jerks, False), jerks, maxJerk, StoppingCriteria(0, warmup)).parameters
+    result = optimizer.minimize(costFun, jerks, maxJerk, IncumbentStopping(_incumbent, **criteria))
+    result.seed = seed
+    return result
+
+
+def multiStart(costFun, maxJerk, starts=16, optimizer=None, costTarget=0.05, maxSteps=3000, jitter=0.05, seed=0,
+               workers=None, ratio=3, grace=200, shareInterval=10, warmup=50):
+    """Optimizes costFun from starts initial jerks with the seeds seed..seed + starts - 1 on workers processes (one per core by default).
+        Returns the OptimizationResult with the lowest cost and the results of all starts, each with its seed."""
+    optimizer = optimizer if optimizer is not None else Adam()
+    criteria = {"costTarget": costTarget, "maxSteps": maxSteps, "ratio": ratio, "grace": grace, "shareInterval": shareInterval}
+    workers = workers if workers is not None else min(starts, os.cpu_count() or 1)
+    incumbent = multiprocessing.Array('d', [float("inf")] * (maxSteps // shareInterval + 1))
+    seeds = range(seed, seed + starts)
+
+    startTime = time.time()
+    if workers == 1:
+        _share(incumbent)
+        results = [_solveStart(costFun, s, maxJerk, optimizer, criteria, jitter, warmup) for s in seeds]
+    else:
+        with ProcessPoolExecutor(workers, initializer=_share, initargs=(incumbent,)) as pool:
+            futures = [pool.submit(_solveStart, costFun, s, maxJerk, optimizer, criteria, jitter, warmup) for s in seeds]
+            results = [future.result() for future in futures]
+
+    best = min(results, key=lambda result: result.cost)
+    print("{} starts on {} processes in {:.2f} s, best cost {:.5f} from seed {}, {} reached the cost target, {} given up".format(
+        starts, workers, time.time() - startTime, best.cost, best.seed,
+        sum(result.reason == "cost target" for result in results), sum(result.reason == "worse than the best start" for result in results)))
+    return best, results
+
+
+if __name__ == '__main__':
+    # the circle swap of gradient_descent.py with more agents, all of them meet in the center
+    AGENTS = 8
+    STARTVEL = np.zeros([AGENTS, 3])
+    STARTPOS = circleCoordinates(AGENTS, 1.5, 0)
+    TARGETVEL = np.zeros([AGENTS, 3])
+    TARGETPOS = circleCoordinates(AGENTS, 1.5, 180)
+
+    TIMESTEPS = 20
+    TIMESTEP = .3
+    MAXJERK = 0.3
+    WVEL = 5
+    WPOS = 5
+    WCOL = .5
+    MINDIST = .6
+    STARTS = 16
+
+    costFun = CostFunctions(WVEL, WPOS, WCOL, MINDIST, AGENTS, TIMESTEPS, 3, STARTVEL, STARTPOS, TARGETVEL, TARGETPOS, TIMESTEP)
+    best, results = multiStart(costFun, MAXJERK, STARTS)
+    for result in results:
+        print("seed {:2d}: {}".format(result.seed, result))
+
+    costFun.valueAndGradient(best.parameters)
+    np.save(sys.path[0] + "/trajectories/vel_traj.npy", costFun.velocities)
+    np.save(sys.path[0] + "/trajectories/pos_traj.npy", costFun.positions)
@@ -0,0 +1,351 @@
+"""
+Optimizers for the jerks of CostFunctions. All of them minimize a valueAndGradient function (or an object that has one, like CostFunctions)
+within the box -parameterLimit..parameterLimit, stop on the same StoppingCriteria and return an OptimizationResult.
+A callback, like an OptimizationTrace, is called at every iteration, without one the loop does nothing but optimize.
+"""
+import time
+from abc import ABC, abstractmethod
+import numpy as np
+
+
+class OptimizationResult:
+    """What an optimizer found and why it stopped."""
+
+    def __init__(self, parameters, cost, iterations, evaluations, reason, runtime):
+        self.parameters = parameters
+        self.cost = cost
+        self.iterations = iterations
+        self.evaluations = evaluations  # calls of valueAndGradient, line searches need more than one per iteration
+        self.reason = reason
+        self.runtime = runtime
+
+
+    def __str__(self):
+        return "cost {:.5f} after {} iterations and {} evaluations in {:.2f} s, stopped due to reaching {}".format(
+            self.cost, self.iterations, self.evaluations, self.runtime, self.reason)
+
+
+class StoppingCriteria:
+    """When an optimizer stops. None disables a criterion, the step limit always applies.
+        gradientTolerance is compared with the largest component of the projected gradient, which is 0 at a minimum on the bounds too.
+        costChangeTolerance stops after patience iterations in a row that improved the cost by less than this fraction.
+        maxTime is a budget in seconds for the whole minimization, for replanning within a fixed latency."""
+
+    def __init__(self, costTarget=0, maxSteps=1000, maxEvaluations=None, gradientTolerance=None, costChangeTolerance=None, patience=10, maxTime=None):
+        self.costTarget = costTarget
+        self.maxSteps = maxSteps
+        self.maxEvaluations = maxEvaluations
+        self.gradientTolerance = gradientTolerance
+        self.costChangeTolerance = costChangeTolerance
+        self.patience = patience
+        self.maxTime = maxTime
+        self.reset()
+
+
+    def reset(self):
+        self.previousCost = None
+        self.stalled = 0
+        self.startTime = time.monotonic()
+
+
+    def check(self, cost, projectedGradient, evaluations):
+        """Returns the reason to stop or None to go on."""
+        if cost < self.costTarget:
+            return "cost target"
+        if self.gradientTolerance is not None and np.max(np.abs(projectedGradient)) < self.gradientTolerance:
+            return "gradient tolerance"
+        if self.maxEvaluations is not None and evaluations >= self.maxEvaluations:
+            return "evaluation limit"
+        if self.maxTime is not None and time.monotonic() - self.startTime >= self.maxTime:
+            return "time limit"
+        if self.costChangeTolerance is not None and self.previousCost is not None:
+            if self.previousCost - cost < self.costChangeTolerance * max(abs(cost), 1e-12):
+                self.stalled += 1
+            else:
+                self.stalled = 0
+            if self.stalled >= self.patience:
+                return "cost change tolerance"
+        self.previousCost = cost
+        return None
+
+
+class Optimizer(ABC):
+    """The loop all optimizers share. Subclasses implement step(), which returns the next parameters and,
+        if a line search already evaluated them, their cost and gradient, and set lastStepsize to the step size they took.
+        callback(optimizer, iteration, parameters, cost, projectedGradient) is called before every iteration."""
+
+    # the cost functions overwrite their gradient on the next call, optimizers that still need it after evaluating other parameters get a copy
+    copyGradient = False
+
+    def __init__(self, verbose=False, callback=None):
+        self.verbose = verbose
+        self.callback = callback
+
+
+    def minimize(self, problem, initialParameters, parameterLimit, stopping=None):
+        self.problem = problem
+        valueAndGradient = getattr(problem, 'valueAndGradient', problem)
+        stopping = stopping if stopping is not None else StoppingCriteria()
+        stopping.reset()
+        self.lower = -parameterLimit
+        self.upper = parameterLimit
+        self.evaluations = 0
+        startTime = time.time()
+
+        def evaluate(parameters):
+            self.evaluations += 1
+            cost, gradient = valueAndGradient(parameters)
+            return cost, np.array(gradient) if self.copyGradient else gradient
+
+        parameters = np.array(initialParameters, dtype=float)
+        self.stuck = False  # set by step() when it can not find any descent any more
+        self.lastStepsize = np.nan
+        self.start(parameters)
+        cost, gradient = evaluate(parameters)
+        reason = "step limit"
+        iterations = stopping.maxSteps
+        for iteration in range(0, stopping.maxSteps):
+            projectedGradient = self.projectedGradient(parameters, gradient)
+            if self.callback is not None:
+                self.callback(self, iteration, parameters, cost, projectedGradient)
+            stop = stopping.check(cost, projectedGradient, self.evaluations)
+            if stop is not None:
+                reason = stop
+                iterations = iteration
+                break
+
+            parameters, newCost, newGradient = self.step(iteration, parameters, cost, gradient, evaluate)
+            if newCost is None:
+                newCost, newGradient = evaluate(parameters)
+            cost, gradient = newCost, newGradient
+            if self.stuck:
+                reason = "no further descent"
+                iterations = iteration + 1
+                break
+
+        result = OptimizationResult(parameters, cost, iterations, self.evaluations, reason, time.time() - startTime)
+        if self.verbose:
+            print(result)
+        return result
+
+
+    def project(self, parameters):
+        return np.clip(parameters, self.lower, self.upper, out=parameters)
+
+
+    def projectedGradient(self, parameters, gradient):
+        """The gradient without the components that point out of the box at a bound."""
+        return parameters - np.clip(parameters - gradient, self.lower, self.upper)
+
+
+    def start(self, parameters):
+        pass
+
+
+    @abstractmethod
+    def step(self, iteration, parameters, cost, gradient, evaluate):
+        """Takes one step from the parameters, see the class docstring for what it returns."""
+
+
+class Adam(Optimizer):
+    """The Adam loop of adamGradientDescent, with its step size decay stepsize / (1 + decay * i)."""
+
+    def __init__(self, stepsize=0.005, beta1=0.95, beta2=0.99, eps=10**(-8), decay=0.01, verbose=False, callback=None):
+        super().__init__(verbose, callback)
+        self.stepsize = stepsize
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.eps = eps
+        self.decay = decay
+
+
+    def start(self, parameters):
+        self.m = np.zeros(parameters.shape)
+        self.v = np.zeros(parameters.shape)
+        self.update = np.zeros(parameters.shape)
+
+
+    def step(self, iteration, parameters, cost, gradient, evaluate):
+        curStepsize = self.stepsize / (1 + self.decay * iteration)
+        self.lastStepsize = curStepsize
+        self.m *= self.beta1
+        self.m += (1 - self.beta1) * gradient
+        self.v *= self.beta2
+        self.v += (1 - self.beta2) * gradient**2
+        # mHat = m / (1 - beta1), vHat = v / (1 - beta2)
+        np.divide(self.v, 1 - self.beta2, out=self.update)
+        np.sqrt(self.update, out=self.update)
+        self.update += self.eps
+        np.divide(self.m / (1 - self.beta1), self.update, out=self.update)
+        self.update *= curStepsize
+        parameters -= self.update
+        return self.project(parameters), None, None
+
+
+class Momentum(Optimizer):
+    """The loop of momentumGradientDescent."""
+
+    def __init__(self, stepsize=0.0005, momentum=0.9, verbose=False, callback=None):
+        super().__init__(verbose, callback)
+        self.stepsize = stepsize
+        self.momentum = momentum
+
+
+    def start(self, parameters):
+        self.v = np.zeros(parameters.shape)
+        self.lastStepsize = self.stepsize
+
+
+    def step(self, iteration, parameters, cost, gradient, evaluate):
+        self.v *= self.momentum
+        self.v += self.stepsize * gradient
+        parameters -= self.v
+        return self.project(parameters), None, None
+
+
+def _armijoSearch(parameters, cost, gradient, direction, stepsize, evaluate, project, shrink=0.5, c=1e-4, maxTries=30):
+    """Backtracks along the projected path project(parameters + stepsize * direction) until the cost decreases enough.
+        Returns the new parameters, cost, gradient and the accepted step size, or the old parameters if no step helps."""
+    for _ in range(0, maxTries):
+        candidate = project(parameters + stepsize * direction)
+        change = candidate - parameters
+        decrease = np.sum(gradient * change)
+        if decrease >= 0 or np.max(np.abs(change)) < 1e-12:
+            break  # the projection removed every descent
+        newCost, newGradient = evaluate(candidate)
+        if newCost <= cost + c * decrease:
+            return candidate, newCost, newGradient, stepsize
+        stepsize *= shrink
+    return parameters, cost, gradient, 0
+
+
+class ProjectedGradient(Optimizer):
+    """Steepest descent projected onto the box with an Armijo backtracking line search. The accepted step size is doubled for the next iteration."""
+
+    copyGradient = True
+
+    def __init__(self, stepsize=0.01, verbose=False, callback=None):
+        super().__init__(verbose, callback)
+        self.initialStepsize = stepsize
+
+
+    def start(self, parameters):
+        self.stepsize = self.initialStepsize
+
+
+    def step(self, iteration, parameters, cost, gradient, evaluate):
+        parameters, cost, gradient, stepsize = _armijoSearch(parameters, cost, gradient, -gradient, self.stepsize, evaluate, self.project)
+        self.stuck = stepsize == 0
+        self.lastStepsize = stepsize
+        self.stepsize = 2 * stepsize
+        return parameters, cost, gradient
+
+
+class LBFGS(Optimizer):
+    """Limited memory BFGS projected onto the box. Parameters at a bound whose gradient points out of the box are kept fixed,
+        the quasi-Newton direction of the others is searched with an Armijo line search along the projected path."""
+
+    copyGradient = True
+
+    def __init__(self, memory=10, verbose=False, callback=None):
+        super().__init__(verbose, callback)
+        self.memory = memory
+
+
+    def start(self, parameters):
+        self.pairs = []  # (s, y, 1 / (y.s)) of the last iterations
+
+
+    def _direction(self, gradient, free):
+        """The two loop recursion of L-BFGS, restricted to the free parameters."""
+        q = gradient * free
+        alphas = []
+        for s, y, _ in reversed(self.pairs):
+            s, y = s * free, y * free
+            sy = np.sum(s * y)
+            alpha = np.sum(s * q) / sy if sy > 1e-12 else 0
+            q -= alpha * y
+            alphas.append((alpha, sy))
+        if self.pairs:
+            s, y = self.pairs[-1][0] * free, self.pairs[-1][1] * free
+            yy = np.sum(y * y)
+            if yy > 0:
+                q *= max(np.sum(s * y), 0) / yy
+        for (s, y, _), (alpha, sy) in zip(self.pairs, reversed(alphas)):
+            if sy > 1e-12:
+                s, y = s * free, y * free
+                beta = np.sum(y * q) / sy
+                q += (alpha - beta) * s
+        return -q * free
+
+
+    def step(self, iteration, parameters, cost, gradient, evaluate):
+        # parameters at a bound that the gradient pushes further out stay where they are
+        free = ~(((parameters <= self.lower) & (gradient > 0)) | ((parameters >= self.upper) & (gradient < 0)))
+        direction = self._direction(gradient, free)
+        if np.sum(direction * gradient) >= 0:
+            self.pairs = []  # not a descent direction any more, start over with steepest descent
+            direction = -gradient * free
+        stepsize = 1.0 if self.pairs else 1.0 / max(1.0, np.max(np.abs(direction)))
+
+        newParameters, newCost, newGradient, accepted = _armijoSearch(parameters, cost, gradient, direction, stepsize, evaluate, self.project)
+        self.lastStepsize = accepted
+        if accepted == 0:
+            self.stuck = not self.pairs  # even steepest descent failed
+            self.pairs = []
+            return newParameters, newCost, newGradient
+        s = newParameters - parameters
+        y = newGradient - gradient
+        sy = np.sum(s * y)
+        if sy > 1e-12:
+            self.pairs.append((s, y, 1 / sy))
+            if len(self.pairs) > self.memory:
+                self.pairs.pop(0)
+        return newParameters, newCost, newGradient
+
+
+def printIteration(optimizer, iteration, parameters, cost, projectedGradient):
+    """A callback that prints the cost of every iteration."""
+    print("Iteration {} Cost = {}".format(iteration, cost))
+
+
+# the columns of an OptimizationTrace
+TRACEFIELDS = ["iteration", "cost", "velocityCost", "positionCost", "collisionCost", "gradientNorm", "stepsize", "minSeparation", "wallTime"]
+
+
+class OptimizationTrace:
+    """A callback that records every stride-th iteration into a structured array with the columns of TRACEFIELDS, allocated up front for maxSteps iterations.
+        The cost terms and the smallest distance between agents come from problem.costTerms (the problem of the optimizer if None), NaN without one.
+        gradientNorm is the norm of the projected gradient, stepsize the step that led to the sample and wallTime the seconds since the first sample without the time spent recording.
+        One trace can record several minimizations one after another, their iterations start at 0 each time."""
+
+    def __init__(self, maxSteps=1000, stride=1, problem=None):
+        self.stride = stride
+        self.problem = problem
+        self.data = np.full(maxSteps // stride + 1, np.nan, dtype=[(field, float) for field in TRACEFIELDS])
+        self.samples = 0
+        self.startTime = None
+        self.overhead = 0
+
+
+    def __call__(self, optimizer, iteration, parameters, cost, projectedGradient):
+        if iteration % self.stride != 0 or self.samples >= len(self.data):
+            return
+        now = time.monotonic()
+        if self.startTime is None:
+            self.startTime = now
+        costTerms = getattr(self.problem if self.problem is not None else optimizer.problem, 'costTerms', None)
+        terms = costTerms(parameters) if costTerms is not None else (np.nan, np.nan, np.nan, np.nan)
+        self.data[self.samples] = (iteration, cost, terms[0], terms[1], terms[2], np.linalg.norm(projectedGradient),
+                                   optimizer.lastStepsize, terms[3], now - self.startTime - self.overhead)
+        self.samples += 1
+        self.overhead += time.monotonic() - now
+
+
+    def records(self):
+        """The recorded samples, load a saved trace with np.load and index it by the field names, e.g. trace["cost"]."""
+        return self.data[:self.samples]
+
+
+    def save(self, path):
+        np.save(path, self.records())
@@ -0,0 +1,105 @@
+import numpy as np
+
+# the trajectory memory of the crazyflie firmware and the size of one packed Poly4D segment (duration + 4 * 8 float coefficients)
+TRAJECTORYMEMORY = 4096
+SEGMENTBYTES = 132
+
+ORDER = 7
+SUBSTEPS = 4  # reference points between two samples at which the error of a fit is checked
+
+
+def _derivativeFactors(derivative):
+    """Returns the factors n! / (n - derivative)! that a derivative brings to the coefficient of t^n, 0 for the powers that vanish."""
+    factors = np.zeros(ORDER + 1)
+    for n in range(derivative, ORDER + 1):
+        factor = 1
+        for m in range(0, derivative):
+            factor *= n - m
+        factors[n] = factor
+    return factors
+
+
+def polyval(coefficients, t, derivative=0):
+    """Evaluates the polynomials with the coefficients (..., ORDER + 1) or one of their derivatives at the times t,
+        which broadcast against the leading dimensions of the coefficients."""
+    powers = np.arange(0, ORDER + 1)
+    basis = _derivativeFactors(derivative) * np.asarray(t, dtype=float)[..., None] ** np.maximum(powers - derivative, 0)
+    return np.sum(basis * coefficients, axis=-1)
+
+
+def hermiteCoefficients(p0, p1, v0, v1, h):
+    """The coefficients c2 and c3 of the cubic p0 + v0 t + c2 t^2 + c3 t^3 through the positions and velocities at both ends of a step of h seconds.
+        The planner keeps the jerk constant during a step, so this cubic is exactly the planned motion."""
+    c2 = (3 * (p1 - p0) - (2 * v0 + v1) * h) / h**2
+    c3 = (2 * (p0 - p1) + (v0 + v1) * h) / h**3
+    return c2, c3
+
+
+def hermite(positions, velocities, times, substeps=SUBSTEPS):
+    """Densifies sampled positions (timesteps, 3) and velocities with one cubic per step, which is the motion the planner produces with a constant jerk per step.
+        Returns the times, positions and velocities of the dense reference and the acceleration at the first sample."""
+    denseTimes = [times[:1]]
+    densePos = [positions[:1]]
+    denseVel = [velocities[:1]]
+    startAcc = np.zeros(positions.shape[1])
+    for k in range(0, len(times) - 1):
+        h = times[k + 1] - times[k]
+        c2, c3 = hermiteCoefficients(positions[k], positions[k + 1], velocities[k], velocities[k + 1], h)
+        coefficients = np.zeros([positions.shape[1], ORDER + 1])
+        coefficients[:, :4] = np.array([positions[k], velocities[k], c2, c3]).T
+        if k == 0:
+            startAcc = 2 * c2
+        local = np.arange(1, substeps + 1) / substeps * h
+        denseTimes.append(times[k] + local)
+        densePos.append(evaluate(coefficients, local))
+        denseVel.append(evaluate(coefficients, local, 1))
+    return np.concatenate(denseTimes), np.concatenate(densePos), np.concatenate(denseVel), startAcc
+
+
+def fitSegment(times, positions, velocities, start):
+    """Fits a 7th order polynomial to the reference points starting at time 0 with the fixed position, velocity and acceleration in start (3, 3).
+        Returns the coefficients (3, 8) and the largest position error."""
+    duration = max(times[-1], 1e-6)
+    s = times / duration  # normalized time keeps the least squares problem well conditioned
+    p0, v0, a0 = start[0], start[1] * duration, start[2] * duration**2
+    fixedPos = p0 + np.outer(s, v0) + 0.5 * np.outer(s**2, a0)
+    fixedVel = v0 + np.outer(s, a0)
+
+    powers = np.arange(3, ORDER + 1)
+    posBasis = s[:, None] ** powers
+    velBasis = powers * s[:, None] ** (powers - 1)
+    A = np.vstack([posBasis, velBasis])
+    b = np.vstack([positions - fixedPos, velocities * duration - fixedVel])
+    free = np.linalg.lstsq(A, b, rcond=None)[0]  # (5, 3)
+
+    normalized = np.vstack([p0, v0, 0.5 * a0, free])  # (8, 3) coefficients in s
+    coefficients = normalized / duration ** np.arange(0, ORDER + 1)[:, None]
+    error = np.max(np.linalg.norm(posBasis.dot(free) + fixedPos - positions, axis=1))
+    return coefficients.T, error
+
+
+def evaluate(coefficients, t, derivative=0):
+    """Evaluates the coefficients (3, 8) of a segment or one of its derivatives at the times t, returns (len(t), 3)."""
+    return polyval(coefficients, np.atleast_1d(t)[:, None], derivative)
+
+
+def segmentRow(duration, coefficients):
+    """Returns a segment with the coefficients (3, 8) as a row of figure8.py, the yaw stays 0."""
+    return [duration] + list(coefficients[0]) + list(coefficients[1]) + list(coefficients[2]) + [0] * (ORDER + 1)
+
+
+def sampleTrajectory(rows, times):
+    """Returns the positions (len(times), 3) of a fitted trajectory at the supplied times, times after the end hold the last position."""
+    times = np.asarray(times, dtype=float)
+    positions = np.zeros([len(times), 3])
+    segmentStart = 0
+    for i, row in enumerate(rows):
+        duration = row[0]
+        coefficients = np.array([row[1:9], row[9:17], row[17:25]])
+        if i == len(rows) - 1:
+            inside = times >= segmentStart
+        else:
+            inside = (times >= segmentStart) & (times < segmentStart + duration)
+        positions[inside] = evaluate(coefficients, np.minimum(times[inside] - segmentStart, duration))
+        segmentStart += duration
+    return positions
@@ -0,0 +1,223 @@
+"""
+Receding horizon planning. Instead of playing one offline plan open loop, the remaining jerks are optimized again at a fixed rate
+from the measured states of the drones, so drift is corrected on the way. Every solve starts from the previous solution shifted
+by the time that passed and stops after a few iterations or its time budget, whichever comes first.
+The planner is a source of setpoint_player.py, a SetpointPlayer streams the latest plan while it is replanned in the background.
+"""
+import os
+import sys
+import time
+import threading
+import numpy as np
+
+from gradient_descent import CostFunctions
+from broad_phase import BroadPhase
+from optimizers import Adam, StoppingCriteria
+from poly_trajectory import hermiteCoefficients
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'drone_simulator'))
+from setpoint_player import PlannedTrajectory  # noqa: E402
+
+
+def _accelerationAndJerk(trajectory, t):
+    """The acceleration and the jerk (agents, 3) of a PlannedTrajectory at the time t of its times, from the cubic around t."""
+    times = trajectory.times
+    t = min(max(t, times[0]), times[-1])
+    k = min(max(np.searchsorted(times, t, side="right") - 1, 0), len(times) - 2)
+    c2, c3 = hermiteCoefficients(trajectory.positions[:, k], trajectory.positions[:, k + 1], trajectory.velocities[:, k], trajectory.velocities[:, k + 1], times[k + 1] - times[k])
+    return 2 * c2 + 6 * c3 * (t - times[k]), 6 * c3
+
+
+class RecedingHorizonPlanner:
+    """Plans the agents from their start to the target states within timesteps steps of t seconds and replans the rest of the horizon
+        from measured states. The end of the plan stays fixed, so the horizon shrinks with every replan until only minSteps are left,
+        then the last plan is flown to the end. Each replan is capped at iterationsPerCycle iterations and latencyBudget seconds."""
+
+    def __init__(self, targetPos, targetVel, timesteps, t, wVel=5, wPos=5, wCol=.5, minDist=.6, maxJerk=.3,
+                 optimizer=None, iterationsPerCycle=30, latencyBudget=0.03, minSteps=3, broadPhase=False):
+        self.targetPos = np.asarray(targetPos, dtype=float)
+        self.targetVel = np.asarray(targetVel, dtype=float)
+        self.agents, self.dim = self.targetPos.shape
+        self.timesteps = timesteps
+        self.t = t
+        self.weights = (wVel, wPos, wCol)
+        self.minDist = minDist
+        self.maxJerk = maxJerk
+        self.optimizer = optimizer if optimizer is not None else Adam(stepsize=0.005)
+        self.iterationsPerCycle = iterationsPerCycle
+        self.latencyBudget = latencyBudget
+        self.minSteps = minSteps
+        self.broadPhase = broadPhase
+        self.duration = (timesteps - 1) * t
+
+        self.costFunctions = {}  # one per horizon length, their workspaces are reused by every replan
+        self.plan = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.replans = 0
+        self.maxSolveTime = 0
+        self.totalSolveTime = 0
+        self.overruns = 0
+
+
+    def _costFunction(self, steps, startPos, startVel, startAcc):
+        costFun = self.costFunctions.get(steps)
+        if costFun is None:
+            wVel, wPos, wCol = self.weights
+            broadPhase = BroadPhase(self.minDist) if self.broadPhase else None
+            costFun = CostFunctions(wVel, wPos, wCol, self.minDist, self.agents, steps, self.dim, startVel, startPos,
+                                    self.targetVel, self.targetPos, self.t, broadPhase=broadPhase, startAcc=startAcc)
+            self.costFunctions[steps] = costFun
+        else:
+            costFun.setStartState(startPos, startVel, startAcc)
+        return costFun
+
+
+    def _setPlan(self, costFun, jerks, firstStep, lead=None):
+        """Replaces the plan the player samples, a single assignment so the player never sees half of it.
+            The plan starts at step firstStep of the horizon, lead is the measured (time, positions, velocities) before it."""
+        times = (firstStep + np.arange(0, costFun.timesteps)) * self.t
+        positions = np.array(costFun.positions)
+        velocities = np.array(costFun.velocities)
+        if lead is not None:
+            times = np.concatenate([[lead[0]], times])
+            positions = np.concatenate([lead[1][:, None], positions], axis=1)
+            velocities = np.concatenate([lead[2][:, None], velocities], axis=1)
+        self.plan = (PlannedTrajectory(positions, velocities, times=times), np.array(jerks), firstStep)
+
+
+    def start(self, startPos, startVel, startAcc=None, initialJerks=None, maxSteps=3000, costTarget=0.05):
+        """Solves the whole horizon without a latency budget, before the drones are on their way. Time 0 of sample is now."""
+        startPos = np.asarray(startPos, dtype=float)
+        startVel = np.asarray(startVel, dtype=float)
+        startAcc = np.zeros(startPos.shape) if startAcc is None else np.asarray(startAcc, dtype=float)
+        costFun = self._costFunction(self.timesteps, startPos, startVel, startAcc)
+        if initialJerks is None:
+            initialJerks = Adam(stepsize=0.01).minimize(lambda jerks: costFun.valueAndGradient(jerks, False), np.zeros([self.agents, self.timesteps, self.dim]),
+                                                        self.maxJerk, StoppingCriteria(0, 50)).parameters
+        result = self.optimizer.minimize(costFun, initialJerks, self.maxJerk, StoppingCriteria(costTarget, maxSteps))
+        costFun.valueAndGradient(result.parameters)
+        self._setPlan(costFun, result.parameters, 0)
+        self.startClock()
+        print("initial plan: {}".format(result))
+        return result
+
+
+    def startClock(self):
+        """Sets time 0 of sample and replan to now, call it when the drones start to fly the plan."""
+        self.startTime = time.monotonic()
+
+
+    def replan(self, positions, velocities, accelerations=None, now=None):
+        """Optimizes the rest of the horizon from the measured states at now (seconds since start). Without measured accelerations
+            the ones of the current plan are used. Returns the OptimizationResult, or None once the horizon is too short to replan."""
+        now = time.monotonic() - self.startTime if now is None else now
+        trajectory, previousJerks, previousFirstStep = self.plan
+        nextStep = int(np.ceil(now / self.t - 1e-9))
+        steps = self.timesteps - nextStep
+        if steps < self.minSteps:
+            return None
+
+        # the new plan starts at the next step, the measured state is moved there with the jerk of the current plan
+        positions = np.asarray(positions, dtype=float)
+        velocities = np.asarray(velocities, dtype=float)
+        plannedAcc, jerk = _accelerationAndJerk(trajectory, now)
+        accelerations = plannedAcc if accelerations is None else np.asarray(accelerations, dtype=float)
+        dt = nextStep * self.t - now
+        startPos = positions + velocities * dt + accelerations * dt**2 / 2 + jerk * dt**3 / 6
+        startVel = velocities + accelerations * dt + jerk * dt**2 / 2
+        startAcc = accelerations + jerk * dt
+
+        # the previous solution shifted by the steps that passed, both end at the last step of the horizon
+        initialJerks = np.array(previousJerks[:, nextStep - previousFirstStep:])
+
+        costFun = self._costFunction(steps, startPos, startVel, startAcc)
+        stopping = StoppingCriteria(0.05, self.iterationsPerCycle, maxTime=self.latencyBudget)
+        result = self.optimizer.minimize(costFun, initialJerks, self.maxJerk, stopping)
+        costFun.valueAndGradient(result.parameters)
+        self._setPlan(costFun, result.parameters, nextStep, (now, positions, velocities) if dt > 1e-3 else None)
+        return result
+
+
+    def sample(self, t):
+        """Returns the positions (agents, 3) of the latest plan at t seconds after start, like the sources of setpoint_player.py."""
+        trajectory = self.plan[0]
+        return trajectory.sample(t - trajectory.times[0])
+
+
+    def run(self, measure, rate=10):
+        """Replans rate times per second until the horizon is used up or stop is called. measure returns the current
+            (positions, velocities) or (positions, velocities, accelerations) of all agents, or None to skip a cycle."""
+        period = 1 / rate
+        cycle = 0
+        while not self._stop.is_set():
+            cycle += 1
+            remaining = self.startTime + cycle * period - time.monotonic()
+            if remaining > 0:
+                self._stop.wait(remaining)
+            if self._stop.is_set():
+                break
+            state = measure()
+            if state is None:
+                continue
+            solveStart = time.monotonic()
+            result = self.replan(*state, now=solveStart - self.startTime)
+            if result is None:
+                break
+            solveTime = time.monotonic() - solveStart
+            self.replans += 1
+            self.totalSolveTime += solveTime
+            self.maxSolveTime = max(self.maxSolveTime, solveTime)
+            if solveTime > period:
+                self.overruns += 1
+                cycle += int(solveTime / period)  # skip the cycles that are already over
+        print("{} replans, mean {:.1f} ms, max {:.1f} ms, {} longer than a cycle".format(
+            self.replans, 1000 * self.totalSolveTime / max(self.replans, 1), 1000 * self.maxSolveTime, self.overruns))
+
+
+    def startReplanning(self, measure, rate=10):
+        """Runs run in a background thread, so a SetpointPlayer can stream the plan from the main thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, args=(measure, rate), daemon=True)
+        self._thread.start()
+
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+if __name__ == '__main__':
+    # the circle swap of gradient_descent.py, flown by simulated drones that drift away from their plan
+    from gradient_descent import circleCoordinates
+
+    AGENTS = 4
+    TIMESTEPS = 20
+    TIMESTEP = .3
+    RATE = 10
+    DRIFT = 0.05  # m/s of random drift of each drone
+
+    rng = np.random.RandomState(0)
+    drift = rng.normal(0, DRIFT, [AGENTS, 3])
+    startPos = circleCoordinates(AGENTS, 1, 0)
+    planner = RecedingHorizonPlanner(circleCoordinates(AGENTS, 1, 180), np.zeros([AGENTS, 3]), TIMESTEPS, TIMESTEP)
+    planner.start(startPos, np.zeros([AGENTS, 3]))
+    openLoopEnd = planner.sample(planner.duration) + drift * planner.duration
+
+    # the drones fly the latest plan and drift, every replan starts from where they really are
+    simulated = np.array(startPos)
+    for cycle in range(1, int(planner.duration * RATE) + 1):
+        now = cycle / RATE
+        simulated += planner.sample(now) - planner.sample(now - 1 / RATE) + drift / RATE
+        velocities = (planner.sample(now + 1e-6) - planner.sample(now - 1e-6)) / 2e-6
+        solveStart = time.monotonic()
+        result = planner.replan(simulated, velocities, now=now)
+        if result is None:
+            continue
+        print("{:4.1f} s: {:2d} steps left, cost {:.4f}, {:2d} iterations in {:.1f} ms".format(
+            now, planner.timesteps - planner.plan[2], result.cost, result.iterations, 1000 * (time.monotonic() - solveStart)))
+
+    print("largest distance to the target at the end: {:.3f} m, {:.3f} m without replanning".format(
+        np.max(np.linalg.norm(simulated - planner.targetPos, axis=1)), np.max(np.linalg.norm(openLoopEnd - planner.targetPos, axis=1))))
@@ -1,165 +1,14 @@
+import os
 import sys
 import random
 import numpy as np
 import math
 import time
 
-
-class CostFunctions():
-
-    positions = 0
-    velocities = 0
-
-    def __init__(self, wVel, wPos, wCol, minDist, agents, timesteps, dim, startVel, startPos, targetVel, targetPos, t):
-        self.wVel = wVel
-        self.wPos = wPos
-        self.wCol = wCol
-        self.minDist = minDist
-
-        self.agents = agents
-        self.timesteps = timesteps
-        self.dim = dim
-        self.startVel = startVel
-        self.startPos = startPos
-        self.targetVel = targetVel
-        self.targetPos = targetPos
-        self.t = t
-
-
-    def _calculateTrajectories(self, jerks):
-        positionSum = 0
-        v = np.zeros([self.agents, self.timesteps, self.dim])
-        p = np.zeros([self.agents, self.timesteps, self.dim])
-        v[:, 0, :] = self.startVel
-        p[:, 0, :] = self.startPos
-        for k in range(0, self.timesteps - 1):
-            velocitySum = 0
-            positionSum = 0
-            for i in range(0, k + 1):
-                velocitySum += ((k - i) + 0.5) * jerks[:, i, :]
-                positionSum += ((k - i)**2 + (k - i) + 0.3333) * jerks[:, i, :]
-            v[:, k + 1, :] = self.startVel + self.t**2 * velocitySum
-            p[:, k + 1, :] = self.startPos + (k + 1) * self.t * self.startVel + 0.5 * self.t**3 * positionSum
-        self.velocities = v
-        self.positions = p
-
-
-    def _velocityGrad(self, jerks, k):
-        velGrad = np.zeros([self.agents, self.timesteps, self.dim])
-        for i in range(0, k):
-            velGrad[:, i, :] = self.t**2 * ((k - i) + 0.5)
-        for i in range(k, self.timesteps):
-            velGrad[:, i, :] = 0
-        return velGrad
-
-
-    def _positionGrad(self, jerks, k):
-        posGrad = np.zeros([self.agents, self.timesteps, self.dim])
-        for i in range(0, k):
-            posGrad[:, i, :] = 0.5 * self.t**3 * ((k - i)**2 + (k - i) + 0.3333)
-        # for i in range(k, self.timesteps):
-        #     posGrad[:, i, :] = 0
-        return posGrad
-
-
-    def cost(self, jerks):
-        self._calculateTrajectories(jerks)
-        cost = 0
-        cost += np.sum(self.wVel * (self.velocities[:, -1, :] - self.targetVel)**2)  # add target velocity cost
-        cost += np.sum(self.wPos * (self.positions[:, -1, :] - self.targetPos)**2)  # add target position cost
-
-        # add drone-drone conflict cost
-        for ag1 in range(0, self.agents):
-            for ag2 in range(ag1 + 1, self.agents):
-                posDiff = self.positions[ag1, :, :] - self.positions[ag2, :, :]
-                for step in range(0, self.timesteps):
-                    dist = np.linalg.norm(posDiff[step, :])
-                    if dist < self.minDist:
-                        cost += self.wCol * (1 - dist / self.minDist)**2
-
-        return cost
-
-
-    def gradient(self, jerks):
-        costGrad = np.zeros([self.agents, self.timesteps, self.dim])
-
-        # gradient due to difference between target and actual end velocity/position
-        endVelGrad = self._velocityGrad(jerks, self.timesteps)
-        endPosGrad = self._positionGrad(jerks, self.timesteps)
-        for i in range(0, self.timesteps):
-            costGrad[:, i, :] += self.wVel * 2 * (self.velocities[:, -1, :] - self.targetVel) * endVelGrad[:, i, :]
-            costGrad[:, i, :] += self.wPos * 2 * (self.positions[:, -1, :] - self.targetPos) * endPosGrad[:, i, :]
-
-        # gradient due to drone-drone conflicts
-        for ag1 in range(0, self.agents):
-            for ag2 in range(ag1 + 1, self.agents):
-                posDiff = self.positions[ag1, :, :] - self.positions[ag2, :, :]
-                for step in range(0, self.timesteps):
-                    dist = np.linalg.norm(posDiff[step, :])
-                    if dist < self.minDist:
-                        positionGrad = self._positionGrad(jerks, step)
-                        grad = self.wCol * 2 * (1 - posDiff[step, :] / self.minDist) * (positionGrad[ag2, :, :]) / self.minDist
-                        costGrad[ag1, :, :] += grad
-                        costGrad[ag2, :, :] -= grad
-
-        return costGrad
-
-
-    def gradientNoCollision(self, jerks):
-        costGrad = np.zeros([self.agents, self.timesteps, self.dim])
-
-        # gradient due to difference between target and actual end velcity/position
-        endVelGrad = self._velocityGrad(jerks, self.timesteps)
-        endPosGrad = self._positionGrad(jerks, self.timesteps)
-        for i in range(0, self.timesteps):
-            costGrad[:, i, :] += self.wVel * 2 * (self.velocities[:, -1, :] - self.targetVel) * endVelGrad[:, i, :]
-            costGrad[:, i, :] += self.wPos * 2 * (self.positions[:, -1, :] - self.targetPos) * endPosGrad[:, i, :]
-
-        return costGrad
-
-
-def momentumGradientDescent(costFunction, costTarget, gradientFunction, initialParameters, parameterLimit, stepsize, maxSteps, momentum):
-    parameters = initialParameters
-    v = np.zeros(initialParameters.shape)
-    for i in range(0, maxSteps):
-        cost = costFunction(parameters)
-        gradient = gradientFunction(parameters)
-        print("Iteration {} Cost = {}".format(i, cost))
-
-        if(cost < costTarget):
-            print("stopping due to reaching cost target")
-            return parameters
-
-        v = momentum * v + stepsize * gradient
-        parameters -= v
-        parameters = np.clip(parameters, -parameterLimit, parameterLimit)
-
-    print("stopping due to reaching step limit")
-    return parameters
-
-
-def adamGradientDescent(costFunction, costTarget, gradientFunction, initialParameters, parameterLimit, stepsize, maxSteps, beta1, beta2, eps):
-    parameters = initialParameters
-    m = np.zeros(initialParameters.shape)
-    v = np.zeros(initialParameters.shape)
-    for i in range(0, maxSteps):
-        cost = costFunction(parameters)
-        gradient = gradientFunction(parameters)
-
-        if(cost < costTarget):
-            return parameters
-
-        curStepsize = stepsize / (1 + 0.01 * i)
-        # curStepsize = stepsize
-
-        m = beta1 * m + (1 - beta1) * gradient
-        v = beta2 * v + (1 - beta2) * gradient**2
-        mHat = m / (1 - beta1)
-        vHat = v / (1 - beta2)
-        parameters -= curStepsize / (np.sqrt(vHat) + eps) * mHat
-        parameters = np.clip(parameters, -parameterLimit, parameterLimit)
-
-    return parameters
+# time the cost functions and optimizers of the planner itself, without a callback they do not print or record anything
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from gradient_descent import CostFunctions  # noqa: E402
+from optimizers import Adam, StoppingCriteria  # noqa: E402
 
 
 # first position is at the center towards the window, then counter clockwise
@@ -196,7 +45,7 @@ for i in range(0, 20):
     jerks = np.zeros([AGENTS, TIMESTEPS, DIM])
 
     now = time.time()
-    result = adamGradientDescent(costFun.cost, 0, costFun.gradient, jerks, MAXJERK, 0.005, 100, 0.95, 0.99, 10**(-8))
+    result = Adam(0.005).minimize(costFun, jerks, MAXJERK, StoppingCriteria(0, 100)).parameters
     runtime = time.time() - now
     print(runtime)
     times.append(runtime)
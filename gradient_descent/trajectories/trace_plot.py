@@ -0,0 +1,21 @@
+import sys
+import numpy as np
+import matplotlib.pyplot as plt
+
+# the OptimizationTrace that gradient_descent.py saves next to the trajectory
+trace = np.load(sys.path[0] + "/trace.npy")
+
+print("Showing {} samples of the optimization, the last one at iteration {:.0f}".format(len(trace), trace["iteration"][-1]))
+
+fig, (costAx, separationAx) = plt.subplots(2, 1, sharex=True)
+
+for field in ["cost", "velocityCost", "positionCost", "collisionCost"]:
+    costAx.semilogy(trace["iteration"], trace[field], label=field)
+costAx.set_ylabel('Cost')
+costAx.legend()
+
+separationAx.plot(trace["iteration"], trace["minSeparation"])
+separationAx.set_xlabel('Iteration')
+separationAx.set_ylabel('Smallest distance (m)')
+
+plt.show()
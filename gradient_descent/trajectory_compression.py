@@ -0,0 +1,188 @@
+import math
+import struct
+import numpy as np
+
+from poly_trajectory import ORDER
+from poly_trajectory import SUBSTEPS
+from poly_trajectory import SEGMENTBYTES
+from poly_trajectory import TRAJECTORYMEMORY
+from poly_trajectory import hermite
+from poly_trajectory import evaluate
+from poly_trajectory import fitSegment
+from poly_trajectory import segmentRow
+from poly_trajectory import sampleTrajectory
+
+# Fixed-point encoding: each axis of a segment is a 7th order bezier curve whose first control point is the end of the previous segment.
+# The other 7 control points are stored in mm as int16, axes that do not move are stored without any control points.
+# A segment starts with a byte holding 2 bits per axis (0 = constant, 3 = 7th order) and the duration in ms as uint16.
+# cflib 0.1.7 can only upload float Poly4D segments, so the encoding is used to budget and to quantize the trajectory
+# the same way a firmware with compressed trajectory support would store it.
+FIXEDSCALE = 1000  # units per m
+FIXEDHEADERBYTES = 8  # the start point
+FIXEDSEGMENTBYTES = 3  # the axis types and the duration of a segment without any control points
+# how often the tolerance is relaxed by 1.5 before giving up, 1.5**40 m is far beyond any room
+MAXRELAXATIONS = 40
+
+
+class CompressionResult:
+    """The compressed trajectory of one agent together with the numbers of how well it was compressed."""
+
+    def __init__(self, rows, encoded, rawBytes, maxDeviation, tolerance):
+        self.rows = rows  # the segments in the format of figure8.py, quantized if the fixed-point encoding was used
+        self.encoded = encoded  # the fixed-point bytes or None
+        self.rawBytes = rawBytes  # float32 x, y, z for every planned sample
+        self.compressedBytes = len(encoded) if encoded is not None else len(rows) * SEGMENTBYTES
+        self.maxDeviation = maxDeviation  # the largest distance to the reference in m
+        self.tolerance = tolerance  # the tolerance that was needed to fit into the memory
+
+
+    def ratio(self):
+        return self.rawBytes / max(1, self.compressedBytes)
+
+
+    def report(self, name=""):
+        print("{}{} segments, {} -> {} bytes (ratio {:.1f}), max deviation {:.3f} m (tolerance {:.3f} m)".format(
+            name, len(self.rows), self.rawBytes, self.compressedBytes, self.ratio(), self.maxDeviation, self.tolerance))
+
+
+def fitBreakpoints(denseTimes, densePos, denseVel, start, breaks):
+    """Fits one continuous segment between each two breakpoints (indices into the dense reference), the first one starts with the
+        position, velocity and acceleration in start (3, 3). Returns the rows, the largest error and the start state of each segment."""
+    rows = []
+    errors = []
+    starts = []
+    for first, last in zip(breaks[:-1], breaks[1:]):
+        span = slice(first, last + 1)
+        coefficients, error = fitSegment(denseTimes[span] - denseTimes[first], densePos[span], denseVel[span], start)
+        duration = denseTimes[last] - denseTimes[first]
+        rows.append(segmentRow(duration, coefficients))
+        errors.append(error)
+        starts.append(start)
+        start = np.vstack([evaluate(coefficients, duration, d) for d in range(0, 3)])
+    return rows, errors, starts
+
+
+def adaptiveBreakpoints(denseTimes, densePos, denseVel, start, tolerance):
+    """Finds breakpoints for few segments within the tolerance. Segments that are too far off are split in half until they fit,
+        then breakpoints are merged away again wherever the two neighbouring segments can be covered by one."""
+    breaks = [0, len(denseTimes) - 1]
+
+    # split
+    while True:
+        rows, errors, starts = fitBreakpoints(denseTimes, densePos, denseVel, start, breaks)
+        newBreaks = [0]
+        for i in range(0, len(errors)):
+            first, last = breaks[i], breaks[i + 1]
+            middle = first + (last - first) // SUBSTEPS // 2 * SUBSTEPS
+            if errors[i] > tolerance and middle > first:
+                newBreaks.append(middle)
+            newBreaks.append(last)
+        if len(newBreaks) == len(breaks):
+            break
+        breaks = newBreaks
+
+    # merge, starting with the breakpoints between the most accurate segments
+    limit = max(tolerance, max(errors))  # segments of a single step can not be split and may stay above the tolerance
+    candidates = sorted(range(1, len(breaks) - 1), key=lambda i: max(errors[i - 1], errors[i]))
+    for breakpoint in [breaks[i] for i in candidates]:
+        i = breaks.index(breakpoint)
+        # the segments before the merged ones do not change, only refit from there on
+        merged = breaks[:i] + breaks[i + 1:]
+        tailErrors, tailStarts = fitBreakpoints(denseTimes, densePos, denseVel, starts[i - 1], merged[i - 1:])[1:]
+        if max(tailErrors) <= limit:
+            breaks = merged
+            errors = errors[:i - 1] + tailErrors
+            starts = starts[:i - 1] + tailStarts
+    return breaks
+
+
+def _binomial(n, k):
+    return math.factorial(n) // (math.factorial(k) * math.factorial(n - k))
+
+
+def _toBezier(coefficients, duration):
+    """Converts the coefficients (axes, 8) of a segment to the control points (axes, 8) of a bezier curve."""
+    normalized = coefficients * duration ** np.arange(0, ORDER + 1)
+    bezier = np.zeros(normalized.shape)
+    for i in range(0, ORDER + 1):
+        for k in range(0, i + 1):
+            bezier[:, i] += _binomial(i, k) / _binomial(ORDER, k) * normalized[:, k]
+    return bezier
+
+
+def _fromBezier(bezier, duration):
+    """Converts the control points (axes, 8) of a bezier curve to the coefficients (axes, 8) of a segment."""
+    normalized = np.zeros(bezier.shape)
+    for k in range(0, ORDER + 1):
+        for i in range(0, k + 1):
+            normalized[:, k] += _binomial(ORDER, k) * _binomial(k, i) * (-1) ** (k - i) * bezier[:, i]
+    return normalized / duration ** np.arange(0, ORDER + 1)
+
+
+def encodeFixedPoint(rows):
+    """Encodes the segments in the fixed-point format. Returns the bytes and the segments as they are decoded again."""
+    start = np.round(np.array([rows[0][1], rows[0][9], rows[0][17]]) * FIXEDSCALE)
+    encoded = struct.pack('<4h', int(start[0]), int(start[1]), int(start[2]), 0)  # FIXEDHEADERBYTES
+    decodedRows = []
+    for row in rows:
+        durationMs = max(1, int(round(row[0] * 1000)))
+        duration = durationMs / 1000
+        coefficients = np.array([row[1:9], row[9:17], row[17:25]])
+        points = np.round(_toBezier(coefficients, row[0]) * FIXEDSCALE)
+        points[:, 0] = start  # every segment continues exactly where the previous one ended
+
+        types = 0
+        data = b''
+        for axis in range(0, 3):
+            if np.all(points[axis] == start[axis]):
+                points[axis] = start[axis]
+            else:
+                types |= 3 << (2 * axis)
+                data += struct.pack('<7h', *[int(p) for p in points[axis, 1:]])
+        encoded += struct.pack('<BH', types, durationMs) + data
+
+        decodedRows.append(segmentRow(duration, _fromBezier(points / FIXEDSCALE, duration)))
+        start = points[:, -1]
+    return encoded, decodedRows
+
+
+def compressTrajectory(positions, velocities, times, tolerance=0.02, memory=TRAJECTORYMEMORY, fixedPoint=False):
+    """Compresses the sampled trajectory (timesteps, 3) of one agent into the fewest segments within the tolerance that fit into memory bytes.
+        If the trajectory does not fit, the tolerance is relaxed until it does, an Exception is raised if even a single segment does not fit."""
+    smallest = FIXEDHEADERBYTES + FIXEDSEGMENTBYTES if fixedPoint else SEGMENTBYTES
+    if memory < smallest:
+        raise Exception("{} bytes of trajectory memory can not hold a single segment of {} bytes".format(memory, smallest))
+    denseTimes, densePos, denseVel, startAcc = hermite(np.asarray(positions, dtype=float), np.asarray(velocities, dtype=float), np.asarray(times, dtype=float))
+    start = np.array([densePos[0], denseVel[0], startAcc])
+    rawBytes = len(positions) * 3 * 4
+
+    currentTolerance = tolerance
+    for _ in range(0, MAXRELAXATIONS):
+        breaks = adaptiveBreakpoints(denseTimes, densePos, denseVel, start, currentTolerance)
+        rows = fitBreakpoints(denseTimes, densePos, denseVel, start, breaks)[0]
+        encoded = None
+        if fixedPoint:
+            encoded, rows = encodeFixedPoint(rows)
+            size = len(encoded)
+        else:
+            size = len(rows) * SEGMENTBYTES
+        if size <= memory:
+            break
+        if len(rows) == 1:
+            raise Exception("the trajectory needs {} bytes as a single segment, more than the {} bytes of memory".format(size, memory))
+        currentTolerance *= 1.5
+    else:
+        raise Exception("the trajectory does not fit into {} bytes even with a tolerance of {:.1f} m".format(memory, currentTolerance))
+
+    deviation = np.max(np.linalg.norm(sampleTrajectory(rows, denseTimes - denseTimes[0]) - densePos, axis=1))
+    return CompressionResult(rows, encoded, rawBytes, deviation, currentTolerance)
+
+
+def compressTrajectories(positions, velocities, times, tolerance=0.02, memory=TRAJECTORYMEMORY, fixedPoint=False):
+    """Compresses the trajectories of all agents (agents, timesteps, 3) and prints a report for each of them."""
+    results = []
+    for agent in range(0, positions.shape[0]):
+        result = compressTrajectory(positions[agent], velocities[agent], times, tolerance, memory, fixedPoint)
+        result.report("agent {}: ".format(agent))
+        results.append(result)
+    return results
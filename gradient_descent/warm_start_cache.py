@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import hashlib
+import numpy as np
+
+# the default directory of the cache, one .npy file of jerks per scenario and an index.json
+CACHEPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "trajectories", "cache")
+DECIMALS = 3  # positions are compared in mm
+
+
+def _rounded(values):
+    return (np.round(np.asarray(values, dtype=float), DECIMALS) + 0.0).tolist()  # + 0.0 turns -0.0 into 0.0
+
+
+def scenario(costFun):
+    """The parts of a CostFunctions that decide its solution. The jerks do not change when the whole scenario is moved,
+        so start and target positions are taken relative to the center of the start positions."""
+    center = np.mean(np.asarray(costFun.startPos, dtype=float), axis=0)
+    description = {
+        "agents": int(costFun.agents),
+        "timesteps": int(costFun.timesteps),
+        "t": float(costFun.t),
+        "weights": [float(costFun.wVel), float(costFun.wPos), float(costFun.wCol)],
+        "minDist": float(costFun.minDist),
+        "startPos": _rounded(costFun.startPos - center),
+        "targetPos": _rounded(costFun.targetPos - center),
+        "startVel": _rounded(costFun.startVel),
+        "targetVel": _rounded(costFun.targetVel),
+    }
+    startAcc = getattr(costFun, "startAcc", None)
+    if startAcc is not None and np.any(startAcc):
+        description["startAcc"] = _rounded(startAcc)  # only plans that start accelerating have it, older entries stay valid
+    return description
+
+
+def signature(description):
+    """A hash of a scenario description, the same for the same scenario anywhere in the room."""
+    return hashlib.sha1(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+
+def _settingsMatch(a, b):
+    return all(a[key] == b[key] for key in ["agents", "timesteps", "t", "weights", "minDist"])
+
+
+def _startAcc(description):
+    """Scenarios without startAcc start without acceleration."""
+    return np.array(description.get("startAcc", np.zeros(np.shape(description["startVel"]))))
+
+
+def _distance(a, b):
+    """How far apart two scenarios with the same settings are, the largest difference of a start or target state in m, m/s or m/s^2."""
+    distance = max(np.max(np.abs(np.array(a[key]) - np.array(b[key]))) for key in ["startPos", "targetPos", "startVel", "targetVel"])
+    return max(distance, np.max(np.abs(_startAcc(a) - _startAcc(b))))
+
+
+class WarmStartCache:
+    """Remembers the solved jerks of scenarios on disk. An exact hit whose cost is below the cost target is the solution, a scenario
+        that differs by less than nearTolerance (or an exact hit that did not reach the target) is a good initial guess. The least recently used entries are removed beyond maxEntries."""
+
+    def __init__(self, path=CACHEPATH, maxEntries=200, nearTolerance=0.3):
+        self.path = path
+        self.maxEntries = maxEntries
+        self.nearTolerance = nearTolerance
+        self.indexFile = os.path.join(path, "index.json")
+        self.index = {}
+        if os.path.exists(self.indexFile):
+            with open(self.indexFile) as f:
+                self.index = json.load(f)
+
+
+    def _save(self):
+        os.makedirs(self.path, exist_ok=True)
+        temporary = self.indexFile + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(self.index, f)
+        os.replace(temporary, self.indexFile)  # never leave a half written index behind
+
+
+    def _load(self, key):
+        self.index[key]["lastUsed"] = time.time()
+        self._save()
+        return np.load(os.path.join(self.path, key + ".npy"))
+
+
+    def lookup(self, costFun, costTarget):
+        """Returns the cached jerks of the scenario and whether they are a solution below costTarget, (None, False) if there is nothing close enough."""
+        description = scenario(costFun)
+        key = signature(description)
+        if key in self.index:
+            if self.index[key]["cost"] < costTarget:
+                return self._load(key), True
+            print("warm start from the same scenario, its cached cost {:.5f} did not reach the target".format(self.index[key]["cost"]))
+            return self._load(key), False
+
+        best, bestDistance = None, self.nearTolerance
+        for other, entry in self.index.items():
+            if _settingsMatch(description, entry["scenario"]):
+                distance = _distance(description, entry["scenario"])
+                if distance < bestDistance:
+                    best, bestDistance = other, distance
+        if best is None:
+            return None, False
+        print("warm start from a cached scenario that differs by {:.3f}".format(bestDistance))
+        return self._load(best), False
+
+
+    def store(self, costFun, jerks, cost):
+        """Remembers the jerks of the scenario, store only solutions that reached the cost target."""
+        description = scenario(costFun)
+        key = signature(description)
+        os.makedirs(self.path, exist_ok=True)
+        np.save(os.path.join(self.path, key + ".npy"), jerks)
+        self.index[key] = {"scenario": description, "cost": float(cost), "lastUsed": time.time()}
+
+        # forget the least recently used scenarios
+        while len(self.index) > self.maxEntries:
+            oldest = min(self.index, key=lambda other: self.index[other]["lastUsed"])
+            del self.index[oldest]
+            oldFile = os.path.join(self.path, oldest + ".npy")
+            if os.path.exists(oldFile):
+                os.remove(oldFile)
+        self._save()
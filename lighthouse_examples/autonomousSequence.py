@@ -32,16 +32,20 @@ This example is intended to work with the Loco Positioning System in TWR TOA
 mode. It aims at documenting how to set the Crazyflie in position control mode
 and how to send setpoints.
 """
+import os
+import sys
 import time
 from math import sin, cos
 
 import cflib.crtp
-from cflib.crazyflie import Crazyflie
 from cflib.crazyflie.log import LogConfig
 from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
 from cflib.crazyflie.syncLogger import SyncLogger
 from cflib.crazyflie.commander import Commander
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'drone_simulator'))
+from crazyflie_cache import createCrazyflie  # noqa: E402
+
 # URI to the Crazyflie to connect to
 uri = 'radio://0/80/2M/E7E7E7E7E5'
 
@@ -200,7 +204,7 @@ def run_sequence(scf, sequence):
 if __name__ == '__main__':
     cflib.crtp.init_drivers(enable_debug_driver=False)
 
-    with SyncCrazyflie(uri, cf=Crazyflie(rw_cache='./cache')) as scf:
+    with SyncCrazyflie(uri, cf=createCrazyflie()) as scf:
         reset_estimator(scf)
         start_position_printing(scf)
         run_sequence(scf, sequence)
@@ -32,14 +32,19 @@ The PositionHlCommander uses position setpoints.
 Change the URI variable to your Crazyflie configuration.
 """
 
+import os
+import sys
+
 import cflib.crtp
-from cflib.crazyflie import Crazyflie
 from cflib.crazyflie.log import LogConfig
 from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
 from cflib.positioning.position_hl_commander import PositionHlCommander
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'drone_simulator'))
+from crazyflie_cache import createCrazyflie  # noqa: E402
+from coord_transform import CoordTransform  # noqa: E402
+
 import time
-from transformation import CoordTransform
 
 # URI to the Crazyflie to connect to
 uri = 'radio://0/80/2M/E7E7E7E7E1'
@@ -63,151 +68,134 @@ def start_position_printing(scf):
     log_conf.start()
 
 
-def slightly_more_complex_usage():
-    with SyncCrazyflie(uri, cf=Crazyflie(rw_cache='./cache')) as scf:
-        with PositionHlCommander(
-                scf,
-                x=0.0, y=0.0, z=0.0,
-                default_velocity=0.3,
-                default_height=0.5,
-                controller=PositionHlCommander.CONTROLLER_MELLINGER) as pc:
-            # Go to a coordinate
-            pc.go_to(1.0, 1.0, 1.0)
-
-            # Move relative to the current position
-            pc.right(1.0)
-
-            # Go to a coordinate and use default height
-            pc.go_to(0.0, 0.0)
-
-            # Go slowly to a coordinate
-            pc.go_to(1.0, 1.0, velocity=0.2)
-
-            # Set new default velocity and height
-            pc.set_default_velocity(0.3)
-            pc.set_default_height(1.0)
-            pc.go_to(0.0, 0.0)
-
-
-def simple_sequence():
-    with SyncCrazyflie(uri, cf=Crazyflie(rw_cache='./cache')) as scf:
-        with PositionHlCommander(scf) as pc:
-            pc.forward(1.0)
-            pc.left(1.0)
-            pc.back(1.0)
-            pc.go_to(0.0, 0.0, 1.0)
-
-
-def rectangle_sequence():
-    tfm = CoordTransform()
-    center_floor = tfm.transformF2F(0.5, 0.5, 0)
-
-    with SyncCrazyflie(uri, cf=Crazyflie(rw_cache='./cache')) as scf:
-        with PositionHlCommander(
-                scf,
-                x=center_floor[0], y=center_floor[1], z=center_floor[2],
-                default_velocity=0.3,
-                default_height=0.5,
-                controller=PositionHlCommander.CONTROLLER_MELLINGER) as pc:
-            fastSpeed = .5 # not more than 1.4!
-            pc.go_to(*tfm.transformF2F(0.5, 0.5, 1))
-            pc.go_to(*tfm.transformF2F(0, 0, 1), fastSpeed)
-            pc.go_to(*tfm.transformF2F(1, 0, 1), fastSpeed)
-            pc.go_to(*tfm.transformF2F(1, 1, 1), fastSpeed)
-            pc.go_to(*tfm.transformF2F(0, 1, 1), fastSpeed)
-            pc.go_to(*tfm.transformF2F(0, 0, 1), fastSpeed)
-            pc.go_to(*tfm.transformF2F(0.5, 0.5, 1), fastSpeed)
-            pc.go_to(*tfm.transformF2F(0.5, 0.5, 0))   
-
-
-def square():
-        with SyncCrazyflie(uri, cf=Crazyflie(rw_cache='./cache')) as scf:
-                with PositionHlCommander(
-                        scf,
-                        x=0, y=0, z=0,
-                        default_velocity=0.3,
-                        default_height=0.2,
-                        controller=PositionHlCommander.CONTROLLER_MELLINGER) as pc:
-                                print(pc.get_position())
-                                pc.up(.5)
-                                print(pc.get_position())
-                                pc.right(.5)
-                                print(pc.get_position())
-                                pc.forward(.5)
-                                print(pc.get_position())
-                                pc.left(1)
-                                print(pc.get_position())
-                                pc.back(1)
-                                print(pc.get_position())
-                                pc.right(1)
-                                print(pc.get_position())
-                                pc.forward(.5)
-                                print(pc.get_position())
-                                pc.left(.5)
-                                print(pc.get_position())
-                                pc.down(.5)
-                                print(pc.get_position())
-
-
-def double_square():
-        with SyncCrazyflie(uri, cf=Crazyflie(rw_cache='./cache')) as scf:
-                with PositionHlCommander(
-                        scf,
-                        x=0, y=0, z=0,
-                        default_velocity=0.5,
-                        default_height=0.2,
-                        controller=PositionHlCommander.CONTROLLER_MELLINGER) as pc:
-                                size = .8
-                                max_height = 1.8
-                                pc.go_to(-size,-size,1)
-                                pc.go_to(size,-size,1)
-                                pc.go_to(size,size,1)
-                                pc.go_to(-size,size,1)
-                                pc.go_to(-size,-size,1)
-                                pc.go_to(-size,-size,max_height)
-                                pc.go_to(size,-size,max_height)
-                                pc.go_to(size,size,max_height)
-                                pc.go_to(-size,size,max_height)
-                                pc.go_to(-size,-size,max_height)
-                                pc.go_to(0,0,.2)
-
-
-def room_border():
-        with SyncCrazyflie(uri, cf=Crazyflie(rw_cache='./cache')) as scf:
-                start_position_printing(scf)
-                with PositionHlCommander(
-                        scf,
-                        x=0, y=0, z=0,
-                        default_velocity=0.3,
-                        default_height=0.2,
-                        controller=PositionHlCommander.CONTROLLER_MELLINGER) as pc:
-                                height = 1
-                                pc.go_to(-1.3,-1.8,height)
-                                pc.go_to(1.3,-1.8,height)
-                                pc.go_to(1.3,1.8,height)
-                                pc.go_to(-1.3,1.8,height)
-                                pc.go_to(-1.3,-1.8,height)
-
-
-
-def test():
-        with SyncCrazyflie(uri, cf=Crazyflie(rw_cache='./cache')) as scf:
-                with PositionHlCommander(
-                        scf,
-                        x=0, y=0, z=0,
-                        default_velocity=0.3,
-                        default_height=0.2,
-                        controller=PositionHlCommander.CONTROLLER_MELLINGER) as pc:
-                                pc.go_to(-1.3,-1.8,0.3)
+# The sequences take a PositionHlCommander, so they can be flown as well as previewed
+# with the PreviewPositionHlCommander of the simulator (see preview_sequence.py).
+# SEQUENCE_ARGS holds the arguments each sequence needs for the commander.
+
+
+def slightly_more_complex_usage(pc):
+    # Go to a coordinate
+    pc.go_to(1.0, 1.0, 1.0)
+
+    # Move relative to the current position
+    pc.right(1.0)
+
+    # Go to a coordinate and use default height
+    pc.go_to(0.0, 0.0)
+
+    # Go slowly to a coordinate
+    pc.go_to(1.0, 1.0, velocity=0.2)
+
+    # Set new default velocity and height
+    pc.set_default_velocity(0.3)
+    pc.set_default_height(1.0)
+    pc.go_to(0.0, 0.0)
+
+
+def simple_sequence(pc):
+    pc.forward(1.0)
+    pc.left(1.0)
+    pc.back(1.0)
+    pc.go_to(0.0, 0.0, 1.0)
+
+
+# the unit cube of the sequences to lighthouse coordinates, measured for the lighthouse setup of the lab
+LIGHTHOUSE_TRANSFORM = [[2.32, 0.37, 0.01, -1.15], [-0.24, 3.6, -0.02, -1.7], [-0.02, 0.05, 1.2, 0.16], [0, 0, 0, 1]]
+tfm = CoordTransform(LIGHTHOUSE_TRANSFORM)
+
+
+def rectangle_sequence(pc):
+    fastSpeed = .5 # not more than 1.4!
+    pc.go_to(*tfm.transformF2F(0.5, 0.5, 1))
+    pc.go_to(*tfm.transformF2F(0, 0, 1), fastSpeed)
+    pc.go_to(*tfm.transformF2F(1, 0, 1), fastSpeed)
+    pc.go_to(*tfm.transformF2F(1, 1, 1), fastSpeed)
+    pc.go_to(*tfm.transformF2F(0, 1, 1), fastSpeed)
+    pc.go_to(*tfm.transformF2F(0, 0, 1), fastSpeed)
+    pc.go_to(*tfm.transformF2F(0.5, 0.5, 1), fastSpeed)
+    pc.go_to(*tfm.transformF2F(0.5, 0.5, 0))
+
+
+def square(pc):
+    print(pc.get_position())
+    pc.up(.5)
+    print(pc.get_position())
+    pc.right(.5)
+    print(pc.get_position())
+    pc.forward(.5)
+    print(pc.get_position())
+    pc.left(1)
+    print(pc.get_position())
+    pc.back(1)
+    print(pc.get_position())
+    pc.right(1)
+    print(pc.get_position())
+    pc.forward(.5)
+    print(pc.get_position())
+    pc.left(.5)
+    print(pc.get_position())
+    pc.down(.5)
+    print(pc.get_position())
+
+
+def double_square(pc):
+    size = .8
+    max_height = 1.8
+    pc.go_to(-size,-size,1)
+    pc.go_to(size,-size,1)
+    pc.go_to(size,size,1)
+    pc.go_to(-size,size,1)
+    pc.go_to(-size,-size,1)
+    pc.go_to(-size,-size,max_height)
+    pc.go_to(size,-size,max_height)
+    pc.go_to(size,size,max_height)
+    pc.go_to(-size,size,max_height)
+    pc.go_to(-size,-size,max_height)
+    pc.go_to(0,0,.2)
+
+
+def room_border(pc):
+    height = 1
+    pc.go_to(-1.3,-1.8,height)
+    pc.go_to(1.3,-1.8,height)
+    pc.go_to(1.3,1.8,height)
+    pc.go_to(-1.3,1.8,height)
+    pc.go_to(-1.3,-1.8,height)
+
+
+def test(pc):
+    pc.go_to(-1.3,-1.8,0.3)
+
+
+center_floor = tfm.transformF2F(0.5, 0.5, 0)
+SEQUENCE_ARGS = {
+    slightly_more_complex_usage: dict(x=0.0, y=0.0, z=0.0, default_velocity=0.3, default_height=0.5,
+                                      controller=PositionHlCommander.CONTROLLER_MELLINGER),
+    simple_sequence: dict(),
+    rectangle_sequence: dict(x=center_floor[0], y=center_floor[1], z=center_floor[2], default_velocity=0.3, default_height=0.5,
+                             controller=PositionHlCommander.CONTROLLER_MELLINGER),
+    square: dict(x=0, y=0, z=0, default_velocity=0.3, default_height=0.2, controller=PositionHlCommander.CONTROLLER_MELLINGER),
+    double_square: dict(x=0, y=0, z=0, default_velocity=0.5, default_height=0.2, controller=PositionHlCommander.CONTROLLER_MELLINGER),
+    room_border: dict(x=0, y=0, z=0, default_velocity=0.3, default_height=0.2, controller=PositionHlCommander.CONTROLLER_MELLINGER),
+    test: dict(x=0, y=0, z=0, default_velocity=0.3, default_height=0.2, controller=PositionHlCommander.CONTROLLER_MELLINGER),
+}
+
+
+def fly(sequence, print_position=False):
+    with SyncCrazyflie(uri, cf=createCrazyflie()) as scf:
+        if print_position:
+            start_position_printing(scf)
+        with PositionHlCommander(scf, **SEQUENCE_ARGS[sequence]) as pc:
+            sequence(pc)
 
 
 if __name__ == '__main__':
         cflib.crtp.init_drivers(enable_debug_driver=False)
 
-        # simple_sequence()
-        # slightly_more_complex_usage()
-        # rectangle_sequence()
-        square()
-        # double_square()
-        # test()
-        #room_border()
\ No newline at end of file
+        # fly(simple_sequence)
+        # fly(slightly_more_complex_usage)
+        # fly(rectangle_sequence)
+        fly(square)
+        # fly(double_square)
+        # fly(test)
+        #fly(room_border, print_position=True)
@@ -30,16 +30,22 @@ This example is intended to work with any positioning system (including LPS).
 It aims at documenting how to set the Crazyflie in position control mode
 and how to send setpoints using the high level commander.
 """
+import os
+import sys
 import time
 
 import cflib.crtp
-from cflib.crazyflie import Crazyflie
 from cflib.crazyflie.log import LogConfig
 from cflib.crazyflie.mem import MemoryElement
 from cflib.crazyflie.mem import Poly4D
 from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
 from cflib.crazyflie.syncLogger import SyncLogger
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'drone_simulator'))
+from crazyflie_cache import createCrazyflie  # noqa: E402
+from param_sync import syncParams  # noqa: E402
+from poly4d import Poly4DTrajectories  # noqa: E402
+
 # URI to the Crazyflie to connect to
 uri = 'radio://0/80/2M/E7E7E7E7E1'
 
@@ -127,11 +133,11 @@ def reset_estimator(cf):
 
 
 def activate_high_level_commander(cf):
-    cf.param.set_value('commander.enHighLevel', '1')
+    print(syncParams(cf, {'commander.enHighLevel': 1}))
 
 
 def activate_mellinger_controller(cf):
-    cf.param.set_value('stabilizer.controller', '2')
+    print(syncParams(cf, {'stabilizer.controller': 2}))
 
 
 def upload_trajectory(cf, trajectory_id, trajectory):
@@ -166,9 +172,15 @@ def run_sequence(cf, trajectory_id, duration):
 
 
 if __name__ == '__main__':
+    # the trajectory is flown relative to the takeoff position, so the room can not be checked here
+    report = Poly4DTrajectories([figure8]).validate()
+    report.print()
+    if not report.isValid():
+        raise Exception('The trajectory is not safe to fly')
+
     cflib.crtp.init_drivers(enable_debug_driver=False)
 
-    with SyncCrazyflie(uri, cf=Crazyflie(rw_cache='./cache')) as scf:
+    with SyncCrazyflie(uri, cf=createCrazyflie()) as scf:
         cf = scf.cf
         trajectory_id = 1
 
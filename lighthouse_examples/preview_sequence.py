@@ -0,0 +1,46 @@
+"""
+Previews sequences of the high level commander without flying them.
+
+The moves of all drones are evaluated at once, so a whole sequence is checked
+in a fraction of its flight time. The minimum distance between the drones and
+the moments a drone leaves the room are printed, and the preview is saved so
+the simulator can play it with the p key.
+"""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'drone_simulator'))
+from coord_transform import loadCoordTransform  # noqa: E402
+from hl_preview import HlPreview, PreviewPositionHlCommander, previewSequence  # noqa: E402
+
+import autonomousSequenceHl  # noqa: E402
+import synchronizedSequence  # noqa: E402
+
+# where the drones of synchronizedSequence.py stand before the takeoff, in the order of their cf_id
+START_POSITIONS = [
+    (-0.5, -0.5, 0),
+    (0, 0, 0),
+    (0.5, 0.5, 0),
+]
+
+
+def preview_synchronized_sequence():
+    return previewSequence(synchronizedSequence.sequence, synchronizedSequence.STEP_TIME, START_POSITIONS)
+
+
+def preview_hl_sequence(sequence):
+    kwargs = autonomousSequenceHl.SEQUENCE_ARGS[sequence]
+    start = (kwargs.get('x', 0.0), kwargs.get('y', 0.0), kwargs.get('z', 0.0))
+    preview = HlPreview([start])
+    with PreviewPositionHlCommander(preview, 0, **kwargs) as pc:
+        sequence(pc)
+    return preview
+
+
+if __name__ == '__main__':
+    preview = preview_synchronized_sequence()
+    # preview = preview_hl_sequence(autonomousSequenceHl.double_square)
+
+    report = preview.analyze(coordTransform=loadCoordTransform())
+    report.print()
+    report.save()
@@ -1,10 +1,14 @@
+import os
+import sys
 import time
 import cflib.crtp  # noqa
-from cflib.crazyflie import Crazyflie
 from cflib.crazyflie.log import LogConfig
 from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
 from cflib.crazyflie.syncLogger import SyncLogger
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'drone_simulator'))
+from crazyflie_cache import createCrazyflie  # noqa: E402
+
 
 def wait_for_position_estimator(scf):
     print('Waiting for estimator to find position...')
@@ -80,7 +84,7 @@ if __name__ == '__main__':
 
     # Initialize the low-level drivers (don't list the debug drivers)
     cflib.crtp.init_drivers(enable_debug_driver=False)
-    with SyncCrazyflie(uri, cf=Crazyflie(rw_cache='./cache')) as scf:
+    with SyncCrazyflie(uri, cf=createCrazyflie()) as scf:
         start_position_printing(scf)
         # reset_estimator(scf)
         time.sleep(10)
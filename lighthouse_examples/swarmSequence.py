@@ -47,25 +47,38 @@ y1  8       5       2
 y0  7               1
 
 """
+import os
+import sys
 import time
 
 import cflib.crtp
 from cflib.crazyflie.log import LogConfig
-from cflib.crazyflie.swarm import CachedCfFactory
 from cflib.crazyflie.swarm import Swarm
 from cflib.crazyflie.syncLogger import SyncLogger
 
-# Change uris and sequences according to your setup
-URI1 = 'radio://0/70/2M/E7E7E7E701'
-URI2 = 'radio://0/70/2M/E7E7E7E702'
-URI3 = 'radio://0/70/2M/E7E7E7E703'
-URI4 = 'radio://0/70/2M/E7E7E7E704'
-URI5 = 'radio://0/70/2M/E7E7E7E705'
-URI6 = 'radio://0/70/2M/E7E7E7E706'
-URI7 = 'radio://0/70/2M/E7E7E7E707'
-URI8 = 'radio://0/70/2M/E7E7E7E708'
-URI9 = 'radio://0/70/2M/E7E7E7E709'
-URI10 = 'radio://0/70/2M/E7E7E7E70A'
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'drone_simulator'))
+from crazyflie_cache import SharedCfFactory  # noqa: E402
+from radio_allocator import allocateUris  # noqa: E402
+from setpoint_player import Waypoints, Program, SetpointPlayer  # noqa: E402
+from setpoint_player import collectCrazyflies, forward  # noqa: E402
+
+# Change addresses and sequences according to your setup
+# the dongles are assigned by the radio allocator, CHANNEL is the radio channel configured on the drones
+CHANNEL = 70
+ADDRESS1 = 'E7E7E7E701'
+ADDRESS2 = 'E7E7E7E702'
+ADDRESS3 = 'E7E7E7E703'
+ADDRESS4 = 'E7E7E7E704'
+ADDRESS5 = 'E7E7E7E705'
+ADDRESS6 = 'E7E7E7E706'
+ADDRESS7 = 'E7E7E7E707'
+ADDRESS8 = 'E7E7E7E708'
+ADDRESS9 = 'E7E7E7E709'
+ADDRESS10 = 'E7E7E7E70A'
+
+# how many setpoints per second are sent to each drone and how long it takes to get to the next position
+RATE = 50
+TRANSITION_TIME = 1.0
 
 
 z0 = 0.4
@@ -142,31 +155,31 @@ sequence10 = [
 ]
 
 seq_args = {
-    URI1: [sequence1],
-    URI2: [sequence2],
-    URI3: [sequence3],
-    URI4: [sequence4],
-    URI5: [sequence5],
-    URI6: [sequence6],
-    URI7: [sequence7],
-    URI8: [sequence8],
-    URI9: [sequence9],
-    URI10: [sequence10],
+    ADDRESS1: [sequence1],
+    ADDRESS2: [sequence2],
+    ADDRESS3: [sequence3],
+    ADDRESS4: [sequence4],
+    ADDRESS5: [sequence5],
+    ADDRESS6: [sequence6],
+    ADDRESS7: [sequence7],
+    ADDRESS8: [sequence8],
+    ADDRESS9: [sequence9],
+    ADDRESS10: [sequence10],
 }
 
-# List of URIs, comment the one you do not want to fly
-uris = {
-    URI1,
-    URI2,
-    URI3,
-    URI4,
-    URI5,
-    URI6,
-    URI7,
-    URI8,
-    URI9,
-    URI10
-}
+# List of addresses, comment the one you do not want to fly
+addresses = [
+    ADDRESS1,
+    ADDRESS2,
+    ADDRESS3,
+    ADDRESS4,
+    ADDRESS5,
+    ADDRESS6,
+    ADDRESS7,
+    ADDRESS8,
+    ADDRESS9,
+    ADDRESS10
+]
 
 
 def wait_for_position_estimator(scf):
@@ -210,12 +223,6 @@ def wait_for_position_estimator(scf):
                 break
 
 
-def wait_for_param_download(scf):
-    while not scf.cf.param.is_updated:
-        time.sleep(1.0)
-    print('Parameters downloaded for', scf.cf.link_uri)
-
-
 def reset_estimator(scf):
     cf = scf.cf
     cf.param.set_value('kalman.resetEstimation', '1')
@@ -225,60 +232,20 @@ def reset_estimator(scf):
     wait_for_position_estimator(cf)
 
 
-def take_off(cf, position):
-    take_off_time = 1.0
-    sleep_time = 0.1
-    steps = int(take_off_time / sleep_time)
-    vz = position[2] / take_off_time
-
-    print(vz)
-
-    for i in range(steps):
-        cf.commander.send_velocity_world_setpoint(0, 0, vz, 0)
-        time.sleep(sleep_time)
-
-
-def land(cf, position):
-    landing_time = 1.0
-    sleep_time = 0.1
-    steps = int(landing_time / sleep_time)
-    vz = -position[2] / landing_time
-
-    print(vz)
-
-    for _ in range(steps):
-        cf.commander.send_velocity_world_setpoint(0, 0, vz, 0)
-        time.sleep(sleep_time)
-
-    cf.commander.send_stop_setpoint()
-    # Make sure that the last packet leaves before the link is closed
-    # since the message queue is not flushed before closing
-    time.sleep(0.1)
-
-
-def run_sequence(scf, sequence):
-    try:
-        cf = scf.cf
-
-        take_off(cf, sequence[0])
-        for position in sequence:
-            print('Setting position {}'.format(position))
-            end_time = time.time() + position[3]
-            while time.time() < end_time:
-                cf.commander.send_position_setpoint(position[0],
-                                                    position[1],
-                                                    position[2], 0)
-                time.sleep(0.1)
-        land(cf, sequence[-1])
-    except Exception as e:
-        print(e)
+def build_program(sequences):
+    """Takes off from the floor below the first position, flies the sequences and lands below the last position."""
+    with_landing = [sequence + [(sequence[-1][0], sequence[-1][1], 0.0, TRANSITION_TIME)] for sequence in sequences]
+    return Program([forward(Waypoints(with_landing, TRANSITION_TIME))])
 
 
 if __name__ == '__main__':
     # logging.basicConfig(level=logging.DEBUG)
     cflib.crtp.init_drivers(enable_debug_driver=False)
 
-    factory = CachedCfFactory(rw_cache='./cache')
+    uris = allocateUris([(address, CHANNEL) for address in addresses])
+    program = build_program([seq_args[address][0] for address in addresses])
+
+    factory = SharedCfFactory()
     with Swarm(uris, factory=factory) as swarm:
         # If the copters are started in their correct positions this is
         # probably not needed. The Kalman filter will have time to converge
@@ -286,11 +253,13 @@ if __name__ == '__main__':
         # keep the code here to illustrate how to do it.
         # swarm.parallel(reset_estimator)
 
-        # The current values of all parameters are downloaded as a part of the
-        # connections sequence. Since we have 10 copters this is clogging up
-        # communication and we have to wait for it to finish before we start
-        # flying.
-        print('Waiting for parameters to be downloaded...')
-        swarm.parallel(wait_for_param_download)
+        # The TOCs come from the shared cache and parameter values are only
+        # fetched on demand, so there is no parameter download to wait for
+        # before flying.
 
-        swarm.parallel(run_sequence, args_dict=seq_args)
+        # all setpoints are sent from this thread on one clock
+        player = SetpointPlayer(collectCrazyflies(swarm, uris), program, rate=RATE)
+        try:
+            player.play()
+        finally:
+            player.stop()
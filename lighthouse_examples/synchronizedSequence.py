@@ -34,6 +34,8 @@ This example is intended to work with any absolute positioning system.
 It aims at documenting how to use the High Level Commander together with
 the Swarm class to achieve synchronous sequences.
 """
+import os
+import sys
 import threading
 import time
 from collections import namedtuple
@@ -41,11 +43,16 @@ from queue import Queue
 
 import cflib.crtp
 from cflib.crazyflie.log import LogConfig
-from cflib.crazyflie.swarm import CachedCfFactory
 from cflib.crazyflie.swarm import Swarm
 from cflib.crazyflie.syncLogger import SyncLogger
 
-# Time for one step in second
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'drone_simulator'))
+from crazyflie_cache import SharedCfFactory  # noqa: E402
+from radio_allocator import allocateUris  # noqa: E402
+from param_sync import syncSwarmParams  # noqa: E402
+from timeline import Timeline  # noqa: E402
+
+# Time for one step in second, steps can also be fractional (e.g. 2.5)
 STEP_TIME = 1
 
 # Possible commands, all times are in seconds
@@ -57,11 +64,25 @@ Ring = namedtuple('Ring', ['r', 'g', 'b', 'intensity', 'time'])
 # Reserved for the control loop, do not use in sequence
 Quit = namedtuple('Quit', [])
 
-uris = [
-    'radio://0/10/2M/E7E7E7E701',  # cf_id 0, startup position [-0.5, -0.5]
-    'radio://0/10/2M/E7E7E7E702',  # cf_id 1, startup position [ 0, 0]
-    'radio://0/10/2M/E7E7E7E703',  # cf_id 3, startup position [0.5, 0.5]
-    # Add more URIs if you want more copters in the swarm
+# The parameters all drones need before the show: high level commander, mellinger
+# controller and the fade to color effect of the led-ring, starting with the ring off.
+# Only the values that differ are written, to all drones at the same time.
+PARAMS = {
+    'commander.enHighLevel': 1,
+    'stabilizer.controller': 2,
+    'ring.fadeTime': 0,
+    'ring.fadeColor': 0,
+    'ring.effect': 14,
+}
+
+# The radio channel configured on the drones, the dongles are assigned by the radio allocator
+CHANNEL = 10
+
+addresses = [
+    'E7E7E7E701',  # cf_id 0, startup position [-0.5, -0.5]
+    'E7E7E7E702',  # cf_id 1, startup position [ 0, 0]
+    'E7E7E7E703',  # cf_id 3, startup position [0.5, 0.5]
+    # Add more addresses if you want more copters in the swarm
 ]
 
 sequence = [
@@ -151,17 +172,6 @@ def reset_estimator(scf):
     wait_for_position_estimator(scf)
 
 
-def activate_high_level_commander(scf):
-    scf.cf.param.set_value('commander.enHighLevel', '1')
-
-
-def activate_mellinger_controller(scf, use_mellinger):
-    controller = 1
-    if use_mellinger:
-        controller = 2
-    scf.cf.param.set_value('stabilizer.controller', str(controller))
-
-
 def set_ring_color(cf, r, g, b, intensity, time):
     cf.param.set_value('ring.fadeTime', str(time))
 
@@ -178,16 +188,10 @@ def crazyflie_control(scf):
     cf = scf.cf
     control = controlQueues[uris.index(cf.link_uri)]
 
-    activate_mellinger_controller(scf, True)
-
     commander = scf.cf.high_level_commander
 
-    # Set fade to color effect and reset to Led-ring OFF
-    set_ring_color(cf, 0, 0, 0, 0, 0)
-    cf.param.set_value('ring.effect', '14')
-
     while True:
-        command = control.get()
+        deadline, command = control.get()
         if type(command) is Quit:
             return
         elif type(command) is Takeoff:
@@ -203,48 +207,26 @@ def crazyflie_control(scf):
         else:
             print('Warning! unknown command {} for uri {}'.format(command,
                                                                   cf.uri))
-
-
-def control_thread():
-    pointer = 0
-    step = 0
-    stop = False
-
-    while not stop:
-        print('Step {}:'.format(step))
-        while sequence[pointer][0] <= step:
-            cf_id = sequence[pointer][1]
-            command = sequence[pointer][2]
-
-            print(' - Running: {} on {}'.format(command, cf_id))
-            controlQueues[cf_id].put(command)
-            pointer += 1
-
-            if pointer >= len(sequence):
-                print('Reaching the end of the sequence, stopping!')
-                stop = True
-                break
-
-        step += 1
-        time.sleep(STEP_TIME)
-
-    for ctrl in controlQueues:
-        ctrl.put(Quit())
+            continue
+        timeline.record_latency(uris.index(cf.link_uri), deadline)
 
 
 if __name__ == '__main__':
-    controlQueues = [Queue() for _ in range(len(uris))]
+    controlQueues = [Queue() for _ in range(len(addresses))]
+    timeline = Timeline(sequence, STEP_TIME)
 
     cflib.crtp.init_drivers(enable_debug_driver=False)
-    factory = CachedCfFactory(rw_cache='./cache')
+    uris = allocateUris([(address, CHANNEL) for address in addresses])
+    factory = SharedCfFactory()
     with Swarm(uris, factory=factory) as swarm:
-        swarm.parallel_safe(activate_high_level_commander)
+        syncSwarmParams(swarm, PARAMS)
         swarm.parallel_safe(reset_estimator)
 
         print('Starting sequence!')
 
-        threading.Thread(target=control_thread).start()
+        threading.Thread(target=timeline.run, args=(controlQueues, Quit())).start()
 
         swarm.parallel_safe(crazyflie_control)
 
+        timeline.print_latencies()
         time.sleep(1)
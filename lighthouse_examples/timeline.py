@@ -0,0 +1,73 @@
+"""
+Timeline scheduler for synchronized choreographies.
+
+The (step, cf_id, action) sequence is compiled into a heap of events with absolute
+times. Events are dispatched against time.monotonic(), every deadline is computed
+from the start of the show instead of adding up sleeps, so the timing does not
+drift no matter how long the show is. Steps can be fractional for sub-step timing.
+"""
+import heapq
+import threading
+import time
+
+# sleep until this many seconds before a deadline and wait for the rest actively,
+# time.sleep() often oversleeps by a few ms
+SPIN_TIME = 0.002
+
+
+class Timeline:
+    def __init__(self, sequence, step_time, start_delay=0.5):
+        self.step_time = step_time
+        self.start_delay = start_delay
+        self.start_time = None
+        self.events = self.compile(sequence)
+        self.latencies = {}
+        self._lock = threading.Lock()
+
+    def compile(self, sequence):
+        """Turns the sequence into a heap of (time, order, cf_id, action) with the time relative to the start."""
+        events = []
+        for order, (step, cf_id, action) in enumerate(sequence):
+            # the order keeps actions of the same time in the sequence order
+            heapq.heappush(events, (step * self.step_time, order, cf_id, action))
+        return events
+
+    def duration(self):
+        return max(event[0] for event in self.events) if self.events else 0
+
+    def run(self, queues, quit_action):
+        """Dispatches all events into the queues of the drones as (deadline, action) and finally puts quit_action into every queue."""
+        self.start_time = time.monotonic() + self.start_delay
+        events = list(self.events)
+        while events:
+            offset, _, cf_id, action = heapq.heappop(events)
+            deadline = self.start_time + offset
+            wait_until(deadline)
+            queues[cf_id].put((deadline, action))
+            print(' - {:7.3f}s: {} on {}'.format(offset, action, cf_id))
+
+        print('Reaching the end of the sequence, stopping!')
+        for queue in queues:
+            queue.put((None, quit_action))
+
+    def record_latency(self, cf_id, deadline):
+        """Called by the drones right after they sent an action, stores how late it went out."""
+        latency = time.monotonic() - deadline
+        with self._lock:
+            self.latencies.setdefault(cf_id, []).append(latency)
+
+    def print_latencies(self):
+        print('\n############### DISPATCH LATENCY ###############')
+        for cf_id in sorted(self.latencies):
+            values = self.latencies[cf_id]
+            print('cf_id {}: {} actions, mean {:6.1f} ms, max {:6.1f} ms'.format(
+                cf_id, len(values), 1000 * sum(values) / len(values), 1000 * max(values)))
+
+
+def wait_until(deadline):
+    """Waits until time.monotonic() reaches the deadline, returns immediately if it already passed."""
+    remaining = deadline - time.monotonic()
+    if remaining > SPIN_TIME:
+        time.sleep(remaining - SPIN_TIME)
+    while time.monotonic() < deadline:
+        pass